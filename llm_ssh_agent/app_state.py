@@ -1,10 +1,16 @@
 # File: llm_ssh_agent/app_state.py
 # Type: Python Module
 
+import itertools
 import paramiko
 from dataclasses import dataclass, field
 from typing import List, Optional, Tuple, Dict
 
+from .command_queue import CommandQueue
+
+# Source of stable chat message IDs (commands refer back to the message that proposed them)
+_message_ids = itertools.count(1)
+
 # --- Configuration & Connection States ---
 
 @dataclass
@@ -14,6 +20,16 @@ class LLMConfig:
     model_name: str = "gemma:2b" # Default model, user should change as needed
     # Add fields for API keys, base URLs etc. if supporting APIs
     base_url: Optional[str] = None # For self-hosted Ollama or APIs
+    # Pool of Ollama servers to balance across; overrides base_url when set
+    endpoints: List[str] = field(default_factory=list)
+    # Fire a hedged request at a second endpoint if the first produced no token by then
+    hedge_after: Optional[float] = None # seconds; None disables hedging
+    health_check_interval: float = 30.0 # seconds between background endpoint pings
+    # Ollama model used to embed SSH outputs for retrieval; None = local hashing vectorizer
+    embedding_model: Optional[str] = None
+    # Use Ollama's native tool calling; falls back to [SSH_COMMAND] parsing
+    # automatically for models that don't support tools.
+    use_tool_calling: bool = True
 
 @dataclass
 class SSHConnectionProfile:
@@ -24,6 +40,9 @@ class SSHConnectionProfile:
     port: int = 22
     auth_method: str = "key" # "key" or "password"
     key_path: Optional[str] = None
+    groups: List[str] = field(default_factory=list) # Host groups, e.g. for batch runs ("web", "db")
+    # ProxyJump chain: names of saved profiles to tunnel through, outermost bastion first
+    jump_hosts: List[str] = field(default_factory=list)
 
 @dataclass
 class SSHConnectionState:
@@ -33,13 +52,35 @@ class SSHConnectionState:
     is_connected: bool = False
     error: Optional[str] = None
 
+@dataclass
+class EndpointStats:
+    """Snapshot of one LLM endpoint's health and latency figures."""
+    url: str
+    healthy: bool
+    outstanding: int # Requests currently in flight
+    requests: int
+    failures: int
+    hedges_won: int # Requests won as the hedged (second) attempt
+    avg_latency: Optional[float] = None # EWMA of full response time, seconds
+    avg_first_token: Optional[float] = None # EWMA of time to first streamed chunk, seconds
+    last_error: Optional[str] = None
+
 # --- Chat & Logging ---
 
+@dataclass
+class ProposedCommand:
+    """A command proposed by the LLM, awaiting approval."""
+    command: str
+    host: Optional[str] = None # Target host/profile requested by the LLM (None = active connection)
+    timeout: Optional[int] = None # Seconds; None = SSHManager default
+    background: bool = False # Run detached on the remote host and poll for output
+
 @dataclass
 class ChatMessage:
     """Represents a single message in the chat history."""
     sender: str # "user" or "llm" or "system"
     text: str
+    message_id: int = field(default_factory=lambda: next(_message_ids))
 
 @dataclass
 class SSHLogEntry:
@@ -47,6 +88,7 @@ class SSHLogEntry:
     command: str
     output: str
     timestamp: float # Use time.time()
+    kind: str = "output" # "output" for executed commands, "policy" for auto-approval decisions
 
 # --- Application State ---
 
@@ -57,7 +99,14 @@ class AppState:
     saved_connections: Dict[str, SSHConnectionProfile] = field(default_factory=dict)
     active_connection: Optional[SSHConnectionState] = None
     conversation_history: List[ChatMessage] = field(default_factory=list)
-    pending_ssh_commands: List[str] = field(default_factory=list)
+    command_queue: CommandQueue = field(default_factory=CommandQueue) # Proposed/approved/running commands
     ssh_log: List[SSHLogEntry] = field(default_factory=list)
     # Flag to control whether LLM output should be added to context
     feed_ssh_output_to_llm: bool = True
+    # Index SSH outputs and inject only the most relevant chunks, instead of
+    # putting every output into the conversation history
+    use_output_retrieval: bool = True
+    retrieval_top_k: int = 4
+    # Gather OS/init/disk/service facts right after connecting and give them
+    # to the LLM in the system prompt, instead of letting it discover them
+    prefetch_host_facts: bool = True
@@ -0,0 +1,267 @@
+# File: llm_ssh_agent/batch.py
+# Type: Python Module
+
+# Headless batch runner: plays a prompt script against a group of hosts
+# without the TUI, e.g. from cron or CI. Results are streamed as JSONL.
+
+import argparse
+import contextlib
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, TextIO, Tuple
+
+from .app_state import LLMConfig
+from .command_queue import CommandRecord
+from .core_logic import CoreLogic
+from .host_facts import HostFactsCache
+from .llm_interface import LLMInterface
+from .policy import CommandPolicy, POLICY_FILE, load_policy
+from .secure_storage import load_all_ssh_profiles
+
+# Sent after approved commands ran, so the LLM can act on their output
+FOLLOW_UP_PROMPT = "Continue based on the command output above."
+
+# none: only record proposals; policy: auto-approve per the policy file; all: run everything
+APPROVAL_POLICIES = ("none", "policy", "all")
+
+# How long a turn waits for the background jobs it started before moving on (seconds)
+JOB_WAIT = 300
+
+@dataclass
+class SessionResult:
+    """Outcome of one host's session, for the final report."""
+    host: str
+    ok: bool
+    turns: int = 0
+    commands_run: int = 0
+    latency: float = 0.0 # seconds, connect to disconnect
+    error: Optional[str] = None
+    cancelled_jobs: List[str] = field(default_factory=list) # Background jobs killed before disconnecting
+    orphaned_jobs: List[str] = field(default_factory=list) # Jobs that couldn't be killed and may still be running
+
+
+class JsonlWriter:
+    """Thread-safe JSONL output, flushed after every record so results stream."""
+
+    def __init__(self, stream: TextIO):
+        self.stream = stream
+        self._lock = threading.Lock()
+
+    def write(self, record: Dict[str, Any]):
+        line = json.dumps(record, default=str)
+        with self._lock:
+            self.stream.write(line + "\n")
+            self.stream.flush()
+
+
+def load_prompt_script(path: str) -> List[str]:
+    """Reads prompts, one per line. Blank lines and '#' comments are skipped."""
+    with open(path, "r") as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+
+
+def select_hosts(group: Optional[str], hosts: Optional[str]) -> List[str]:
+    """Resolves --group / --hosts into a list of saved profile names."""
+    profiles = load_all_ssh_profiles()
+    selected = []
+    if hosts:
+        selected.extend(name.strip() for name in hosts.split(",") if name.strip())
+    if group:
+        selected.extend(name for name, profile in profiles.items() if group in profile.groups and name not in selected)
+    unknown = [name for name in selected if name not in profiles]
+    if unknown:
+        raise ValueError(f"Unknown profile(s): {', '.join(unknown)}")
+    return selected
+
+
+def split_by_policy(commands: List[CommandRecord], policy: str) -> Tuple[List[CommandRecord], List[CommandRecord]]:
+    """
+    Returns (approved, rejected) for the commands still pending after a turn.
+    Under "policy", CoreLogic has already run the allowed ones; the rest are rejected.
+    """
+    if policy == "all":
+        return list(commands), []
+    return [], list(commands)
+
+
+def stop_jobs(core_logic: CoreLogic, result: SessionResult):
+    """Cancels the session's unfinished background jobs, so none outlive it unnoticed."""
+    killed, orphaned = core_logic.stop_background_jobs()
+    result.cancelled_jobs.extend(killed)
+    result.orphaned_jobs.extend(orphaned)
+
+
+def run_session(host: str, prompts: List[str], llm_interface: LLMInterface, policy: str,
+                command_policy: CommandPolicy, max_rounds: int, writer: JsonlWriter,
+                host_facts_cache: Optional[HostFactsCache] = None, job_wait: float = JOB_WAIT) -> SessionResult:
+    """
+    Runs the whole prompt script against one host, blocking until done.
+    Each turn waits up to job_wait seconds for its background jobs, so their output
+    reaches the LLM; jobs still running when the script ends are cancelled.
+    """
+    start = time.monotonic()
+    result = SessionResult(host=host, ok=False)
+    core_logic = CoreLogic(llm_interface=llm_interface, retrieval_path=None, policy=command_policy,
+                           host_facts_cache=host_facts_cache)
+    try:
+        if not core_logic.connect_ssh(host, blocking=True):
+            connection = core_logic.state.active_connection
+            result.error = (connection.error if connection else None) or "Connection failed."
+            return result
+
+        for prompt in prompts:
+            message = prompt
+            for round_number in range(1, max_rounds + 1):
+                turn_start = time.monotonic()
+                log_start = len(core_logic.state.ssh_log)
+                core_logic.send_message_to_llm(message, blocking=True)
+                response = next((msg.text for msg in reversed(core_logic.state.conversation_history) if msg.sender == "llm"), None)
+
+                # Earlier turns' commands were all approved or rejected, so these are new
+                pending = core_logic.get_pending_commands()
+                approved, rejected = split_by_policy(pending, policy)
+                if rejected:
+                    core_logic.reject_commands([record.command_id for record in rejected])
+                if approved:
+                    core_logic.approve_commands([record.command_id for record in approved], blocking=True)
+                # Commands approved here or by the policy may have started background jobs
+                core_logic.job_manager.wait(timeout=job_wait)
+                new_entries = core_logic.state.ssh_log[log_start:]
+                executed = [entry for entry in new_entries if entry.kind == "output"]
+                decisions = [entry.output.strip() for entry in new_entries if entry.kind == "policy"]
+
+                result.turns += 1
+                result.commands_run += len(executed)
+                writer.write({
+                    "type": "turn",
+                    "host": host,
+                    "prompt": message,
+                    "round": round_number,
+                    "response": response,
+                    "pending": [cmd.command for cmd in pending],
+                    "rejected": [cmd.command for cmd in rejected],
+                    "policy_decisions": decisions,
+                    "executed": [{"command": entry.command, "output": entry.output} for entry in executed],
+                    "latency": round(time.monotonic() - turn_start, 3),
+                    "jobs_running": [job.command for job in core_logic.job_manager.running()],
+                    "error": core_logic.last_llm_error,
+                })
+                if core_logic.last_llm_error:
+                    result.error = core_logic.last_llm_error
+                    return result # The backend failed; later prompts would only fail the same way
+                if not executed:
+                    break # Nothing new for the LLM to look at
+                message = FOLLOW_UP_PROMPT
+        result.ok = True
+    except Exception as e:
+        result.error = f"Unexpected error: {e}"
+    finally:
+        stop_jobs(core_logic, result)
+        core_logic.disconnect_ssh()
+        result.latency = time.monotonic() - start
+        writer.write({"type": "session", **result.__dict__})
+    return result
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def report(results: List[SessionResult], elapsed: float) -> Dict[str, Any]:
+    """Builds the end-of-run throughput and latency summary."""
+    latencies = [r.latency for r in results]
+    summary = {
+        "type": "summary",
+        "sessions": len(results),
+        "succeeded": sum(1 for r in results if r.ok),
+        "failed": sum(1 for r in results if not r.ok),
+        "elapsed": round(elapsed, 3),
+        "sessions_per_minute": round(len(results) / (elapsed / 60), 2) if elapsed > 0 else None,
+    }
+    if latencies:
+        summary.update({
+            "latency_p50": round(_percentile(latencies, 0.5), 3),
+            "latency_p95": round(_percentile(latencies, 0.95), 3),
+            "latency_max": round(max(latencies), 3),
+        })
+    return summary
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="llm-ssh-batch", description="Run a prompt script against a group of SSH hosts without the TUI.")
+    parser.add_argument("script", help="Prompt script: one prompt per line, '#' starts a comment.")
+    parser.add_argument("--group", help="Run on every saved profile in this host group.")
+    parser.add_argument("--hosts", help="Comma-separated saved profile names.")
+    parser.add_argument("--parallel", type=int, default=4, help="Maximum concurrent sessions (default: 4).")
+    parser.add_argument("--approve", choices=APPROVAL_POLICIES, default="none",
+                        help="Auto-approval for proposed commands: none (only record them, default), "
+                             "policy (use the policy file) or all.")
+    parser.add_argument("--policy", default=POLICY_FILE, help=f"Policy file for --approve policy (default: {POLICY_FILE}).")
+    parser.add_argument("--max-rounds", type=int, default=3,
+                        help="LLM turns per prompt while commands keep being run (default: 3).")
+    parser.add_argument("--job-wait", type=float, default=JOB_WAIT,
+                        help=f"Seconds a turn waits for its background jobs before moving on; jobs still "
+                             f"running at the end are cancelled (default: {JOB_WAIT}).")
+    parser.add_argument("--output", default="-", help="JSONL output file ('-' for stdout).")
+    parser.add_argument("--model", help="Ollama model to use.")
+    parser.add_argument("--endpoint", action="append", default=[], help="Ollama server URL (repeatable).")
+    return parser
+
+
+def run(argv: Optional[List[str]] = None):
+    """Entry point for the headless batch runner."""
+    args = build_arg_parser().parse_args(argv)
+    if not args.group and not args.hosts:
+        print("Error: specify --group and/or --hosts.", file=sys.stderr)
+        sys.exit(2)
+
+    results_stream = sys.stdout if args.output == "-" else open(args.output, "a")
+    writer = JsonlWriter(results_stream)
+    # The core modules report progress with print(); keep stdout for results only
+    with contextlib.redirect_stdout(sys.stderr):
+        try:
+            prompts = load_prompt_script(args.script)
+            hosts = select_hosts(args.group, args.hosts)
+        except (IOError, ValueError) as e:
+            print(f"Error: {e}")
+            sys.exit(2)
+        try:
+            command_policy = load_policy(args.policy) if args.approve == "policy" else CommandPolicy()
+        except ValueError as e:
+            print(f"Error: {e}")
+            sys.exit(2)
+        if not prompts or not hosts:
+            print("Nothing to do: no prompts or no hosts selected.")
+            sys.exit(0)
+
+        config = LLMConfig(endpoints=args.endpoint)
+        if args.model:
+            config.model_name = args.model
+        llm_interface = LLMInterface(config) # Shared by all sessions
+        host_facts_cache = HostFactsCache()
+
+        start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=max(1, args.parallel)) as executor:
+            futures = [executor.submit(run_session, host, prompts, llm_interface, args.approve, command_policy,
+                                       max(1, args.max_rounds), writer, host_facts_cache, max(0.0, args.job_wait))
+                       for host in hosts]
+            results = [future.result() for future in futures]
+        summary = report(results, time.monotonic() - start)
+
+        writer.write(summary)
+        print(f"{summary['succeeded']}/{summary['sessions']} sessions succeeded in {summary['elapsed']}s "
+              f"({summary['sessions_per_minute']} sessions/min); latency p50 {summary.get('latency_p50')}s, "
+              f"p95 {summary.get('latency_p95')}s, max {summary.get('latency_max')}s.")
+
+    if results_stream is not sys.stdout:
+        results_stream.close()
+    sys.exit(0 if summary["failed"] == 0 else 1)
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,166 @@
+# File: llm_ssh_agent/command_queue.py
+# Type: Python Module
+
+import itertools
+import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from enum import Enum
+from typing import Deque, Dict, List, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .app_state import ProposedCommand
+
+# How many finished (done/failed/cancelled) records are kept for lookups and the UI
+FINISHED_HISTORY = 1000
+
+class CommandState(str, Enum):
+    """Lifecycle of a command proposed by the LLM."""
+    PROPOSED = "proposed" # Waiting for approval
+    APPROVED = "approved" # Approved (by the user or the policy), not started yet
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed" # Ran with a non-zero exit status or couldn't be run
+    CANCELLED = "cancelled" # Rejected, denied by policy or stopped
+
+
+@dataclass
+class CommandRecord:
+    """A queued command with its lifecycle state."""
+    command_id: int
+    command: str
+    host: Optional[str] = None # Target host/profile requested by the LLM
+    timeout: Optional[int] = None # Seconds; None = SSHManager default
+    message_id: Optional[int] = None # LLM chat message that proposed it
+    background: bool = False # Runs as a detached remote job (see jobs.py)
+    state: CommandState = CommandState.PROPOSED
+    created: float = 0.0
+    updated: float = 0.0
+    exit_status: Optional[int] = None
+    error: Optional[str] = None
+    progress: Optional[str] = None # Latest output line of a background job
+    output_bytes: int = 0 # Output received so far from a background job
+
+
+# Allowed lifecycle moves: proposed -> approved -> running -> done/failed/cancelled
+TRANSITIONS = {
+    CommandState.PROPOSED: {CommandState.APPROVED, CommandState.CANCELLED},
+    CommandState.APPROVED: {CommandState.RUNNING, CommandState.CANCELLED},
+    CommandState.RUNNING: {CommandState.DONE, CommandState.FAILED, CommandState.CANCELLED},
+}
+TERMINAL_STATES = {CommandState.DONE, CommandState.FAILED, CommandState.CANCELLED}
+
+
+class CommandQueue:
+    """
+    Ordered queue of command records keyed by a stable ID.
+    Adding, looking up and moving a record between states are all O(1);
+    finished records leave the active queue and are kept in a bounded history.
+    """
+
+    def __init__(self, finished_history: int = FINISHED_HISTORY):
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._active: "OrderedDict[int, CommandRecord]" = OrderedDict()
+        self._finished: Deque[CommandRecord] = deque()
+        self._finished_by_id: Dict[int, CommandRecord] = {}
+        self._finished_history = finished_history
+        self._counts: Dict[CommandState, int] = {state: 0 for state in CommandState}
+
+    def __len__(self) -> int:
+        """Number of records that haven't finished yet."""
+        return len(self._active)
+
+    def add(self, proposal: "ProposedCommand", message_id: Optional[int] = None) -> CommandRecord:
+        """Queues a proposed command and returns its new record."""
+        now = time.time()
+        with self._lock:
+            record = CommandRecord(
+                command_id=next(self._ids),
+                command=proposal.command,
+                host=proposal.host,
+                timeout=proposal.timeout,
+                message_id=message_id,
+                background=proposal.background,
+                created=now,
+                updated=now,
+            )
+            self._active[record.command_id] = record
+            self._counts[record.state] += 1
+        return record
+
+    def restore(self, records: List[CommandRecord]):
+        """
+        Refills an empty queue with saved records (e.g. a session paged back in
+        from disk), keeping their IDs and states. New IDs continue after the highest one.
+        """
+        with self._lock:
+            for record in records:
+                if record.state in TERMINAL_STATES:
+                    self._finished.append(record)
+                    self._finished_by_id[record.command_id] = record
+                else:
+                    self._active[record.command_id] = record
+                self._counts[record.state] += 1
+            while len(self._finished) > self._finished_history:
+                del self._finished_by_id[self._finished.popleft().command_id]
+            self._ids = itertools.count(max((r.command_id for r in records), default=0) + 1)
+
+    def get(self, command_id: int) -> Optional[CommandRecord]:
+        with self._lock:
+            return self._active.get(command_id) or self._finished_by_id.get(command_id)
+
+    def transition(self, command_id: int, new_state: CommandState, error: Optional[str] = None,
+                   exit_status: Optional[int] = None) -> CommandRecord:
+        """
+        Moves a record to a new state. Raises KeyError for unknown or finished
+        IDs and ValueError for moves the lifecycle doesn't allow.
+        """
+        with self._lock:
+            record = self._active.get(command_id)
+            if record is None:
+                raise KeyError(f"No active command with ID {command_id}")
+            if new_state not in TRANSITIONS[record.state]:
+                raise ValueError(f"Command {command_id} cannot go from {record.state.value} to {new_state.value}")
+            self._counts[record.state] -= 1
+            self._counts[new_state] += 1
+            record.state = new_state
+            record.updated = time.time()
+            if error is not None:
+                record.error = error
+            if exit_status is not None:
+                record.exit_status = exit_status
+            if new_state in TERMINAL_STATES:
+                del self._active[command_id]
+                self._finished.append(record)
+                self._finished_by_id[command_id] = record
+                if len(self._finished) > self._finished_history:
+                    del self._finished_by_id[self._finished.popleft().command_id]
+            return record
+
+    def try_transition(self, command_id: int, new_state: CommandState, error: Optional[str] = None) -> Optional[CommandRecord]:
+        """Like transition(), but returns None instead of raising (e.g. the record was cancelled meanwhile)."""
+        try:
+            return self.transition(command_id, new_state, error=error)
+        except (KeyError, ValueError):
+            return None
+
+    def count(self, state: CommandState) -> int:
+        """Number of records currently in a state (finished states count everything seen)."""
+        return self._counts[state]
+
+    def active(self) -> List[CommandRecord]:
+        """Unfinished records, oldest first."""
+        with self._lock:
+            return list(self._active.values())
+
+    def in_state(self, state: CommandState) -> List[CommandRecord]:
+        """Unfinished records in the given state, oldest first."""
+        with self._lock:
+            return [record for record in self._active.values() if record.state == state]
+
+    def finished(self) -> List[CommandRecord]:
+        """Recently finished records, oldest first."""
+        with self._lock:
+            return list(self._finished)
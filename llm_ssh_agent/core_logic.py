@@ -3,36 +3,79 @@
 
 import time
 import threading
+from collections import OrderedDict
 from typing import Optional, Callable, List, Tuple
 
-from .app_state import AppState, ChatMessage, SSHLogEntry, SSHConnectionProfile, LLMConfig
-from .llm_interface import LLMInterface
-from .ssh_manager import SSHManager
+from .app_state import AppState, ChatMessage, SSHLogEntry, SSHConnectionProfile, LLMConfig, EndpointStats
+from .command_queue import CommandRecord, CommandState
+from .llm_interface import LLMInterface, LLMError
+from .llm_pool import LLMScheduler
+from .ssh_manager import SSHManager, SSHConnectionPool, COMMAND_TIMEOUT
+from .jobs import JobManager, RemoteJob
+from .host_facts import HostFacts, HostFactsCache, gather_host_facts, host_key
 from .secure_storage import save_ssh_profile, load_all_ssh_profiles, delete_ssh_profile, get_ssh_secret
-from .utils import format_ssh_log
+from .retrieval import OutputRetrievalStore, HashingEmbedder, OllamaEmbedder
+from .policy import CommandPolicy, PolicyDecision, load_policy
+from .utils import format_ssh_log, format_retrieved_context, summarize_output_change, format_policy_log, format_host_facts
+
+# How many (host, command) outputs are remembered for diff-based feedback
+MAX_REMEMBERED_OUTPUTS = 256
+# How long an LLM request waits for host facts still being gathered after connecting
+HOST_FACTS_WAIT = 5.0 # seconds
 
 class CoreLogic:
     """
     Orchestrates the application's logic, managing state and interactions
     between UI, LLM, and SSH components.
     """
-    def __init__(self):
+    def __init__(self, llm_interface: Optional[LLMInterface] = None, retrieval_path: Optional[str] = None,
+                 policy: Optional[CommandPolicy] = None, ssh_pool: Optional[SSHConnectionPool] = None,
+                 llm_scheduler: Optional[LLMScheduler] = None, host_facts_cache: Optional[HostFactsCache] = None):
+        """
+        llm_interface: share an existing LLM interface (e.g. across headless sessions)
+                       instead of creating one from the default config.
+        retrieval_path: where this session's output retrieval index is persisted (None = in memory only).
+        policy: command auto-approval policy; None loads the user's policy file.
+        ssh_pool: share SSH connections with other sessions (see SessionManager).
+        llm_scheduler: queue LLM requests with other sessions instead of sending them right away.
+        host_facts_cache: share gathered host facts with other sessions; None uses the on-disk cache.
+        """
         self.state = AppState()
-        self.ssh_manager = SSHManager()
+        self.ssh_manager = SSHManager(pool=ssh_pool)
+        self.llm_scheduler = llm_scheduler
+        self.last_activity = time.time() # Last UI-visible change, for idle detection
+        self._llm_requests = 0 # Responses being generated right now
+        self.last_llm_error: Optional[str] = None # Error of the latest LLM request, None if it succeeded
+        self.job_manager = JobManager(self.ssh_manager, on_progress=self._on_job_progress, on_finished=self._on_job_finished)
         # Initialize LLM Interface with default config from state
-        self.llm_interface = LLMInterface(self.state.current_llm_config)
+        if llm_interface is not None:
+            self.llm_interface = llm_interface
+            self.state.current_llm_config = llm_interface.config
+        else:
+            self.llm_interface = LLMInterface(self.state.current_llm_config)
+        self.retrieval_path = retrieval_path
+        self.output_store = self._create_output_store(self.state.current_llm_config)
+        # Last output per (host, command), so repeated commands can be fed back as a diff
+        self._last_outputs: "OrderedDict[Tuple[Optional[str], str], str]" = OrderedDict()
         self.state.saved_connections = load_all_ssh_profiles()
+        self.policy = policy if policy is not None else self._load_policy()
+        self.host_facts_cache = host_facts_cache if host_facts_cache is not None else HostFactsCache()
+        self.host_facts: Optional[HostFacts] = None # Facts about the connected host
+        self._host_facts_ready = threading.Event() # Cleared while gathering
+        self._host_facts_ready.set()
 
         # --- Callbacks for UI updates ---
         # These should be set by the UI layer (TUI/GUI)
         self.update_chat_callback: Optional[Callable[[List[ChatMessage]], None]] = None
         self.update_ssh_log_callback: Optional[Callable[[List[SSHLogEntry]], None]] = None
         self.update_connection_status_callback: Optional[Callable[[str], None]] = None
-        self.update_pending_commands_callback: Optional[Callable[[List[str]], None]] = None
+        self.update_pending_commands_callback: Optional[Callable[[List[CommandRecord]], None]] = None # Whole active queue
+        self.update_command_state_callback: Optional[Callable[[CommandRecord], None]] = None # One command changed state
         self.show_message_callback: Optional[Callable[[str, str], None]] = None # (title, message)
 
     def _notify_ui(self, callback: Optional[Callable], *args, **kwargs):
         """Helper to safely call UI update callbacks."""
+        self.last_activity = time.time() # Anything worth showing counts as activity
         if callback:
             try:
                 # If using Textual, ensure calls are thread-safe
@@ -57,14 +100,88 @@ class CoreLogic:
 
         # Optionally feed back to LLM context
         if self.state.feed_ssh_output_to_llm and (stdout or stderr):
-             feedback = f"[SSH_OUTPUT for '{command}']\nSTDOUT:\n{stdout}\nSTDERR:\n{stderr}"
+             feedback = self._diff_feedback(command, stdout, stderr)
+             if feedback is None and self.state.use_output_retrieval:
+                 feedback = self._index_ssh_output(command, stdout, stderr)
+             if feedback is None:
+                 feedback = f"[SSH_OUTPUT for '{command}']\nSTDOUT:\n{stdout}\nSTDERR:\n{stderr}"
              # Add as a system message or special role? Let's use system for now.
-             # Limit length?
              feedback_message = ChatMessage(sender="system", text=feedback)
              self.state.conversation_history.append(feedback_message)
              # Don't necessarily update chat UI with this internal message unless desired
              # self._notify_ui(self.update_chat_callback, self.state.conversation_history)
 
+    def _diff_feedback(self, command: str, stdout: str, stderr: str) -> Optional[str]:
+        """
+        Compares the output with the previous run of the same command on the same
+        host. Returns a short "unchanged" note or a compact diff, or None if the
+        full output should be fed back.
+        """
+        host = self.state.active_connection.profile.profile_name if self.state.active_connection else None
+        key = (host, command)
+        output = stdout if not stderr else f"{stdout}\nSTDERR:\n{stderr}"
+        previous = self._last_outputs.pop(key, None)
+        self._last_outputs[key] = output # Re-insert as most recently used
+        if len(self._last_outputs) > MAX_REMEMBERED_OUTPUTS:
+            self._last_outputs.popitem(last=False)
+
+        if previous is None:
+            return None
+        diff = summarize_output_change(previous, output)
+        if diff is None:
+            return None
+        if not diff:
+            return f"[SSH_OUTPUT for '{command}': unchanged since the previous run]"
+        if self.state.use_output_retrieval:
+            # Index just the changed lines; the earlier output is already indexed
+            try:
+                self.output_store.add_output(command, diff, host=host)
+            except Exception as e:
+                print(f"Error indexing SSH output diff: {e}")
+        return f"[SSH_OUTPUT for '{command}': changed since the previous run, unified diff]\n{diff}"
+
+    def _index_ssh_output(self, command: str, stdout: str, stderr: str) -> Optional[str]:
+        """
+        Stores an output in the retrieval index and returns the short note that
+        goes into the history instead. Returns None if indexing failed.
+        """
+        output = stdout if not stderr else f"{stdout}\nSTDERR:\n{stderr}"
+        host = self.state.active_connection.profile.profile_name if self.state.active_connection else None
+        try:
+            chunk_count = self.output_store.add_output(command, output, host=host)
+        except Exception as e:
+            print(f"Error indexing SSH output, sending it inline instead: {e}")
+            return None
+        line_count = len(output.strip().splitlines())
+        errors = ", with errors" if stderr else ""
+        return f"[SSH_OUTPUT for '{command}': {line_count} lines{errors}, indexed as {chunk_count} chunk(s); relevant parts are provided as context]"
+
+    def _create_output_store(self, config: LLMConfig) -> OutputRetrievalStore:
+        """Builds the retrieval index with the embedder selected in the LLM config."""
+        if config.embedding_model:
+            embedder = OllamaEmbedder(self.llm_interface.client, config.embedding_model)
+        else:
+            embedder = HashingEmbedder()
+        return OutputRetrievalStore(embedder, path=self.retrieval_path)
+
+    def _retrieve_context(self, history: List[ChatMessage]) -> Optional[str]:
+        """Looks up the indexed output chunks most relevant to the latest turn, from the connected host only."""
+        connection = self.state.active_connection
+        if not self.state.use_output_retrieval or len(self.output_store) == 0 or not connection:
+            return None
+        # Query with the latest user message plus everything after it (e.g. the
+        # notes of commands just run), so fresh output is found as well
+        start = len(history) - 1
+        while start > 0 and history[start].sender != "user":
+            start -= 1
+        query = "\n".join(msg.text for msg in history[start:])
+        try:
+            results = self.output_store.search(query, top_k=self.state.retrieval_top_k, host=connection.profile.profile_name)
+        except Exception as e:
+            print(f"Error searching SSH output index: {e}")
+            return None
+        return format_retrieved_context([chunk for _, chunk in results]) or None
+
 
     # --- Connection Management ---
 
@@ -72,31 +189,59 @@ class CoreLogic:
         """Returns a list of saved profile names."""
         return list(self.state.saved_connections.keys())
 
-    def connect_ssh(self, profile_name: str):
-        """Initiates an SSH connection using a saved profile."""
+    def connect_ssh(self, profile_name: str, blocking: bool = False) -> bool:
+        """
+        Initiates an SSH connection using a saved profile.
+        With blocking=True the connection is made in the calling thread (headless use)
+        and the return value tells whether it succeeded.
+        """
         if profile_name not in self.state.saved_connections:
             self._notify_ui(self.update_connection_status_callback, f"Error: Profile '{profile_name}' not found.")
-            return
+            return False
 
         profile = self.state.saved_connections[profile_name]
         self._notify_ui(self.update_connection_status_callback, f"Connecting to {profile.hostname}...")
 
+        if blocking:
+            return self._connect_ssh_thread(profile)
         # Run connection in a separate thread to avoid blocking UI
         threading.Thread(target=self._connect_ssh_thread, args=(profile,), daemon=True).start()
+        return True
 
-    def _connect_ssh_thread(self, profile: SSHConnectionProfile):
+    def _connect_ssh_thread(self, profile: SSHConnectionProfile) -> bool:
         """Background thread function for SSH connection."""
+        self.host_facts = None
         success, message = self.ssh_manager.connect(profile)
         self.state.active_connection = self.ssh_manager.get_connection_state() # Update state
         self._notify_ui(self.update_connection_status_callback, message)
         if success:
+            if self.state.prefetch_host_facts:
+                # In parallel with the user typing their first message
+                self._host_facts_ready.clear()
+                threading.Thread(target=self._gather_host_facts_thread, args=(profile,), daemon=True).start()
             self._add_system_message(f"SSH connection established to {profile.hostname}.")
         else:
              self._add_system_message(f"SSH connection failed: {message}")
-
+        return success
+
+
+    def _gather_host_facts_thread(self, profile: SSHConnectionProfile):
+        """Background thread: collects (or loads cached) facts about the newly connected host."""
+        try:
+            facts = gather_host_facts(self.ssh_manager, self.host_facts_cache,
+                                      host_key(profile.username, profile.hostname, profile.port))
+            connection = self.state.active_connection
+            if connection and connection.is_connected and connection.profile is profile:
+                self.host_facts = facts
+                print(f"Host facts for {profile.hostname}: {facts.os or facts.os_id}, {len(facts.services)} running service(s).")
+        except Exception as e:
+            print(f"Could not gather host facts for {profile.hostname}: {e}")
+        finally:
+            self._host_facts_ready.set()
 
     def disconnect_ssh(self):
         """Disconnects the current SSH session."""
+        self.host_facts = None
         if self.state.active_connection and self.state.active_connection.is_connected:
             hostname = self.state.active_connection.profile.hostname
             self.ssh_manager.disconnect()
@@ -127,8 +272,11 @@ class CoreLogic:
 
     # --- Chat and Command Execution ---
 
-    def send_message_to_llm(self, user_message: str):
-        """Sends a user message to the LLM and processes the response."""
+    def send_message_to_llm(self, user_message: str, blocking: bool = False):
+        """
+        Sends a user message to the LLM and processes the response.
+        With blocking=True the response is generated in the calling thread.
+        """
         if not user_message.strip():
             return
 
@@ -141,92 +289,303 @@ class CoreLogic:
         self.state.conversation_history.append(thinking_message)
         self._notify_ui(self.update_chat_callback, self.state.conversation_history)
 
+        if blocking:
+            self._generate_llm_response_thread(thinking_message)
+            return
         # Run LLM generation in a separate thread
-        threading.Thread(target=self._generate_llm_response_thread, daemon=True).start()
+        threading.Thread(target=self._generate_llm_response_thread, args=(thinking_message,), daemon=True).start()
 
-    def _generate_llm_response_thread(self):
+    def _generate_llm_response_thread(self, reply_message: ChatMessage):
         """Background thread function for LLM response generation."""
         # Pass relevant history (maybe limit length later)
-        # Exclude the "Thinking..." message
-        history_to_send = self.state.conversation_history[:-1]
-        text_response, ssh_commands = self.llm_interface.generate_response(history_to_send)
+        # Exclude the "Thinking..." message (other messages may have been added after it)
+        history_to_send = [msg for msg in self.state.conversation_history if msg is not reply_message]
+        context = self._retrieve_context(history_to_send)
+        self._host_facts_ready.wait(HOST_FACTS_WAIT) # Usually done long before the first message
+        host_facts = format_host_facts(self.host_facts) if self.host_facts else None
+        self._llm_requests += 1
+        self.last_llm_error = None
+        try:
+            if self.llm_scheduler is not None:
+                text_response, ssh_commands = self.llm_scheduler.run(self.llm_interface.generate_response, history_to_send,
+                                                                     context=context, host_facts=host_facts, raise_errors=True)
+            else:
+                text_response, ssh_commands = self.llm_interface.generate_response(history_to_send, context=context,
+                                                                                   host_facts=host_facts, raise_errors=True)
+        except LLMError as e:
+            # Shown in place of the reply, and kept for callers that need to tell failure apart (batch runs)
+            self.last_llm_error = str(e)
+            text_response, ssh_commands = str(e), []
+        finally:
+            self._llm_requests -= 1
 
         # Update the placeholder message with the actual response
-        self.state.conversation_history[-1].text = text_response if text_response else "[LLM provided no text response]"
+        reply_message.text = text_response if text_response else "[LLM provided no text response]"
         self._notify_ui(self.update_chat_callback, self.state.conversation_history)
 
         # Handle detected SSH commands
         if ssh_commands:
-            self.state.pending_ssh_commands.extend(ssh_commands)
-            self._notify_ui(self.update_pending_commands_callback, self.state.pending_ssh_commands)
-            # Optionally add a system message about pending commands
-            self._add_system_message(f"LLM proposed {len(ssh_commands)} command(s) for execution (awaiting approval).")
-
+            records = [self.state.command_queue.add(command, message_id=reply_message.message_id) for command in ssh_commands]
+            auto_approved = self._apply_command_policy(records)
+            queued = len(records) - len(auto_approved) - sum(1 for r in records if r.state == CommandState.CANCELLED)
+            self._notify_ui(self.update_pending_commands_callback, self.state.command_queue.active())
+            if queued:
+                # Optionally add a system message about pending commands
+                self._add_system_message(f"LLM proposed {queued} command(s) for execution (awaiting approval).")
+            if auto_approved:
+                # Already on a background thread, so run them right here
+                self._add_system_message(f"Policy auto-approved {len(auto_approved)} command(s).")
+                self._execute_commands_thread(auto_approved)
+
+    def _apply_command_policy(self, records: List[CommandRecord]) -> List[int]:
+        """
+        Checks newly proposed commands against the auto-approval policy and
+        records every decision in the SSH log. Allowed commands are moved to
+        approved, denied ones to cancelled; the rest stay proposed.
+        Returns the IDs of the auto-approved commands.
+        """
+        connection = self.state.active_connection
+        if not connection or not connection.is_connected:
+            return [] # Nothing can run anyway; let the user decide later
+        if not len(self.policy):
+            return [] # No policy configured, everything needs approval
+
+        auto_approved, denied = [], 0
+        for record in records:
+            if record.host and not self._is_active_host(record.host):
+                decision = PolicyDecision(action="ask", reason="targets another host")
+            else:
+                decision = self.policy.evaluate(record.command, host=connection.profile.profile_name, groups=connection.profile.groups)
+            self._add_policy_log_entry(record.command, decision)
+            if decision.action == "allow":
+                self.state.command_queue.transition(record.command_id, CommandState.APPROVED)
+                auto_approved.append(record.command_id)
+            elif decision.action == "deny":
+                self.state.command_queue.transition(record.command_id, CommandState.CANCELLED, error=f"Denied by policy ({decision.reason})")
+                denied += 1
+        if denied:
+            self._add_system_message(f"Policy denied {denied} proposed command(s); see the SSH log.")
+        return auto_approved
+
+    def _add_policy_log_entry(self, command: str, decision: PolicyDecision):
+        """Records an auto-approval decision in the SSH log."""
+        entry = SSHLogEntry(command=command, output=format_policy_log(command, decision.action, decision.reason),
+                            timestamp=time.time(), kind="policy")
+        self.state.ssh_log.append(entry)
+        self._notify_ui(self.update_ssh_log_callback, self.state.ssh_log)
 
-    def approve_commands(self, commands_to_execute: List[str]):
-        """Executes a list of approved commands."""
+    def _load_policy(self) -> CommandPolicy:
+        """Loads the auto-approval policy file; an invalid file disables auto-approval."""
+        try:
+            policy = load_policy()
+        except ValueError as e:
+            print(f"Error loading command policy, auto-approval disabled: {e}")
+            return CommandPolicy()
+        if len(policy):
+            print(f"Loaded command policy with {len(policy)} rule(s).")
+        return policy
+
+    def reload_policy(self):
+        """Re-reads the auto-approval policy file."""
+        self.policy = self._load_policy()
+        self._add_system_message(f"Command policy reloaded ({len(self.policy)} rule(s)).")
+
+
+    def _set_command_state(self, command_id: int, new_state: CommandState, error: Optional[str] = None,
+                           exit_status: Optional[int] = None) -> Optional[CommandRecord]:
+        """Moves a command to a new lifecycle state and tells the UI. Returns None if the move isn't allowed."""
+        try:
+            record = self.state.command_queue.transition(command_id, new_state, error=error, exit_status=exit_status)
+        except (KeyError, ValueError) as e:
+            print(f"Warning: {e}")
+            return None
+        self._notify_ui(self.update_command_state_callback, record)
+        return record
+
+    def approve_commands(self, command_ids: List[int], blocking: bool = False):
+        """
+        Approves pending commands by ID and executes them in order.
+        With blocking=True they run in the calling thread.
+        """
         if not self.state.active_connection or not self.state.active_connection.is_connected:
             self._add_system_message("Cannot execute commands: Not connected via SSH.")
             self._notify_ui(self.show_message_callback, "Execution Error", "Not connected via SSH.")
-            # Clear the commands that couldn't be run
-            self.state.pending_ssh_commands = [cmd for cmd in self.state.pending_ssh_commands if cmd not in commands_to_execute]
-            self._notify_ui(self.update_pending_commands_callback, self.state.pending_ssh_commands)
+            # Cancel the commands that couldn't be run
+            for command_id in command_ids:
+                self._set_command_state(command_id, CommandState.CANCELLED, error="Not connected via SSH.")
+            self._notify_ui(self.update_pending_commands_callback, self.state.command_queue.active())
             return
 
+        approved = [command_id for command_id in command_ids if self._set_command_state(command_id, CommandState.APPROVED)]
+        if not approved:
+            return
+        if blocking:
+            self._execute_commands_thread(approved)
+            return
         # Run execution in a thread to avoid blocking
-        threading.Thread(target=self._execute_commands_thread, args=(commands_to_execute,), daemon=True).start()
+        threading.Thread(target=self._execute_commands_thread, args=(approved,), daemon=True).start()
 
-    def _execute_commands_thread(self, commands: List[str]):
+    def _execute_commands_thread(self, command_ids: List[int]):
         """Background thread to execute approved SSH commands sequentially."""
         executed_count = 0
-        for command in commands:
+        for position, command_id in enumerate(command_ids):
+            record = self.state.command_queue.get(command_id)
+            if record is None or record.state != CommandState.APPROVED:
+                continue # Cancelled in the meantime
+
             # Check connection again before each command (it might drop)
             if not self.state.active_connection or not self.state.active_connection.is_connected:
-                 self._add_system_message(f"SSH connection lost. Stopping execution at command: {command}")
-                 # Remove remaining commands (including current one) from pending
-                 try:
-                     idx = self.state.pending_ssh_commands.index(command)
-                     self.state.pending_ssh_commands = self.state.pending_ssh_commands[:idx]
-                 except ValueError: # Should not happen if logic is correct
-                      pass
-                 self._notify_ui(self.update_pending_commands_callback, self.state.pending_ssh_commands)
+                 self._add_system_message(f"SSH connection lost. Stopping execution at command: {record.command}")
+                 # Cancel the remaining commands (including the current one)
+                 for remaining_id in command_ids[position:]:
+                     if self.state.command_queue.try_transition(remaining_id, CommandState.CANCELLED, error="SSH connection lost."):
+                         self._notify_ui(self.update_command_state_callback, self.state.command_queue.get(remaining_id))
                  break # Stop executing this batch
 
-            self._add_system_message(f"Executing approved command: {command}")
-            stdout, stderr = self.ssh_manager.execute_command(command)
-            self._add_ssh_log_entry(command, stdout, stderr) # This also feeds back to LLM if enabled
-
-            # Remove the executed command from the pending list
-            try:
-                self.state.pending_ssh_commands.remove(command)
-                executed_count += 1
-            except ValueError:
-                print(f"Warning: Command '{command}' was executed but not found in pending list.") # Log this anomaly
-
-            # Update UI progressively
-            self._notify_ui(self.update_pending_commands_callback, self.state.pending_ssh_commands)
+            if record.host and not self._is_active_host(record.host):
+                # The LLM asked for a different host than the one we're connected to
+                self._add_system_message(f"Skipping command for host '{record.host}' (not the active connection): {record.command}")
+                self._set_command_state(command_id, CommandState.CANCELLED, error=f"Host '{record.host}' is not the active connection.")
+                continue
+
+            if record.background or (record.timeout or 0) > COMMAND_TIMEOUT:
+                # Long-running: hand it to the job manager (which enforces record.timeout) and move on
+                self._start_background_job(record)
+                continue
+
+            if not self._set_command_state(command_id, CommandState.RUNNING):
+                continue
+            self._add_system_message(f"Executing approved command: {record.command}")
+            stdout, stderr, exit_status = self.ssh_manager.execute_command_with_status(record.command, timeout=record.timeout)
+            self._add_ssh_log_entry(record.command, stdout, stderr) # This also feeds back to LLM if enabled
+            if exit_status == 0:
+                self._set_command_state(command_id, CommandState.DONE, exit_status=exit_status)
+            else:
+                self._set_command_state(command_id, CommandState.FAILED, exit_status=exit_status,
+                                        error=stderr.strip().splitlines()[-1] if stderr.strip() else None)
+            executed_count += 1
             time.sleep(0.1) # Small delay between commands
 
+        self._notify_ui(self.update_pending_commands_callback, self.state.command_queue.active())
         self._add_system_message(f"Finished executing batch of {executed_count} command(s).")
 
 
-    def reject_commands(self, commands_to_reject: List[str]):
-        """Removes commands from the pending list without execution."""
-        rejected_count = 0
-        for command in commands_to_reject:
-             try:
-                  self.state.pending_ssh_commands.remove(command)
-                  rejected_count += 1
-             except ValueError:
-                  pass # Command might have already been removed/approved
+    def _start_background_job(self, record: CommandRecord):
+        """Starts an approved command as a detached remote job."""
+        if not self._set_command_state(record.command_id, CommandState.RUNNING):
+            return
+        record.background = True
+        try:
+            self.job_manager.start(record.command_id, record.command, self.state.active_connection.profile.profile_name,
+                                   timeout=record.timeout)
+        except Exception as e:
+            self._set_command_state(record.command_id, CommandState.FAILED, error=f"Could not start background job: {e}")
+            self._add_system_message(f"Could not start background job for '{record.command}': {e}")
+            return
+        limit = f" (time limit {record.timeout}s)" if record.timeout else ""
+        self._add_system_message(f"Started background job for: {record.command}{limit}")
+
+    def _on_job_progress(self, job: RemoteJob, new_output: str):
+        """Job manager callback: new output arrived for a background job."""
+        record = self.state.command_queue.get(job.command_id)
+        if record is None:
+            return
+        lines = [line for line in new_output.splitlines() if line.strip()]
+        if lines:
+            record.progress = lines[-1][:200]
+        record.output_bytes = job.offset
+        self._notify_ui(self.update_command_state_callback, record)
+
+    def _on_job_finished(self, job: RemoteJob):
+        """Job manager callback: a background job exited or was killed; log it and summarize it for the LLM."""
+        duration = int(job.finished - job.started)
+        elapsed = f"{duration // 60}m{duration % 60:02d}s"
+        if job.cancelled:
+            self._set_command_state(job.command_id, CommandState.CANCELLED, error="Cancelled by user.")
+            self._add_system_message(f"Killed cancelled background job '{job.command}' after {elapsed}.")
+            return
+        if job.timed_out:
+            stderr = f"Timed out after {job.timeout}s"
+        else:
+            stderr = "" if job.exit_status == 0 else f"Command exited with status {job.exit_status}"
+        self._add_ssh_log_entry(job.command, job.output, stderr) # Full output to the log, compact feedback to the LLM
+        if job.exit_status == 0 and not job.timed_out:
+            self._set_command_state(job.command_id, CommandState.DONE, exit_status=0)
+            outcome = "finished with exit status 0"
+        else:
+            self._set_command_state(job.command_id, CommandState.FAILED, exit_status=job.exit_status, error=stderr)
+            outcome = "timed out" if job.timed_out else f"finished with exit status {job.exit_status}"
+        self._add_system_message(f"Background job '{job.command}' {outcome} "
+                                 f"after {elapsed} ({job.offset} bytes of output).")
+
+    def cancel_command(self, command_id: int):
+        """Cancels a command that hasn't finished: pending/approved ones are dropped, background jobs are killed."""
+        record = self.state.command_queue.get(command_id)
+        if record is None:
+            return
+        if record.state == CommandState.RUNNING and record.background:
+            if not self.job_manager.cancel(command_id):
+                return # Finished just now
+            if self.job_manager.get(command_id) is not None:
+                # Not connected to its host: it keeps running until the kill goes through
+                record.progress = "Cancel pending: will be killed on reconnect"
+                self._notify_ui(self.update_command_state_callback, record)
+                self._add_system_message(f"Background job '{record.command}' will be killed once its host is reconnected.")
+            # Otherwise _on_job_finished already marked it cancelled
+        elif record.state in (CommandState.PROPOSED, CommandState.APPROVED):
+            self._set_command_state(command_id, CommandState.CANCELLED, error="Cancelled by user.")
+            self._notify_ui(self.update_pending_commands_callback, self.state.command_queue.active())
+        else:
+            self._notify_ui(self.show_message_callback, "Cannot Cancel", f"Command '{record.command}' is {record.state.value}.")
+
+    def stop_background_jobs(self) -> Tuple[List[str], List[str]]:
+        """
+        Cancels every unfinished background job, e.g. before the session goes away.
+        Jobs that can't be killed right now (host not connected) are no longer tracked.
+        Returns (killed, orphaned) commands; orphaned ones may still be running remotely.
+        """
+        killed, orphaned = [], []
+        for job in self.job_manager.running():
+            self.cancel_command(job.command_id)
+            (killed if self.job_manager.get(job.command_id) is None else orphaned).append(job.command)
+        for job in self.job_manager.forget():
+            print(f"Background job {job.job_id} (pid {job.pid}) on {job.profile_name} is orphaned: {job.command}")
+        return killed, orphaned
+
+    def is_idle(self) -> bool:
+        """True if nothing is in flight: no LLM response being generated and no command approved or running."""
+        return (self._llm_requests == 0
+                and not self.job_manager.running()
+                and self.state.command_queue.count(CommandState.APPROVED) == 0
+                and self.state.command_queue.count(CommandState.RUNNING) == 0)
+
+    def _is_active_host(self, host: str) -> bool:
+        """Checks whether a host named by the LLM refers to the active connection."""
+        profile = self.state.active_connection.profile
+        return host in (profile.profile_name, profile.hostname)
+
+    def reject_commands(self, command_ids: List[int]):
+        """Cancels pending commands by ID without executing them."""
+        rejected_count = sum(1 for command_id in command_ids
+                             if self._set_command_state(command_id, CommandState.CANCELLED, error="Rejected by user."))
         if rejected_count > 0:
             self._add_system_message(f"Rejected {rejected_count} command(s).")
-            self._notify_ui(self.update_pending_commands_callback, self.state.pending_ssh_commands)
+            self._notify_ui(self.update_pending_commands_callback, self.state.command_queue.active())
+
+    def get_pending_commands(self) -> List[CommandRecord]:
+        """Commands still waiting for approval, oldest first."""
+        return self.state.command_queue.in_state(CommandState.PROPOSED)
 
     # --- Configuration ---
     def update_llm_settings(self, new_config: LLMConfig):
          """Updates the LLM configuration."""
          self.state.current_llm_config = new_config
          self.llm_interface.update_config(new_config) # Re-init LLM client if needed
+         # The embedder may use the (re-created) LLM client or a different model
+         self.output_store = self._create_output_store(new_config)
          self._add_system_message(f"LLM settings updated. Provider: {new_config.provider}, Model: {new_config.model_name}")
          # Persist config? Need config.py module for that.
+
+    def get_llm_backend_stats(self) -> List[EndpointStats]:
+        """Returns per-endpoint health and latency stats of the LLM backend pool."""
+        return self.llm_interface.get_backend_stats()
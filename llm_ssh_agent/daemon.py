@@ -0,0 +1,664 @@
+# File: llm_ssh_agent/daemon.py
+# Type: Python Module
+
+# Long-lived agent daemon, in the spirit of ssh's ControlMaster: it owns the
+# sessions, SSH transports and LLM client, and serves them over a Unix domain
+# socket. Frontends (the TUI with --attach, headless scripts) are thin
+# clients, so attaching is near-instant and sessions survive UI crashes.
+#
+# Protocol: every frame is a 4-byte big-endian length followed by a UTF-8
+# JSON object.
+#     request:   {"id": 7, "method": "call", "params": {...}}
+#     response:  {"id": 7, "result": ...}  or  {"id": 7, "error": "..."}
+#     event:     {"event": "chat", "session": "<id>", "data": {...}}
+# Events are pushed for the sessions a client has attached to. They carry
+# deltas (changed chat messages, new SSH log entries), not whole histories.
+
+import argparse
+import itertools
+import json
+import os
+import queue
+import signal
+import socket
+import struct
+import sys
+import threading
+from dataclasses import asdict
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from .app_state import AppState, ChatMessage, SSHLogEntry, SSHConnectionProfile, SSHConnectionState, LLMConfig, EndpointStats
+from .command_queue import CommandQueue, CommandRecord, CommandState
+from .core_logic import CoreLogic
+from .llm_interface import LLMInterface
+from .secure_storage import CONFIG_DIR
+from .sessions import SessionInfo, SessionManager, record_from_dict, record_to_dict
+
+SOCKET_PATH = os.path.join(CONFIG_DIR, "agent.sock")
+PROTOCOL_VERSION = 1
+MAX_FRAME_SIZE = 64 * 1024 * 1024 # Refuse anything larger (corrupt length prefix)
+CALL_TIMEOUT = 60.0 # seconds a client waits for a response
+
+_HEADER = struct.Struct(">I")
+
+# CoreLogic methods clients may call on a session, with their allowed keyword arguments
+SESSION_METHODS = {
+    "send_message_to_llm": ("user_message", "blocking"),
+    "approve_commands": ("command_ids", "blocking"),
+    "reject_commands": ("command_ids",),
+    "cancel_command": ("command_id",),
+    "connect_ssh": ("profile_name", "blocking"),
+    "disconnect_ssh": (),
+    "reload_policy": (),
+    "get_saved_connections": (),
+    "get_llm_backend_stats": (),
+}
+
+
+class DaemonError(RuntimeError):
+    """An error reported by the daemon, or the connection to it failed."""
+
+
+# --- Framing ---
+
+def send_frame(sock: socket.socket, payload: Dict[str, Any]):
+    data = json.dumps(payload, separators=(",", ":"), default=str).encode("utf-8")
+    sock.sendall(_HEADER.pack(len(data)) + data)
+
+def _recv_exact(sock: socket.socket, size: int) -> Optional[bytes]:
+    buffer = bytearray()
+    while len(buffer) < size:
+        chunk = sock.recv(size - len(buffer))
+        if not chunk:
+            return None
+        buffer.extend(chunk)
+    return bytes(buffer)
+
+def recv_frame(sock: socket.socket) -> Optional[Dict[str, Any]]:
+    """Reads one frame; returns None when the peer closed the connection."""
+    header = _recv_exact(sock, _HEADER.size)
+    if header is None:
+        return None
+    (size,) = _HEADER.unpack(header)
+    if size > MAX_FRAME_SIZE:
+        raise DaemonError(f"Frame of {size} bytes exceeds the {MAX_FRAME_SIZE} byte limit")
+    data = _recv_exact(sock, size)
+    if data is None:
+        return None
+    return json.loads(data.decode("utf-8"))
+
+
+def _connection_to_dict(connection: Optional[SSHConnectionState]) -> Optional[Dict[str, Any]]:
+    if connection is None:
+        return None
+    return {"profile": asdict(connection.profile), "is_connected": connection.is_connected, "error": connection.error}
+
+def _connection_from_dict(data: Optional[Dict[str, Any]]) -> Optional[SSHConnectionState]:
+    if data is None:
+        return None
+    return SSHConnectionState(profile=SSHConnectionProfile(**data["profile"]), is_connected=data["is_connected"], error=data["error"])
+
+
+# --- Server ---
+
+class _ClientConnection:
+    """One attached frontend. Responses and events share the socket, so writes are serialized."""
+
+    def __init__(self, sock: socket.socket):
+        self.sock = sock
+        self.attached: Set[str] = set()
+        self.closed = False
+        self._write_lock = threading.Lock()
+
+    def send(self, payload: Dict[str, Any]):
+        if self.closed:
+            return
+        try:
+            with self._write_lock:
+                send_frame(self.sock, payload)
+        except OSError:
+            self.closed = True # The reader loop notices and cleans up
+
+
+class _SessionChannel:
+    """
+    Fans one session's CoreLogic callbacks out to the clients attached to it.
+    Chat updates only carry the messages that changed since the last event
+    and SSH log updates only the new entries.
+    """
+
+    def __init__(self, session_id: str, core_logic: CoreLogic):
+        self.session_id = session_id
+        self.core_logic = core_logic
+        self.subscribers: Set[_ClientConnection] = set()
+        self._lock = threading.Lock()
+        # What clients already have (from the snapshot they attached with, or earlier events)
+        self._sent_texts: Dict[int, str] = {message.message_id: message.text for message in core_logic.state.conversation_history}
+        self._sent_log = len(core_logic.state.ssh_log)
+        core_logic.update_chat_callback = self._on_chat
+        core_logic.update_ssh_log_callback = self._on_ssh_log
+        core_logic.update_connection_status_callback = self._on_connection_status
+        core_logic.update_pending_commands_callback = self._on_pending_commands
+        core_logic.update_command_state_callback = self._on_command_state
+        core_logic.show_message_callback = self._on_show_message
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Full session state for a newly attached client."""
+        state = self.core_logic.state
+        return {
+            "conversation": [asdict(message) for message in state.conversation_history],
+            "ssh_log": [asdict(entry) for entry in state.ssh_log],
+            "commands": [record_to_dict(record) for record in state.command_queue.finished() + state.command_queue.active()],
+            "connection": _connection_to_dict(state.active_connection),
+            "saved_connections": {name: asdict(profile) for name, profile in state.saved_connections.items()},
+        }
+
+    def attach(self, client: _ClientConnection) -> Dict[str, Any]:
+        # Under the lock, so no event slips in between the snapshot and the subscription
+        with self._lock:
+            self.subscribers.add(client)
+            return self.snapshot()
+
+    def detach(self, client: _ClientConnection):
+        with self._lock:
+            self.subscribers.discard(client)
+
+    def _broadcast(self, kind: str, data: Dict[str, Any]):
+        # Callers hold self._lock
+        payload = {"event": kind, "session": self.session_id, "data": data}
+        for client in list(self.subscribers):
+            client.send(payload)
+
+    def _on_chat(self, history: List[ChatMessage]):
+        with self._lock:
+            # Messages are only ever appended or edited in place (the "Thinking..." placeholder)
+            changed = [message for message in history if self._sent_texts.get(message.message_id) != message.text]
+            for message in changed:
+                self._sent_texts[message.message_id] = message.text
+            if changed:
+                self._broadcast("chat", {"messages": [asdict(message) for message in changed]})
+
+    def _on_ssh_log(self, log_entries: List[SSHLogEntry]):
+        with self._lock:
+            start = min(self._sent_log, len(log_entries))
+            self._sent_log = len(log_entries)
+            self._broadcast("ssh_log", {"start": start, "entries": [asdict(entry) for entry in log_entries[start:]]})
+
+    def _on_connection_status(self, status: str):
+        with self._lock:
+            self._broadcast("connection_status", {"status": status,
+                                                  "connection": _connection_to_dict(self.core_logic.state.active_connection)})
+
+    def _on_pending_commands(self, commands: List[CommandRecord]):
+        with self._lock:
+            self._broadcast("pending_commands", {"commands": [record_to_dict(record) for record in commands]})
+
+    def _on_command_state(self, record: CommandRecord):
+        with self._lock:
+            self._broadcast("command_state", {"command": record_to_dict(record)})
+
+    def _on_show_message(self, title: str, message: str):
+        with self._lock:
+            self._broadcast("message", {"title": title, "text": message})
+
+
+class AgentDaemon:
+    """Serves a SessionManager over a Unix domain socket; one thread per client."""
+
+    def __init__(self, session_manager: SessionManager, path: str = SOCKET_PATH):
+        self.session_manager = session_manager
+        self.path = path
+        self._channels: Dict[str, _SessionChannel] = {}
+        self._lock = threading.Lock()
+        self._server: Optional[socket.socket] = None
+        self._stopping = threading.Event()
+
+    def _bind(self) -> socket.socket:
+        if os.path.exists(self.path):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.path)
+                raise DaemonError(f"Another daemon is already listening on {self.path}")
+            except (ConnectionRefusedError, FileNotFoundError):
+                os.unlink(self.path) # Left behind by a daemon that died
+            finally:
+                probe.close()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        old_umask = os.umask(0o177) # Socket is created 0600: only this user can drive the agent
+        try:
+            server.bind(self.path)
+        finally:
+            os.umask(old_umask)
+        server.listen()
+        return server
+
+    def serve_forever(self):
+        """Accepts clients until stop() is called."""
+        self._server = self._bind()
+        print(f"Agent daemon listening on {self.path} (pid {os.getpid()}).")
+        try:
+            while not self._stopping.is_set():
+                try:
+                    sock, _ = self._server.accept()
+                except OSError:
+                    break # Listening socket closed by stop()
+                threading.Thread(target=self._serve_client, args=(_ClientConnection(sock),), daemon=True).start()
+        finally:
+            self._cleanup()
+
+    def stop(self):
+        self._stopping.set()
+        if self._server is not None:
+            try:
+                self._server.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self._server.close()
+
+    def _cleanup(self):
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+        self.session_manager.shutdown() # Saves the sessions; they're restored when the daemon restarts
+        print("Agent daemon stopped.")
+
+    def _serve_client(self, client: _ClientConnection):
+        try:
+            while not client.closed:
+                try:
+                    request = recv_frame(client.sock)
+                except (OSError, ValueError, DaemonError) as e:
+                    print(f"Dropping daemon client: {e}")
+                    break
+                if request is None:
+                    break
+                request_id = request.get("id")
+                try:
+                    result = self._dispatch(client, request.get("method"), request.get("params") or {})
+                    client.send({"id": request_id, "result": result})
+                except Exception as e:
+                    client.send({"id": request_id, "error": str(e) or type(e).__name__})
+        finally:
+            client.closed = True
+            for session_id in list(client.attached):
+                self._detach(client, session_id)
+            client.sock.close()
+
+    def _channel(self, session_id: str) -> _SessionChannel:
+        """The session's channel, (re)binding it if the session was paged in since."""
+        core_logic = self.session_manager.get(session_id)
+        with self._lock:
+            channel = self._channels.get(session_id)
+            if channel is None or channel.core_logic is not core_logic:
+                subscribers = channel.subscribers if channel else set()
+                channel = _SessionChannel(session_id, core_logic)
+                channel.subscribers = subscribers
+                self._channels[session_id] = channel
+            return channel
+
+    def _detach(self, client: _ClientConnection, session_id: str):
+        client.attached.discard(session_id)
+        with self._lock:
+            channel = self._channels.get(session_id)
+        if channel is not None:
+            channel.detach(client)
+            self.session_manager.unpin(session_id)
+
+    def _dispatch(self, client: _ClientConnection, method: Optional[str], params: Dict[str, Any]) -> Any:
+        if method == "hello":
+            return {"version": PROTOCOL_VERSION, "pid": os.getpid()}
+        if method == "list_sessions":
+            return [asdict(info) for info in self.session_manager.list_sessions()]
+        if method == "create_session":
+            return self.session_manager.create_session(params.get("name"))
+        if method == "close_session":
+            session_id = params["session"]
+            with self._lock:
+                channel = self._channels.pop(session_id, None)
+            for subscriber in (channel.subscribers if channel else ()):
+                subscriber.attached.discard(session_id)
+            self.session_manager.close_session(session_id)
+            return None
+        if method == "attach":
+            session_id = params["session"]
+            if session_id in client.attached:
+                return self._channel(session_id).snapshot()
+            self.session_manager.pin(session_id) # Attached sessions are never paged out
+            client.attached.add(session_id)
+            return self._channel(session_id).attach(client)
+        if method == "detach":
+            if params["session"] in client.attached:
+                self._detach(client, params["session"])
+            return None
+        if method == "call":
+            session_id, name = params["session"], params["name"]
+            if name not in SESSION_METHODS:
+                raise DaemonError(f"Method '{name}' can't be called remotely")
+            kwargs = params.get("kwargs") or {}
+            unknown = set(kwargs) - set(SESSION_METHODS[name])
+            if unknown:
+                raise DaemonError(f"Unexpected argument(s) for {name}: {', '.join(sorted(unknown))}")
+            result = getattr(self._channel(session_id).core_logic, name)(**kwargs)
+            if isinstance(result, list):
+                return [asdict(item) if hasattr(item, "__dataclass_fields__") else item for item in result]
+            return result
+        if method == "shutdown":
+            threading.Thread(target=self.stop, daemon=True).start() # After this response went out
+            return None
+        raise DaemonError(f"Unknown method '{method}'")
+
+
+# --- Client ---
+
+class DaemonClient:
+    """
+    Connection to a running daemon. Responses are matched to calls by ID on a
+    reader thread; events are handed to on_event from a separate thread, so a
+    slow event handler (e.g. one waiting for the UI thread) can't hold up responses.
+    """
+
+    def __init__(self, path: str = SOCKET_PATH, on_event: Optional[Callable[[str, Optional[str], Dict[str, Any]], None]] = None):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            self.sock.connect(path)
+        except OSError as e:
+            self.sock.close()
+            raise DaemonError(f"No agent daemon listening on {path}: {e}")
+        self.on_event = on_event # (kind, session_id, data); kind "closed" when the connection is lost
+        self._ids = itertools.count(1)
+        self._pending: Dict[int, Dict[str, Any]] = {}
+        self._pending_lock = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._events: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue()
+        self.closed = False
+        threading.Thread(target=self._read_loop, daemon=True).start()
+        threading.Thread(target=self._event_loop, daemon=True).start()
+        hello = self.call("hello")
+        if hello.get("version") != PROTOCOL_VERSION:
+            self.close()
+            raise DaemonError(f"Daemon speaks protocol version {hello.get('version')}, expected {PROTOCOL_VERSION}")
+
+    def call(self, method: str, params: Optional[Dict[str, Any]] = None, timeout: Optional[float] = CALL_TIMEOUT) -> Any:
+        """
+        Sends a request and waits for its response (timeout None waits as long
+        as it takes, e.g. for blocking calls). Raises DaemonError on errors.
+        """
+        if self.closed:
+            raise DaemonError("Not connected to the agent daemon")
+        request_id = next(self._ids)
+        try:
+            with self._write_lock:
+                send_frame(self.sock, {"id": request_id, "method": method, "params": params or {}})
+        except OSError as e:
+            raise DaemonError(f"Lost connection to the agent daemon: {e}")
+        with self._pending_lock:
+            if not self._pending_lock.wait_for(lambda: request_id in self._pending or self.closed, timeout=timeout):
+                raise DaemonError(f"Agent daemon did not answer '{method}' within {timeout:.0f}s")
+            response = self._pending.pop(request_id, None)
+        if response is None:
+            raise DaemonError("Lost connection to the agent daemon")
+        if "error" in response:
+            raise DaemonError(response["error"])
+        return response.get("result")
+
+    def close(self):
+        self.closed = True
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+
+    def _read_loop(self):
+        try:
+            while True:
+                frame = recv_frame(self.sock)
+                if frame is None:
+                    break
+                if "event" in frame:
+                    self._events.put(frame)
+                else:
+                    with self._pending_lock:
+                        self._pending[frame.get("id")] = frame
+                        self._pending_lock.notify_all()
+        except (OSError, ValueError, DaemonError):
+            pass
+        with self._pending_lock:
+            self.closed = True
+            self._pending_lock.notify_all()
+        self._events.put({"event": "closed", "session": None, "data": {}})
+        self._events.put(None)
+
+    def _event_loop(self):
+        while True:
+            frame = self._events.get()
+            if frame is None:
+                return
+            if self.on_event:
+                try:
+                    self.on_event(frame["event"], frame.get("session"), frame.get("data") or {})
+                except Exception as e:
+                    print(f"Error handling daemon event {frame['event']}: {e}")
+
+
+class RemoteCoreLogic:
+    """
+    Stand-in for CoreLogic in a frontend attached to the daemon. The state is
+    a local mirror kept current by events; actions are forwarded to the daemon.
+    The UI callbacks are the same as CoreLogic's.
+    """
+
+    def __init__(self, client: DaemonClient, session_id: str, snapshot: Dict[str, Any]):
+        self.client = client
+        self.session_id = session_id
+        self.state = AppState()
+        self.state.conversation_history = [ChatMessage(**message) for message in snapshot["conversation"]]
+        self.state.ssh_log = [SSHLogEntry(**entry) for entry in snapshot["ssh_log"]]
+        self.state.command_queue.restore([record_from_dict(record) for record in snapshot["commands"]])
+        self.state.active_connection = _connection_from_dict(snapshot["connection"])
+        self.state.saved_connections = {name: SSHConnectionProfile(**profile) for name, profile in snapshot["saved_connections"].items()}
+        self._messages_by_id = {message.message_id: message for message in self.state.conversation_history}
+
+        self.update_chat_callback: Optional[Callable[[List[ChatMessage]], None]] = None
+        self.update_ssh_log_callback: Optional[Callable[[List[SSHLogEntry]], None]] = None
+        self.update_connection_status_callback: Optional[Callable[[str], None]] = None
+        self.update_pending_commands_callback: Optional[Callable[[List[CommandRecord]], None]] = None
+        self.update_command_state_callback: Optional[Callable[[CommandRecord], None]] = None
+        self.show_message_callback: Optional[Callable[[str, str], None]] = None
+
+    def _notify_ui(self, callback: Optional[Callable], *args):
+        if callback:
+            try:
+                callback(*args)
+            except Exception as e:
+                print(f"Error in UI callback {callback.__name__}: {e}")
+
+    def _call(self, name: str, **kwargs) -> Any:
+        timeout = None if kwargs.get("blocking") else CALL_TIMEOUT
+        return self.client.call("call", {"session": self.session_id, "name": name, "kwargs": kwargs}, timeout=timeout)
+
+    def _replace_commands(self, records: List[CommandRecord]):
+        """Rebuilds the mirrored queue (state changes may skip steps the daemon didn't report)."""
+        self.state.command_queue = CommandQueue()
+        self.state.command_queue.restore(records)
+
+    def apply_event(self, kind: str, data: Dict[str, Any]):
+        """Updates the mirror from a daemon event and tells the UI."""
+        state = self.state
+        if kind == "chat":
+            for saved in data["messages"]:
+                message = self._messages_by_id.get(saved["message_id"])
+                if message is not None:
+                    message.text = saved["text"]
+                else:
+                    message = ChatMessage(**saved)
+                    self._messages_by_id[message.message_id] = message
+                    state.conversation_history.append(message)
+            self._notify_ui(self.update_chat_callback, state.conversation_history)
+        elif kind == "ssh_log":
+            del state.ssh_log[data["start"]:]
+            state.ssh_log.extend(SSHLogEntry(**entry) for entry in data["entries"])
+            self._notify_ui(self.update_ssh_log_callback, state.ssh_log)
+        elif kind == "connection_status":
+            state.active_connection = _connection_from_dict(data["connection"])
+            self._notify_ui(self.update_connection_status_callback, data["status"])
+        elif kind == "pending_commands":
+            active = [record_from_dict(record) for record in data["commands"]]
+            active_ids = {record.command_id for record in active}
+            finished = [record for record in state.command_queue.finished() if record.command_id not in active_ids]
+            for record in state.command_queue.active():
+                if record.command_id not in active_ids:
+                    # Left the queue without a state event (e.g. denied by policy)
+                    record.state = CommandState.CANCELLED
+                    finished.append(record)
+            self._replace_commands(finished + active)
+            self._notify_ui(self.update_pending_commands_callback, state.command_queue.active())
+        elif kind == "command_state":
+            updated = record_from_dict(data["command"])
+            record = state.command_queue.get(updated.command_id)
+            if record is not None and record.state == updated.state:
+                record.__dict__.update(updated.__dict__) # e.g. background job progress
+            else:
+                records = [r for r in state.command_queue.finished() + state.command_queue.active() if r.command_id != updated.command_id]
+                self._replace_commands(records + [updated])
+                record = updated
+            self._notify_ui(self.update_command_state_callback, record)
+        elif kind == "message":
+            self._notify_ui(self.show_message_callback, data["title"], data["text"])
+        elif kind == "closed":
+            if state.active_connection:
+                state.active_connection.is_connected = False
+            self._notify_ui(self.update_connection_status_callback, "Lost connection to the agent daemon.")
+
+    # --- CoreLogic API, forwarded to the daemon ---
+
+    def get_saved_connections(self) -> List[str]:
+        return list(self.state.saved_connections.keys())
+
+    def connect_ssh(self, profile_name: str, blocking: bool = False) -> bool:
+        return self._call("connect_ssh", profile_name=profile_name, blocking=blocking)
+
+    def disconnect_ssh(self):
+        self._call("disconnect_ssh")
+
+    def send_message_to_llm(self, user_message: str, blocking: bool = False):
+        self._call("send_message_to_llm", user_message=user_message, blocking=blocking)
+
+    def approve_commands(self, command_ids: List[int], blocking: bool = False):
+        self._call("approve_commands", command_ids=command_ids, blocking=blocking)
+
+    def reject_commands(self, command_ids: List[int]):
+        self._call("reject_commands", command_ids=command_ids)
+
+    def cancel_command(self, command_id: int):
+        self._call("cancel_command", command_id=command_id)
+
+    def get_pending_commands(self) -> List[CommandRecord]:
+        return self.state.command_queue.in_state(CommandState.PROPOSED)
+
+    def reload_policy(self):
+        self._call("reload_policy")
+
+    def get_llm_backend_stats(self) -> List[EndpointStats]:
+        return [EndpointStats(**stats) for stats in self._call("get_llm_backend_stats")]
+
+
+class RemoteSessionManager:
+    """Stand-in for SessionManager in a frontend attached to the daemon."""
+
+    def __init__(self, path: str = SOCKET_PATH):
+        self.client = DaemonClient(path, on_event=self._on_event)
+        self.active_session_id: Optional[str] = None
+        self._attached: Dict[str, RemoteCoreLogic] = {}
+
+    def _on_event(self, kind: str, session_id: Optional[str], data: Dict[str, Any]):
+        if kind == "closed":
+            for core_logic in list(self._attached.values()):
+                core_logic.apply_event(kind, data)
+            return
+        core_logic = self._attached.get(session_id)
+        if core_logic is not None:
+            core_logic.apply_event(kind, data)
+
+    def list_sessions(self) -> List[SessionInfo]:
+        return [SessionInfo(**info) for info in self.client.call("list_sessions")]
+
+    def create_session(self, name: Optional[str] = None) -> str:
+        return self.client.call("create_session", {"name": name})
+
+    def get(self, session_id: str) -> RemoteCoreLogic:
+        """Attaches to a session (events start flowing) and returns its proxy."""
+        core_logic = self._attached.get(session_id)
+        if core_logic is None:
+            snapshot = self.client.call("attach", {"session": session_id})
+            core_logic = RemoteCoreLogic(self.client, session_id, snapshot)
+            self._attached[session_id] = core_logic
+        return core_logic
+
+    def activate(self, session_id: str) -> RemoteCoreLogic:
+        """Attaches to a session and detaches from the others (only the active tab needs events)."""
+        core_logic = self.get(session_id)
+        for other_id in [other for other in self._attached if other != session_id]:
+            self.detach(other_id)
+        self.active_session_id = session_id
+        return core_logic
+
+    def detach(self, session_id: str):
+        if self._attached.pop(session_id, None) is not None:
+            self.client.call("detach", {"session": session_id})
+
+    def close_session(self, session_id: str):
+        self._attached.pop(session_id, None)
+        if self.active_session_id == session_id:
+            self.active_session_id = None
+        self.client.call("close_session", {"session": session_id})
+
+    def shutdown(self):
+        """Disconnects this frontend; the daemon and its sessions keep running."""
+        self._attached.clear() # A deliberate detach isn't a lost connection
+        self.client.close()
+
+
+# --- Entry point ---
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="llm-ssh-daemon", description="Run the LLM SSH agent as a background daemon that frontends attach to.")
+    parser.add_argument("--socket", default=SOCKET_PATH, help=f"Unix socket to listen on (default: {SOCKET_PATH}).")
+    parser.add_argument("--model", help="Ollama model to use.")
+    parser.add_argument("--endpoint", action="append", default=[], help="Ollama server URL (repeatable).")
+    parser.add_argument("--stop", action="store_true", help="Ask the daemon on --socket to shut down, then exit.")
+    return parser
+
+
+def run(argv: Optional[List[str]] = None):
+    """Entry point for the agent daemon."""
+    args = build_arg_parser().parse_args(argv)
+    if args.stop:
+        try:
+            DaemonClient(args.socket).call("shutdown")
+        except DaemonError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+        print("Agent daemon is shutting down.")
+        return
+
+    config = LLMConfig(endpoints=args.endpoint)
+    if args.model:
+        config.model_name = args.model
+    session_manager = SessionManager(llm_interface=LLMInterface(config))
+    session_manager.start_idle_paging()
+    daemon = AgentDaemon(session_manager, args.socket)
+    signal.signal(signal.SIGTERM, lambda signum, frame: daemon.stop())
+    try:
+        daemon.serve_forever()
+    except DaemonError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    except KeyboardInterrupt:
+        daemon.stop()
+
+
+if __name__ == "__main__":
+    run()
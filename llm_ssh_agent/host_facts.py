@@ -0,0 +1,193 @@
+# File: llm_ssh_agent/host_facts.py
+# Type: Python Module
+
+# Host fact prefetch: right after connecting, one batched remote script
+# collects what the LLM would otherwise spend its first turns discovering
+# (OS, kernel, init system, package manager, disks, running services).
+# The result is cached per host and reused until it expires or the host
+# reboots (detected through the kernel's boot ID).
+
+import json
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass, field, asdict
+from typing import Dict, List, Optional
+
+from .secure_storage import CONFIG_DIR
+from .ssh_manager import SSHManager
+
+HOST_FACTS_FILE = os.path.join(CONFIG_DIR, "host_facts.json")
+HOST_FACTS_TTL = 3600.0 # seconds before cached facts are gathered again
+FACTS_TIMEOUT = 15 # seconds allowed for the remote fact script
+MAX_SERVICES = 60
+MAX_MOUNTS = 15
+
+# Cheap reboot check, run before trusting cached facts (Linux boot ID, BSD/macOS boot time)
+BOOT_ID_PROBE = "cat /proc/sys/kernel/random/boot_id 2>/dev/null || sysctl -n kern.boottime 2>/dev/null"
+
+# POSIX sh; every section is optional, so it degrades on BusyBox, BSD and macOS
+FACT_SCRIPT = f"""
+echo @@boot_id; {BOOT_ID_PROBE}
+echo @@hostname; hostname 2>/dev/null || uname -n
+echo @@uname; uname -srm
+echo @@os_release; cat /etc/os-release 2>/dev/null || cat /usr/lib/os-release 2>/dev/null
+echo @@init; cat /proc/1/comm 2>/dev/null || ps -p 1 -o comm= 2>/dev/null
+echo @@pkg; for p in apt-get dnf yum zypper apk pacman brew pkg; do command -v $p >/dev/null 2>&1 && {{ echo $p; break; }}; done
+echo @@cpus; nproc 2>/dev/null || getconf _NPROCESSORS_ONLN 2>/dev/null
+echo @@mem; awk '/^MemTotal:/ {{print int($2/1024)}}' /proc/meminfo 2>/dev/null
+echo @@df; {{ df -hP -x tmpfs -x devtmpfs -x squashfs -x overlay 2>/dev/null || df -hP 2>/dev/null; }} | tail -n +2 | head -n {MAX_MOUNTS}
+echo @@services
+if command -v systemctl >/dev/null 2>&1; then
+  systemctl list-units --type=service --state=running --no-legend --plain 2>/dev/null | awk '{{print $1}}' | sed 's/[.]service$//' | head -n {MAX_SERVICES}
+elif command -v rc-status >/dev/null 2>&1; then
+  rc-status -s 2>/dev/null | awk '/started/ {{print $1}}' | head -n {MAX_SERVICES}
+fi
+echo @@containers; for c in docker podman kubectl; do command -v $c >/dev/null 2>&1 && echo $c; done
+true
+"""
+
+# One `df -P` row: filesystem, size, used, available, capacity, mount point.
+# Anchored on the capacity column, since both ends may contain spaces.
+DF_LINE_REGEX = re.compile(r"^(?P<fs>.+?)\s+(?P<size>\S+)\s+\S+\s+\S+\s+(?P<use>\d+%|-)\s+(?P<mount>\S.*)$")
+
+@dataclass
+class HostFacts:
+    """Structured profile of a remote host, as gathered by FACT_SCRIPT."""
+    hostname: Optional[str] = None
+    boot_id: Optional[str] = None
+    os: Optional[str] = None # PRETTY_NAME from os-release
+    os_id: Optional[str] = None # e.g. "ubuntu", "rhel"
+    os_like: Optional[str] = None # ID_LIKE, e.g. "debian"
+    kernel: Optional[str] = None # uname -srm
+    init_system: Optional[str] = None
+    package_manager: Optional[str] = None
+    cpus: Optional[int] = None
+    memory_mb: Optional[int] = None
+    mounts: List[str] = field(default_factory=list) # "mountpoint size use%"
+    services: List[str] = field(default_factory=list) # Running services
+    container_tools: List[str] = field(default_factory=list)
+    collected: float = 0.0
+
+
+def _first_line(lines: List[str]) -> Optional[str]:
+    return lines[0] if lines else None
+
+def _int_or_none(value: Optional[str]) -> Optional[int]:
+    return int(value) if value and value.isdigit() else None
+
+def _parse_df(lines: List[str]) -> List[str]:
+    """Turns `df -hP` rows into "mountpoint size use%" entries."""
+    mounts = []
+    for line in lines:
+        match = DF_LINE_REGEX.match(line)
+        if match:
+            mounts.append(f"{match.group('mount')} {match.group('size')} {match.group('use')}")
+    return mounts
+
+def parse_facts(output: str) -> HostFacts:
+    """Parses FACT_SCRIPT output (sections introduced by @@name lines)."""
+    sections: Dict[str, List[str]] = {}
+    current = None
+    for line in output.splitlines():
+        line = line.strip()
+        if line.startswith("@@"):
+            current = sections.setdefault(line[2:], [])
+        elif line and current is not None:
+            current.append(line)
+
+    os_release = {}
+    for line in sections.get("os_release", []):
+        key, sep, value = line.partition("=")
+        if sep:
+            os_release[key] = value.strip().strip('"')
+
+    init = _first_line(sections.get("init", []))
+    return HostFacts(
+        hostname=_first_line(sections.get("hostname", [])),
+        boot_id=_first_line(sections.get("boot_id", [])),
+        os=os_release.get("PRETTY_NAME") or os_release.get("NAME"),
+        os_id=os_release.get("ID"),
+        os_like=os_release.get("ID_LIKE"),
+        kernel=_first_line(sections.get("uname", [])),
+        init_system=os.path.basename(init) if init else None, # ps may report a path
+        package_manager=_first_line(sections.get("pkg", [])),
+        cpus=_int_or_none(_first_line(sections.get("cpus", []))),
+        memory_mb=_int_or_none(_first_line(sections.get("mem", []))),
+        mounts=_parse_df(sections.get("df", [])),
+        services=sections.get("services", []),
+        container_tools=sections.get("containers", []),
+        collected=time.time(),
+    )
+
+
+class HostFactsCache:
+    """
+    Facts per host (user@hostname:port), persisted to a JSON file. Entries are
+    valid for ttl seconds and only while the host's boot ID is unchanged.
+    """
+
+    def __init__(self, path: Optional[str] = HOST_FACTS_FILE, ttl: float = HOST_FACTS_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._entries: Dict[str, HostFacts] = self._read() if path else {}
+        self._lock = threading.Lock()
+
+    def _read(self) -> Dict[str, HostFacts]:
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "r") as f:
+                return {key: HostFacts(**data) for key, data in json.load(f).items()}
+        except (IOError, ValueError, TypeError) as e:
+            print(f"Ignoring unreadable host facts cache {self.path}: {e}")
+            return {}
+
+    def get(self, key: str, boot_id: Optional[str] = None) -> Optional[HostFacts]:
+        """Cached facts, or None if missing, expired or from before a reboot."""
+        with self._lock:
+            facts = self._entries.get(key)
+        if facts is None or time.time() - facts.collected > self.ttl:
+            return None
+        if boot_id and facts.boot_id and boot_id != facts.boot_id:
+            return None # Rebooted since: kernel, mounts and services may all differ
+        return facts
+
+    def put(self, key: str, facts: HostFacts):
+        with self._lock:
+            self._entries[key] = facts
+            if not self.path:
+                return
+            # Merge with what other processes wrote meanwhile, then replace atomically
+            entries = self._read()
+            entries[key] = facts
+            now = time.time()
+            entries = {k: v for k, v in entries.items() if now - v.collected <= self.ttl}
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                with open(self.path + ".tmp", "w") as f:
+                    json.dump({k: asdict(v) for k, v in entries.items()}, f)
+                os.replace(self.path + ".tmp", self.path)
+            except (IOError, OSError) as e:
+                print(f"Error saving host facts cache: {e}")
+
+
+def host_key(username: str, hostname: str, port: int) -> str:
+    return f"{username}@{hostname}:{port}"
+
+
+def gather_host_facts(ssh_manager: SSHManager, cache: HostFactsCache, key: str) -> HostFacts:
+    """
+    Returns the connected host's facts: from the cache if still valid (one
+    quick boot ID probe), otherwise by running FACT_SCRIPT. Raises on SSH errors.
+    """
+    stdout, _, _ = ssh_manager.run_raw(BOOT_ID_PROBE, timeout=FACTS_TIMEOUT)
+    boot_id = stdout.decode("utf-8", errors="replace").strip() or None
+    cached = cache.get(key, boot_id)
+    if cached is not None:
+        return cached
+    stdout, _, _ = ssh_manager.run_raw(FACT_SCRIPT, timeout=FACTS_TIMEOUT)
+    facts = parse_facts(stdout.decode("utf-8", errors="replace"))
+    cache.put(key, facts)
+    return facts
@@ -0,0 +1,262 @@
+# File: llm_ssh_agent/jobs.py
+# Type: Python Module
+
+# Background jobs: long-running commands are started detached on the remote
+# host with their output spooled to a file, then polled incrementally over
+# the existing SSH connection instead of holding a channel open.
+
+import shlex
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+from .ssh_manager import SSHManager
+
+# Remote spool directory for job output and exit status (one subdirectory per job)
+REMOTE_JOB_DIR = "$HOME/.llm_ssh_agent/jobs"
+POLL_INTERVAL = 2.0 # seconds between polls of running jobs
+MAX_READ_BYTES = 64 * 1024 # Output read per job per poll
+MAX_KEPT_OUTPUT = 256 * 1024 # Output kept locally per job (the tail, if longer)
+# Seconds between SIGTERM and SIGKILL when a job runs past its timeout
+KILL_AFTER = 10
+# Extra seconds past a job's timeout before the poller kills it itself
+# (when the remote host has no timeout(1), or it didn't work)
+TIMEOUT_GRACE = KILL_AFTER + 2 * POLL_INTERVAL
+# Exit statuses of timeout(1) when it had to stop the command (124) or kill it (128 + 9)
+TIMEOUT_STATUSES = (124, 137)
+# Spool file holding the pid of the job's timeout(1), which is also its process group
+TIMEOUT_PID_FILE = "timeout.pid"
+
+@dataclass
+class RemoteJob:
+    """A command running detached on the remote host."""
+    job_id: str
+    command_id: int
+    command: str
+    profile_name: str # Connection the job was started on; only polled while connected there
+    timeout: Optional[int] = None # Seconds; None = no limit
+    pid: Optional[int] = None
+    offset: int = 0 # Bytes of the spool file read so far
+    output: str = "" # Collected output (tail, bounded by MAX_KEPT_OUTPUT)
+    started: float = 0.0
+    finished: Optional[float] = None
+    exit_status: Optional[int] = None
+    cancelled: bool = False # Set on cancel; the kill waits for a connection to the job's host
+    timed_out: bool = False
+
+    @property
+    def spool_dir(self) -> str:
+        return f"{REMOTE_JOB_DIR}/{self.job_id}"
+
+
+class JobManager:
+    """
+    Starts, polls and cancels background jobs; one poller thread serves all of them.
+    A job stays listed by running() until it exited or was killed.
+    """
+
+    def __init__(self, ssh_manager: SSHManager,
+                 on_progress: Optional[Callable[[RemoteJob, str], None]] = None,
+                 on_finished: Optional[Callable[[RemoteJob], None]] = None,
+                 poll_interval: float = POLL_INTERVAL):
+        self.ssh_manager = ssh_manager
+        self.on_progress = on_progress # (job, new_output)
+        self.on_finished = on_finished
+        self.poll_interval = poll_interval
+        self._jobs: Dict[int, RemoteJob] = {} # command_id -> running job
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock) # Notified whenever a job has been reported finished
+        self._reporting = 0 # Jobs no longer tracked whose on_finished is still running
+        self._poller: Optional[threading.Thread] = None
+
+    def start(self, command_id: int, command: str, profile_name: str, timeout: Optional[int] = None) -> RemoteJob:
+        """
+        Launches a command as a detached remote job. Raises on SSH errors.
+        timeout: seconds the command may run before it is stopped (None = no limit).
+        """
+        job = RemoteJob(job_id=uuid.uuid4().hex[:12], command_id=command_id, command=command,
+                        profile_name=profile_name, timeout=timeout, started=time.time())
+        if timeout:
+            # timeout(1) stops the command's process group but leaves the wrapper
+            # running, so the exit status is still recorded. GNU timeout moves into
+            # a process group of its own, so its pid is saved (before the exec, so
+            # there is no window where it runs unrecorded) for _signal_command.
+            # Without timeout(1) the poller kills the whole job once TIMEOUT_GRACE has passed.
+            timed = (f'echo $$ > "$LLM_SSH_JOB_DIR/{TIMEOUT_PID_FILE}"; '
+                     f"exec timeout -k {KILL_AFTER} {int(timeout)} sh -c {shlex.quote(command)}")
+            body = (f"if command -v timeout >/dev/null 2>&1; then sh -c {shlex.quote(timed)}; "
+                    f"else sh -c {shlex.quote(command)}; fi")
+        else:
+            # Subshell so 'exit' in the command still records a status
+            body = f"(\n{command}\n)"
+        # The status file is written atomically so a poll never reads it half-written
+        wrapper = (f"{body}\n"
+                   'echo $? > "$LLM_SSH_JOB_DIR/exit.tmp" && mv "$LLM_SSH_JOB_DIR/exit.tmp" "$LLM_SSH_JOB_DIR/exit"')
+        launcher = (f'd="{job.spool_dir}"; mkdir -p "$d" || exit 1; '
+                    # setsid puts the job in its own process group so cancel can kill all of it
+                    'S=; command -v setsid >/dev/null 2>&1 && S=setsid; '
+                    f'LLM_SSH_JOB_DIR="$d" $S nohup sh -c {shlex.quote(wrapper)} > "$d/out" 2>&1 < /dev/null & echo $!')
+        stdout, stderr, status = self.ssh_manager.run_raw(launcher)
+        if status != 0:
+            raise RuntimeError(stderr.decode("utf-8", errors="replace").strip() or f"Job launcher exited with status {status}")
+        job.pid = int(stdout.decode().strip().splitlines()[-1])
+        self.adopt(job)
+        print(f"Started background job {job.job_id} (pid {job.pid}): {command}")
+        return job
+
+    def adopt(self, job: RemoteJob):
+        """Tracks a job started elsewhere (e.g. saved with a session that was paged out)."""
+        with self._lock:
+            self._jobs[job.command_id] = job
+            if self._poller is None or not self._poller.is_alive():
+                self._poller = threading.Thread(target=self._poll_loop, daemon=True)
+                self._poller.start()
+
+    def forget(self) -> List[RemoteJob]:
+        """Stops tracking every job, without touching them remotely. Returns the dropped jobs."""
+        with self._changed:
+            jobs = list(self._jobs.values())
+            self._jobs.clear()
+            self._changed.notify_all()
+        return jobs
+
+    def cancel(self, command_id: int) -> bool:
+        """
+        Kills a running job (its whole process group) and stops tracking it.
+        Returns False if there is no such job. When the job's host isn't connected,
+        or the kill fails, the job stays listed with cancelled set and the poller
+        kills it after reconnecting. on_finished is called once it has been killed.
+        """
+        with self._lock:
+            job = self._jobs.get(command_id)
+            if job is None:
+                return False
+            job.cancelled = True
+        if self._connected_to(job.profile_name):
+            self._kill(job)
+        return True
+
+    def running(self) -> List[RemoteJob]:
+        """Jobs that haven't exited or been killed yet, including cancelled ones awaiting their kill."""
+        with self._lock:
+            return list(self._jobs.values())
+
+    def get(self, command_id: int) -> Optional[RemoteJob]:
+        with self._lock:
+            return self._jobs.get(command_id)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        Blocks until no jobs are left (and on_finished has returned for all of them)
+        or the timeout expires; returns True if none are left.
+        """
+        with self._changed:
+            return self._changed.wait_for(lambda: not self._jobs and not self._reporting, timeout)
+
+    def _connected_to(self, profile_name: str) -> bool:
+        connection = self.ssh_manager.get_connection_state()
+        return bool(connection and connection.is_connected and connection.profile.profile_name == profile_name)
+
+    def _claim(self, job: RemoteJob) -> bool:
+        """
+        Stops tracking a finished job so the caller can clean up and _report() it.
+        False if someone else already did (exit and kill raced, or forget() dropped it).
+        """
+        with self._lock:
+            if self._jobs.pop(job.command_id, None) is None:
+                return False
+            self._reporting += 1
+        job.finished = time.time()
+        return True
+
+    def _report(self, job: RemoteJob):
+        """Calls on_finished for a claimed job, then wakes up wait()."""
+        try:
+            if self.on_finished:
+                self.on_finished(job)
+        finally:
+            with self._changed:
+                self._reporting -= 1
+                self._changed.notify_all()
+
+    def _kill(self, job: RemoteJob):
+        """Kills a cancelled job and removes its spool directory; it stays tracked if that fails."""
+        try:
+            self.ssh_manager.run_raw(f'{self._signal_command(job, "TERM")}; rm -rf "{job.spool_dir}"')
+        except Exception as e:
+            print(f"Error cancelling background job {job.job_id}, retrying once reconnected: {e}")
+            return
+        if self._claim(job):
+            self._report(job)
+
+    # --- Polling ---
+
+    def _poll_loop(self):
+        while True:
+            time.sleep(self.poll_interval)
+            with self._lock:
+                jobs = list(self._jobs.values())
+                if not jobs:
+                    self._poller = None
+                    return
+            for job in jobs:
+                if not self._connected_to(job.profile_name):
+                    continue # Jobs keep running remotely; resume once reconnected
+                if job.cancelled:
+                    self._kill(job) # Cancelled while disconnected
+                    continue
+                try:
+                    if job.timeout and not job.timed_out and time.time() > job.started + job.timeout + TIMEOUT_GRACE:
+                        self._stop_overdue(job)
+                    self._poll(job)
+                except Exception as e:
+                    print(f"Error polling background job {job.job_id}: {e}")
+
+    def _stop_overdue(self, job: RemoteJob):
+        """Kills a job that outlived its timeout by more than TIMEOUT_GRACE (no timeout(1) remotely)."""
+        print(f"Background job {job.job_id} ran past its {job.timeout}s timeout, killing it.")
+        self.ssh_manager.run_raw(self._signal_command(job, "KILL"))
+        job.timed_out = True
+
+    @staticmethod
+    def _signal_command(job: RemoteJob, signal: str) -> str:
+        """
+        Shell snippet signalling everything the job started: its own process group,
+        then timeout(1)'s. In that order, a timeout(1) that hadn't left the job's
+        group yet is hit by the first kill, and one that had has written its pid.
+        """
+        return (f'kill -{signal} -{job.pid} 2>/dev/null || kill -{signal} {job.pid} 2>/dev/null; '
+                f'p=$(cat "{job.spool_dir}/{TIMEOUT_PID_FILE}" 2>/dev/null); [ -z "$p" ] || kill -{signal} -"$p" 2>/dev/null; true')
+
+    def _poll(self, job: RemoteJob):
+        """Reads new output since the last poll and checks whether the job exited."""
+        # The exit file is checked before reading, so once it exists the read covers all output
+        probe = (f'd="{job.spool_dir}"; if [ -f "$d/exit" ]; then echo "EXIT $(cat "$d/exit")"; else echo RUNNING; fi; '
+                 f'tail -c +{job.offset + 1} "$d/out" 2>/dev/null | head -c {MAX_READ_BYTES}')
+        stdout, _, _ = self.ssh_manager.run_raw(probe)
+        status_line, _, data = stdout.partition(b"\n")
+        if data:
+            job.offset += len(data)
+            text = data.decode("utf-8", errors="replace")
+            job.output = (job.output + text)[-MAX_KEPT_OUTPUT:]
+            if self.on_progress:
+                self.on_progress(job, text)
+
+        status = status_line.decode(errors="replace").split()
+        exited = bool(status) and status[0] == "EXIT"
+        # A job killed by _stop_overdue never writes its exit file
+        if (exited or job.timed_out) and len(data) < MAX_READ_BYTES:
+            if exited:
+                job.exit_status = int(status[1]) if len(status) > 1 and status[1].lstrip("-").isdigit() else None
+            if (job.timeout and job.exit_status in TIMEOUT_STATUSES
+                    and time.time() - job.started >= job.timeout):
+                job.timed_out = True
+            if job.cancelled or not self._claim(job):
+                return # Cancelled or forgotten while we were polling; the spool stays for whoever has it now
+            try:
+                self.ssh_manager.run_raw(f'rm -rf "{job.spool_dir}"')
+            except Exception as e:
+                print(f"Error cleaning up background job {job.job_id}: {e}")
+            self._report(job)
@@ -2,32 +2,96 @@
 # Type: Python Module
 
 import ollama
-from typing import List, Optional, Tuple
+import json
+from typing import Any, Dict, List, Optional, Tuple
 import re
-from .app_state import ChatMessage, LLMConfig
+from .app_state import ChatMessage, LLMConfig, ProposedCommand, EndpointStats
+from .llm_pool import LLMBackendPool
 
 # Regex to find SSH commands formatted as [SSH_COMMAND] command_text
 SSH_COMMAND_REGEX = re.compile(r"\[SSH_COMMAND\]\s*(.*)")
 
+# Upper bound for a timeout requested by the model through the tool call
+MAX_COMMAND_TIMEOUT = 600 # seconds
+
+# Instructions for models without tool support (regex-parsed replies)
+REGEX_SYSTEM_PROMPT = (
+    "You are a helpful assistant with access to an SSH tool. "
+    "When you need to execute a command on the connected remote system, "
+    "format it EXACTLY as follows on its own line: "
+    "[SSH_COMMAND] the_command_to_execute\n"
+    "Do not add any explanation before or after the [SSH_COMMAND] tag on that line. "
+    "You can use multiple [SSH_COMMAND] lines if needed. "
+    "Provide your reasoning or other text on separate lines."
+)
+
+# The tool schema carries the usage details, so the prompt can stay short
+TOOL_SYSTEM_PROMPT = (
+    "You are a helpful assistant for remote system administration. "
+    "Use the run_ssh_command tool to run commands on the connected host; "
+    "every call is reviewed by the user before it runs."
+)
+
+RUN_SSH_COMMAND_TOOL = {
+    'type': 'function',
+    'function': {
+        'name': 'run_ssh_command',
+        'description': 'Run a shell command on a remote host over SSH and return its output.',
+        'parameters': {
+            'type': 'object',
+            'properties': {
+                'command': {
+                    'type': 'string',
+                    'description': 'The exact shell command to run. May span multiple lines (e.g. heredocs).',
+                },
+                'host': {
+                    'type': 'string',
+                    'description': 'Profile name or hostname to run on. Omit to use the active connection.',
+                },
+                'timeout': {
+                    'type': 'integer',
+                    'description': f'Maximum runtime in seconds (1-{MAX_COMMAND_TIMEOUT}).',
+                },
+                'background': {
+                    'type': 'boolean',
+                    'description': 'Run as a background job for long-running commands (builds, backups, log follows); '
+                                   'output is collected and summarized when it finishes.',
+                },
+            },
+            'required': ['command'],
+        },
+    },
+}
+
+class LLMError(RuntimeError):
+    """The LLM request failed; the message is the user-facing error text."""
+
+
 class LLMInterface:
     """Handles interaction with the configured LLM."""
 
     def __init__(self, config: LLMConfig):
         self.config = config
         self.client = None
+        # Models that rejected the 'tools' parameter; these use the regex parser
+        self._models_without_tools = set()
         if self.config.provider == "ollama":
-            try:
-                # If base_url is provided, use it for Ollama client
-                self.client = ollama.Client(host=self.config.base_url) if self.config.base_url else ollama.Client()
-                # Check if model exists? Ollama library might handle this.
-                print(f"Ollama client initialized. Using model: {config.model_name}")
-                # Try a simple list to see if client is working
-                self.client.list()
+            # Every request goes through the pool, even with a single server
+            urls = self.config.endpoints or [self.config.base_url]
+            self.client = LLMBackendPool(
+                urls,
+                hedge_after=self.config.hedge_after,
+                health_check_interval=self.config.health_check_interval,
+            )
+            print(f"Ollama client initialized with {len(urls)} endpoint(s). Using model: {config.model_name}")
+            # Check the endpoints once up front; the pool keeps unhealthy ones
+            # around and re-checks them in the background
+            if self.client.check_health():
                 print("Ollama connection successful.")
-            except Exception as e:
-                print(f"Error initializing Ollama client (host={self.config.base_url}): {e}")
+            else:
+                print(f"Error: no Ollama endpoint reachable ({', '.join(u or 'default' for u in urls)}).")
                 print("LLM functionality may be limited.")
-                self.client = None # Ensure client is None if init failed
+            self.client.start_health_checks()
         # Add elif blocks here for other providers (Gemini, HuggingFace API...)
 
     def update_config(self, new_config: LLMConfig):
@@ -35,68 +99,65 @@ class LLMInterface:
         # Basic implementation: just replace config and re-init client
         # More robust: check if relevant parts changed before re-initializing
         print(f"Updating LLM config to: {new_config}")
+        if isinstance(self.client, LLMBackendPool):
+            self.client.close() # Stop the old pool's health checks
         self.config = new_config
         self.__init__(new_config) # Re-initialize
 
-    def generate_response(self, history: List[ChatMessage]) -> Tuple[Optional[str], List[str]]:
+    def get_backend_stats(self) -> List[EndpointStats]:
+        """Per-endpoint health and latency stats for the LLM backend pool."""
+        if isinstance(self.client, LLMBackendPool):
+            return self.client.get_stats()
+        return []
+
+    def generate_response(self, history: List[ChatMessage], context: Optional[str] = None,
+                          host_facts: Optional[str] = None, raise_errors: bool = False) -> Tuple[Optional[str], List[ProposedCommand]]:
         """
         Generates a response from the LLM based on the conversation history.
-        Returns (text_response, list_of_ssh_commands).
+        context: optional block of earlier SSH output relevant to this turn.
+        host_facts: optional summary of the connected host, added to the system prompt.
+        raise_errors: raise LLMError instead of returning the error text as the response.
+        Returns (text_response, list_of_proposed_commands).
         """
         if not self.client or self.config.provider != "ollama":
-            return "Error: LLM Client not initialized or provider not supported yet.", []
+            error_msg = "Error: LLM Client not initialized or provider not supported yet."
+            if raise_errors:
+                raise LLMError(error_msg)
+            return error_msg, []
 
         # Format history for Ollama API
         messages = [{'role': msg.sender if msg.sender != 'llm' else 'assistant', 'content': msg.text} for msg in history]
+        if context:
+            messages.insert(0, {'role': 'system', 'content': f"Relevant output from earlier SSH commands:\n{context}"})
 
-        # Add system prompt / instructions for SSH command format
-        # This should probably be configurable or part of the initial history
-        system_prompt = (
-            "You are a helpful assistant with access to an SSH tool. "
-            "When you need to execute a command on the connected remote system, "
-            "format it EXACTLY as follows on its own line: "
-            "[SSH_COMMAND] the_command_to_execute\n"
-            "Do not add any explanation before or after the [SSH_COMMAND] tag on that line. "
-            "You can use multiple [SSH_COMMAND] lines if needed. "
-            "Provide your reasoning or other text on separate lines."
-        )
-        # This could be added as the first message or using the 'system' parameter if supported
-        # For simplicity, let's prepend it to the messages list if it's not already there
-        # A more robust approach would be needed for long conversations
-        if not messages or messages[0].get('role') != 'system':
-             messages.insert(0, {'role': 'system', 'content': system_prompt})
-
+        use_tools = self.config.use_tool_calling and self.config.model_name not in self._models_without_tools
 
         try:
-            print(f"Sending request to Ollama model {self.config.model_name}...")
-            response = self.client.chat(
-                model=self.config.model_name,
-                messages=messages,
-                stream=False # Keep it simple first, maybe add streaming later
-            )
-
-            full_response_text = response['message']['content']
+            try:
+                response = self._chat(messages, use_tools, host_facts)
+            except ollama.ResponseError as e:
+                if not use_tools or "does not support tools" not in str(e).lower():
+                    raise
+                # Remember the model and retry with the [SSH_COMMAND] prompt
+                print(f"Model {self.config.model_name} does not support tools, falling back to regex parsing.")
+                self._models_without_tools.add(self.config.model_name)
+                use_tools = False
+                response = self._chat(messages, use_tools, host_facts)
+
+            message = response['message']
+            full_response_text = message.get('content') or ""
             print(f"LLM Raw Response:\n{full_response_text}")
 
-            text_parts = []
-            ssh_commands = []
-            lines = full_response_text.strip().split('\n')
-
-            for line in lines:
-                match = SSH_COMMAND_REGEX.fullmatch(line.strip())
-                if match:
-                    command = match.group(1).strip()
-                    if command: # Avoid empty commands
-                        ssh_commands.append(command)
-                else:
-                    text_parts.append(line)
+            if use_tools:
+                final_text_response = full_response_text.strip()
+                ssh_commands = self._parse_tool_calls(message.get('tool_calls') or [])
+            else:
+                final_text_response, ssh_commands = self._parse_tagged_commands(full_response_text)
 
-            final_text_response = "\n".join(text_parts).strip()
             if not final_text_response and not ssh_commands:
                 # Handle cases where the LLM might return only whitespace or nothing
                 final_text_response = "[LLM returned empty response]"
 
-
             print(f"Parsed Text Response: {final_text_response}")
             print(f"Parsed SSH Commands: {ssh_commands}")
             return final_text_response, ssh_commands
@@ -107,4 +168,77 @@ class LLMInterface:
             # Check if the error indicates the model is not available
             if "model not found" in str(e).lower():
                  error_msg += f"\nPlease ensure the model '{self.config.model_name}' is available in Ollama."
-            return error_msg, []
\ No newline at end of file
+            if raise_errors:
+                raise LLMError(error_msg) from e
+            return error_msg, []
+
+    def _chat(self, messages: List[Dict[str, Any]], use_tools: bool, host_facts: Optional[str] = None):
+        """Sends one chat request, with the tool schema or the regex instructions."""
+        system_prompt = TOOL_SYSTEM_PROMPT if use_tools else REGEX_SYSTEM_PROMPT
+        if host_facts:
+            # Saves the model from spending its first turns on discovery commands
+            system_prompt += f"\n\nConnected host facts (already known, no need to look them up):\n{host_facts}"
+        # Always lead with the instructions; the history itself may start with
+        # unrelated system messages (connection notices etc.)
+        request_messages = [{'role': 'system', 'content': system_prompt}] + messages
+        print(f"Sending request to Ollama model {self.config.model_name} (tools={'on' if use_tools else 'off'})...")
+        kwargs = {'tools': [RUN_SSH_COMMAND_TOOL]} if use_tools else {}
+        return self.client.chat(
+            model=self.config.model_name,
+            messages=request_messages,
+            stream=False, # The pool streams internally and returns the assembled reply
+            **kwargs
+        )
+
+    def _parse_tool_calls(self, tool_calls: List[Any]) -> List[ProposedCommand]:
+        """
+        Converts structured run_ssh_command tool calls into proposed commands.
+        Malformed calls are skipped one by one, so they don't cost the valid ones.
+        """
+        ssh_commands = []
+        for call in tool_calls:
+            function = (call.get('function') if hasattr(call, 'get') else None) or {}
+            name = function.get('name') if hasattr(function, 'get') else None
+            if name != RUN_SSH_COMMAND_TOOL['function']['name']:
+                print(f"Ignoring call to unknown tool: {name}")
+                continue
+            arguments = function.get('arguments') or {}
+            if isinstance(arguments, str): # Some models send the arguments JSON-encoded
+                try:
+                    arguments = json.loads(arguments)
+                except json.JSONDecodeError:
+                    print(f"Ignoring tool call with malformed arguments: {arguments}")
+                    continue
+            if not isinstance(arguments, dict):
+                print(f"Ignoring tool call whose arguments are not an object: {arguments!r}")
+                continue
+            command = str(arguments.get('command') or "").strip()
+            if not command: # Avoid empty commands
+                continue
+            host = arguments.get('host') or None
+            timeout = arguments.get('timeout')
+            try:
+                timeout = max(1, min(int(timeout), MAX_COMMAND_TIMEOUT)) if timeout is not None else None
+            except (TypeError, ValueError):
+                timeout = None
+            background = arguments.get('background') in (True, 'true', 'True', 1)
+            ssh_commands.append(ProposedCommand(command=command, host=str(host) if host else None, timeout=timeout,
+                                                background=background))
+        return ssh_commands
+
+    def _parse_tagged_commands(self, full_response_text: str) -> Tuple[str, List[ProposedCommand]]:
+        """Fallback parser: extracts [SSH_COMMAND] lines from a plain-text reply."""
+        text_parts = []
+        ssh_commands = []
+        lines = full_response_text.strip().split('\n')
+
+        for line in lines:
+            match = SSH_COMMAND_REGEX.fullmatch(line.strip())
+            if match:
+                command = match.group(1).strip()
+                if command: # Avoid empty commands
+                    ssh_commands.append(ProposedCommand(command=command))
+            else:
+                text_parts.append(line)
+
+        return "\n".join(text_parts).strip(), ssh_commands
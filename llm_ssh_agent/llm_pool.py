@@ -0,0 +1,312 @@
+# File: llm_ssh_agent/llm_pool.py
+# Type: Python Module
+
+import itertools
+import queue
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, TypeVar
+
+import ollama
+from .app_state import EndpointStats
+
+# Weight of the newest sample in the latency moving averages
+LATENCY_EWMA_ALPHA = 0.2
+
+T = TypeVar("T")
+
+class _Endpoint:
+    """One Ollama server in the pool, with its client and running counters."""
+
+    def __init__(self, url: Optional[str]):
+        self.url = url
+        self.client = ollama.Client(host=url) if url else ollama.Client()
+        self.healthy = True # Optimistic until the first check says otherwise
+        self.outstanding = 0
+        self.requests = 0
+        self.failures = 0
+        self.hedges_won = 0
+        self.avg_latency: Optional[float] = None
+        self.avg_first_token: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    @property
+    def label(self) -> str:
+        return self.url or "default"
+
+
+class _Attempt:
+    """A single in-flight chat request against one endpoint."""
+
+    def __init__(self, endpoint: _Endpoint, hedged: bool):
+        self.endpoint = endpoint
+        self.hedged = hedged # True if this was fired as the second, hedging request
+        self.cancelled = threading.Event()
+
+
+def _ewma(current: Optional[float], sample: float) -> float:
+    return sample if current is None else (1 - LATENCY_EWMA_ALPHA) * current + LATENCY_EWMA_ALPHA * sample
+
+
+def _is_request_error(error: Exception) -> bool:
+    """True for errors caused by the request itself, which no other endpoint would fix."""
+    # 400s cover e.g. "model does not support tools"; LLMInterface handles those itself
+    return isinstance(error, ollama.ResponseError) and error.status_code == 400
+
+
+class LLMBackendPool:
+    """
+    Spreads chat requests over several Ollama servers.
+    Routes to the healthy endpoint with the fewest outstanding requests, fails
+    over to the next one on errors and can hedge slow requests on a second
+    endpoint. Exposes the same chat()/list() calls as ollama.Client.
+    """
+
+    def __init__(self, urls: List[Optional[str]], hedge_after: Optional[float] = None, health_check_interval: float = 30.0):
+        self.endpoints = [_Endpoint(url) for url in (urls or [None])]
+        self.hedge_after = hedge_after
+        self.health_check_interval = health_check_interval
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._health_thread: Optional[threading.Thread] = None
+
+    # --- Health Checks ---
+
+    def check_health(self) -> bool:
+        """Pings every endpoint once. Returns True if at least one is healthy."""
+        for endpoint in self.endpoints:
+            try:
+                endpoint.client.list()
+                healthy, error = True, None
+            except Exception as e:
+                healthy, error = False, str(e)
+            with self._lock:
+                if endpoint.healthy != healthy:
+                    print(f"LLM endpoint {endpoint.label} is now {'healthy' if healthy else 'unhealthy'}.")
+                endpoint.healthy = healthy
+                if error:
+                    endpoint.last_error = error
+        return any(endpoint.healthy for endpoint in self.endpoints)
+
+    def start_health_checks(self):
+        """Starts the background thread that re-checks endpoints periodically."""
+        if self._health_thread or self.health_check_interval <= 0:
+            return
+        self._health_thread = threading.Thread(target=self._health_check_loop, daemon=True)
+        self._health_thread.start()
+
+    def _health_check_loop(self):
+        while not self._stop_event.wait(self.health_check_interval):
+            self.check_health()
+
+    def close(self):
+        """Stops background health checks."""
+        self._stop_event.set()
+
+    def list(self):
+        """Lists models on the first healthy endpoint (mirrors ollama.Client.list)."""
+        return self._candidates()[0].client.list()
+
+    # --- Routing ---
+
+    def _candidates(self) -> List[_Endpoint]:
+        """Endpoints in routing order: healthy first, then fewest outstanding, then fastest."""
+        with self._lock:
+            return sorted(
+                self.endpoints,
+                key=lambda ep: (not ep.healthy, ep.outstanding, ep.avg_latency if ep.avg_latency is not None else 0.0),
+            )
+
+    def chat(self, **kwargs) -> Dict[str, Any]:
+        """
+        Sends a chat request through the pool and returns the assembled response
+        ({'model': ..., 'message': {'role', 'content', 'tool_calls'}}).
+        The request is always streamed internally so hedging can react to the first token.
+        Raises the last endpoint error if every endpoint failed.
+        """
+        kwargs = dict(kwargs, stream=True)
+        candidates = self._candidates()
+        events: "queue.Queue[tuple]" = queue.Queue()
+        running: Dict[int, _Attempt] = {}
+        winner: Optional[_Attempt] = None
+        last_error: Optional[Exception] = None
+
+        def launch(hedged: bool = False):
+            attempt = _Attempt(candidates.pop(0), hedged)
+            running[id(attempt)] = attempt
+            threading.Thread(target=self._run_attempt, args=(attempt, kwargs, events), daemon=True).start()
+
+        launch()
+        while running:
+            # Only wait with a deadline while a single attempt hasn't produced anything yet
+            can_hedge = self.hedge_after is not None and winner is None and len(running) == 1 and candidates
+            try:
+                kind, attempt, payload = events.get(timeout=self.hedge_after if can_hedge else None)
+            except queue.Empty:
+                print(f"No token after {self.hedge_after}s, hedging request on {candidates[0].label}.")
+                launch(hedged=True)
+                continue
+
+            if kind == "first_token":
+                if winner is None:
+                    winner = attempt
+                    for other in [a for a in running.values() if a is not attempt]:
+                        # Cancelled attempts stop without reporting back, so stop waiting for
+                        # them; their endpoints stay available in case the winner fails mid-stream
+                        other.cancelled.set()
+                        del running[id(other)]
+                        candidates.insert(0, other.endpoint)
+                continue
+
+            if running.pop(id(attempt), None) is None or attempt.cancelled.is_set():
+                continue # A cancelled attempt that ended with an error
+            if kind == "done":
+                if attempt.hedged:
+                    with self._lock:
+                        attempt.endpoint.hedges_won += 1
+                return payload
+
+            # kind == "error"
+            if _is_request_error(payload):
+                for other in running.values():
+                    other.cancelled.set()
+                raise payload
+            last_error = payload
+            print(f"LLM endpoint {attempt.endpoint.label} failed: {payload}")
+            if attempt is winner:
+                winner = None
+            if not running and candidates:
+                launch() # Fail over to the next endpoint
+
+        raise last_error or RuntimeError("No LLM endpoints available.")
+
+    def embed(self, **kwargs) -> Dict[str, Any]:
+        """Runs an embeddings request (mirrors ollama.Client.embed), failing over between endpoints."""
+        last_error: Optional[Exception] = None
+        for endpoint in self._candidates():
+            with self._lock:
+                endpoint.outstanding += 1
+            try:
+                return endpoint.client.embed(**kwargs)
+            except Exception as e:
+                if _is_request_error(e):
+                    raise
+                last_error = e
+                print(f"LLM endpoint {endpoint.label} failed embedding request: {e}")
+            finally:
+                with self._lock:
+                    endpoint.outstanding -= 1
+        raise last_error or RuntimeError("No LLM endpoints available.")
+
+    def _run_attempt(self, attempt: _Attempt, kwargs: Dict[str, Any], events: queue.Queue):
+        """Thread body: streams one request and reports first token / result / error."""
+        endpoint = attempt.endpoint
+        with self._lock:
+            endpoint.outstanding += 1
+            endpoint.requests += 1
+        start = time.monotonic()
+        first_token_at: Optional[float] = None
+        stream = None
+        try:
+            stream = endpoint.client.chat(**kwargs)
+            model = kwargs.get("model")
+            content: List[str] = []
+            tool_calls: List[Any] = []
+            for chunk in stream:
+                if attempt.cancelled.is_set():
+                    return
+                if first_token_at is None:
+                    first_token_at = time.monotonic()
+                    events.put(("first_token", attempt, None))
+                message = chunk["message"]
+                content.append(message.get("content") or "")
+                tool_calls.extend(message.get("tool_calls") or [])
+                model = chunk.get("model") or model
+            if attempt.cancelled.is_set():
+                return
+
+            latency = time.monotonic() - start
+            with self._lock:
+                endpoint.avg_latency = _ewma(endpoint.avg_latency, latency)
+                if first_token_at is not None:
+                    endpoint.avg_first_token = _ewma(endpoint.avg_first_token, first_token_at - start)
+                endpoint.healthy = True
+            response = {"model": model, "message": {"role": "assistant", "content": "".join(content), "tool_calls": tool_calls}}
+            events.put(("done", attempt, response))
+        except Exception as e:
+            if not attempt.cancelled.is_set() and not _is_request_error(e):
+                with self._lock:
+                    endpoint.failures += 1
+                    endpoint.last_error = str(e)
+                    # A missing model is a per-server problem, but the server itself is up
+                    if not (isinstance(e, ollama.ResponseError) and e.status_code == 404):
+                        endpoint.healthy = False
+            events.put(("error", attempt, e))
+        finally:
+            if stream is not None and hasattr(stream, "close"):
+                stream.close() # Drops the HTTP stream of cancelled attempts
+            with self._lock:
+                endpoint.outstanding -= 1
+
+    # --- Stats ---
+
+    def get_stats(self) -> List[EndpointStats]:
+        """Returns a snapshot of per-endpoint health and latency figures."""
+        with self._lock:
+            return [
+                EndpointStats(
+                    url=ep.label,
+                    healthy=ep.healthy,
+                    outstanding=ep.outstanding,
+                    requests=ep.requests,
+                    failures=ep.failures,
+                    hedges_won=ep.hedges_won,
+                    avg_latency=ep.avg_latency,
+                    avg_first_token=ep.avg_first_token,
+                    last_error=ep.last_error,
+                )
+                for ep in self.endpoints
+            ]
+
+
+class LLMScheduler:
+    """
+    Admission control for LLM requests shared by several sessions.
+    At most max_concurrent requests run at once (more would only queue up
+    inside Ollama and slow every session down); the rest wait their turn in
+    arrival order, so a busy session can't starve the others.
+    """
+
+    def __init__(self, max_concurrent: int = 1):
+        self.max_concurrent = max(1, max_concurrent)
+        self._cond = threading.Condition()
+        self._tickets = itertools.count()
+        self._waiting: Deque[int] = deque()
+        self._running = 0
+
+    def run(self, fn: Callable[..., T], *args, **kwargs) -> T:
+        """Runs fn(*args, **kwargs) once a slot is free, blocking until then."""
+        with self._cond:
+            ticket = next(self._tickets)
+            self._waiting.append(ticket)
+            while self._waiting[0] != ticket or self._running >= self.max_concurrent:
+                self._cond.wait()
+            self._waiting.popleft()
+            self._running += 1
+            self._cond.notify_all() # The next in line may fit as well
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self._cond:
+                self._running -= 1
+                self._cond.notify_all()
+
+    @property
+    def waiting(self) -> int:
+        """Requests queued for a slot."""
+        return len(self._waiting)
+
+    @property
+    def running(self) -> int:
+        return self._running
@@ -0,0 +1,303 @@
+# File: llm_ssh_agent/policy.py
+# Type: Python Module
+
+# Auto-approval policy for LLM-proposed commands.
+#
+# Rules come from a JSON file (default ~/.config/llm_ssh_agent/policy.json):
+#
+# {
+#     "rules": [
+#         {"name": "diagnostics", "action": "allow", "commands": ["uptime", "df -h", "systemctl status"]},
+#         {"name": "logs", "action": "allow", "pattern": "tail -n \\d+ /var/log/\\S+", "groups": ["web"]},
+#         {"name": "no sed -i", "action": "allow", "commands": ["sed"], "deny_args": ["-i", "--in-place"]},
+#         {"name": "wipe", "action": "deny", "pattern": "rm -rf? /.*"}
+#     ]
+# }
+#
+# action:     "allow" (run without asking), "deny" (drop) or "ask" (queue for approval)
+# commands:   literal command prefixes, matched on whole words, any arguments may follow
+# pattern:    regular expression that must match the whole (whitespace-normalized) command
+# deny_args:  arguments that disqualify the rule; max_args caps the argument count.
+#             Short flags are also found inside clusters (-ni) and with attached
+#             values (-i.bak), long options with =value or abbreviated (--in-pl),
+#             quoted or not; commands containing $ never match a rule with deny_args.
+#             This narrows allow rules, it is not a sandbox: anything that must
+#             never run belongs in a deny rule.
+# hosts/groups: limit the rule to these profile names / host groups (default: everywhere)
+# allow_shell_operators: allow rules never match commands containing ; | & ` $( < > or
+#             newlines unless this is true
+#
+# When several rules match, deny beats ask beats allow. Commands no rule matches are queued.
+#
+# Rules are bucketed by their literal first word, so a check only runs the
+# rules for the command's first word. Patterns are split at top-level | and a
+# leading group of plain words, e.g. "(start|stop) nginx", counts as literal
+# too. Patterns without a literal first word (".*rm -rf.*") are checked
+# against every command: a handful is free, thousands cost milliseconds.
+
+import json
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .secure_storage import CONFIG_DIR
+
+POLICY_FILE = os.path.join(CONFIG_DIR, "policy.json")
+
+ACTIONS = ("deny", "ask", "allow") # In order of precedence
+SHELL_OPERATOR_REGEX = re.compile(r"[;&|`<>\n]|\$\(")
+WORD_REGEX = re.compile(r"[A-Za-z0-9_/-]+")
+# What may follow a literal first word in a pattern: whitespace (not made optional) or the end
+HEAD_END = r"(?:(?: |\\s)(?![?*{])|$)"
+HEAD_END_REGEX = re.compile(HEAD_END)
+LITERAL_HEAD_REGEX = re.compile(r"([A-Za-z0-9_/-]+)" + HEAD_END)
+# Shell quoting that doesn't change the word it appears in ('-i', "-"i, \-i)
+QUOTING = r"""["'\\]*"""
+
+@dataclass
+class PolicyRule:
+    """A single allow/deny/ask rule as loaded from the policy file."""
+    action: str
+    name: Optional[str] = None
+    commands: List[str] = field(default_factory=list)
+    pattern: Optional[str] = None
+    deny_args: List[str] = field(default_factory=list)
+    max_args: Optional[int] = None
+    hosts: List[str] = field(default_factory=list)
+    groups: List[str] = field(default_factory=list)
+    allow_shell_operators: bool = False
+
+@dataclass
+class PolicyDecision:
+    """Result of checking one command against the policy."""
+    action: str # "allow", "deny" or "ask"
+    rule: Optional[str] = None # Name of the deciding rule, None if no rule matched
+    reason: str = ""
+
+
+def _scan(pattern: str) -> Iterator[Tuple[int, str, int]]:
+    """
+    Yields (position, token, depth) for a regex's tokens outside character
+    classes; escapes come as one two-character token. depth is the group
+    nesting level (a group's parentheses are at the outer level).
+    """
+    depth, i, in_class = 0, 0, False
+    while i < len(pattern):
+        c = pattern[i]
+        if c == "\\":
+            if not in_class:
+                yield i, pattern[i:i + 2], depth
+            i += 2
+            continue
+        if in_class:
+            in_class = c != "]"
+            i += 1
+            continue
+        if c == "[":
+            in_class = True
+            i += 1
+            if pattern[i:i + 1] == "^":
+                i += 1
+            if pattern[i:i + 1] == "]":
+                i += 1 # Literal ] as the first class member
+            continue
+        if c == ")":
+            depth -= 1
+        yield i, c, depth
+        if c == "(":
+            depth += 1
+        i += 1
+
+
+def _split_alternatives(pattern: str) -> List[str]:
+    """Splits a regex at its top-level | (not inside groups or classes)."""
+    cuts = [i for i, token, depth in _scan(pattern) if token == "|" and depth == 0]
+    return [pattern[start + 1:end] for start, end in zip([-1] + cuts, cuts + [len(pattern)])]
+
+
+def _literal_heads(branch: str) -> List[Tuple[Optional[str], str]]:
+    """
+    Returns (literal first word, regex) pairs that together match what the
+    branch (a pattern without top-level |) matches. A leading group of plain
+    words, e.g. (start|stop) x, becomes one pair per word.
+    """
+    head = LITERAL_HEAD_REGEX.match(branch)
+    if head:
+        return [(head.group(1), branch)]
+    if branch.startswith("("):
+        close = next((i for i, token, depth in _scan(branch) if token == ")" and depth == 0), None)
+        if close is not None:
+            inner = branch[1:close]
+            inner = inner[2:] if inner.startswith("?:") else inner
+            words = _split_alternatives(inner)
+            rest = branch[close + 1:]
+            if all(WORD_REGEX.fullmatch(word) for word in words) and HEAD_END_REGEX.match(rest):
+                return [(word, word + rest) for word in words]
+    return [(None, branch)]
+
+
+def _has_backreference(pattern: str) -> bool:
+    return any(len(token) == 2 and token[0] == "\\" and token[1] in "123456789" for _, token, _ in _scan(pattern))
+
+
+def _deny_arg_regex(arg: str) -> str:
+    """Regex for one command line word that counts as the denied argument."""
+    def spelled(text: str) -> str:
+        # Quotes may appear around or inside the word without changing it
+        return QUOTING + QUOTING.join(re.escape(c) for c in text)
+
+    if arg.startswith("--") and len(arg) > 2:
+        # GNU getopt accepts any unambiguous prefix: --in-place, --in-pl, --i
+        name = arg[2:]
+        tail = ""
+        for c in reversed(name[1:]):
+            tail = f"(?:{QUOTING}{re.escape(c)}{tail})?"
+        return spelled("--" + name[0]) + tail + QUOTING + r"(?:=\S*)?(?= |$)"
+    if len(arg) == 2 and arg[0] == "-" and arg[1] != "-":
+        # Clustered with other flags (-ni) or with an attached value (-i.bak)
+        return QUOTING + r"-[^\s-]*" + re.escape(arg[1]) + r"\S*"
+    return spelled(arg) + QUOTING + r"(?:=\S*)?(?= |$)"
+
+
+class _CompiledScope:
+    """
+    Matcher for the rules that apply to one scope.
+    Alternatives are bucketed by their literal first word, so a lookup runs
+    one small combined regex for the command's first word plus one for
+    alternatives without a literal head. The cost of the latter grows with
+    the number of such alternatives.
+    """
+
+    def __init__(self, rules: List[Tuple[int, PolicyRule, List[str]]]):
+        by_head: Dict[Optional[str], List[str]] = {}
+        for index, rule, alternatives in rules:
+            for number, (head, regex) in enumerate(alternatives):
+                # Group names carry the rule index, e.g. r12_0 for rule 12's first alternative
+                by_head.setdefault(head, []).append(f"(?P<r{index}_{number}>{regex})")
+        self._matchers = {head: re.compile("|".join(parts)) for head, parts in by_head.items()}
+
+    def match(self, command: str) -> Optional[int]:
+        """Returns the index of the highest-precedence matching rule, if any."""
+        head = command.split(" ", 1)[0]
+        best = None
+        for matcher in (self._matchers.get(head), self._matchers.get(None)):
+            if matcher is None:
+                continue
+            m = matcher.fullmatch(command)
+            if m:
+                # Alternatives are ordered by precedence, so the first match is the best in this bucket
+                index = int(m.lastgroup[1:].split("_", 1)[0])
+                best = index if best is None else min(best, index)
+        return best
+
+
+class CommandPolicy:
+    """Compiled auto-approval policy. Matchers are built once per host scope and cached."""
+
+    def __init__(self, rules: Optional[List[PolicyRule]] = None):
+        rules = rules or []
+        # Sort once by precedence (file order breaks ties); the position in
+        # self.rules is the rule's priority, _numbers keeps the file position
+        order = sorted(range(len(rules)), key=lambda i: (ACTIONS.index(rules[i].action), i))
+        self.rules = [rules[i] for i in order]
+        self._numbers = [i + 1 for i in order]
+        self._alternatives = [self._compile_rule(rule) for rule in self.rules]
+        self._scope_cache: Dict[Tuple, _CompiledScope] = {}
+        # (host, groups, has_shell_operators) -> matcher, so repeat lookups skip the rule scan
+        self._host_cache: Dict[Tuple, _CompiledScope] = {}
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    @staticmethod
+    def _compile_rule(rule: PolicyRule) -> List[Tuple[Optional[str], str]]:
+        """Turns a rule into (literal head word, regex) alternatives."""
+        guards = ""
+        if rule.deny_args:
+            denied = "|".join(_deny_arg_regex(arg) for arg in rule.deny_args)
+            # $ could spell any argument at run time (variables, $'\x2di')
+            guards += rf"(?!.*\$)(?!.*(?:^| )(?:{denied}))"
+        if rule.max_args is not None:
+            guards += rf"(?=\S+(?: \S+){{0,{int(rule.max_args)}}}$)"
+
+        alternatives = []
+        for prefix in rule.commands:
+            prefix = " ".join(prefix.split())
+            alternatives.append((prefix.split(" ", 1)[0], guards + re.escape(prefix) + r"(?: .*)?"))
+        if rule.pattern:
+            # Each top-level alternative gets its own bucket; filing "rm .*|dd .*" under
+            # "rm" alone would let dd commands slip past it
+            for branch in _split_alternatives(rule.pattern):
+                for head, regex in _literal_heads(branch):
+                    alternatives.append((head, guards + f"(?:{regex})"))
+        return alternatives
+
+    def _scope(self, host: Optional[str], groups: List[str], has_shell_operators: bool) -> _CompiledScope:
+        host_key = (host, tuple(groups), has_shell_operators)
+        scope = self._host_cache.get(host_key)
+        if scope is not None:
+            return scope
+        applicable = tuple(
+            index for index, rule in enumerate(self.rules)
+            if (not rule.hosts and not rule.groups or host in rule.hosts or any(g in rule.groups for g in groups))
+            and not (has_shell_operators and rule.action == "allow" and not rule.allow_shell_operators)
+        )
+        # Hosts with the same applicable rules share one compiled matcher
+        scope = self._scope_cache.get(applicable)
+        if scope is None:
+            scope = _CompiledScope([(i, self.rules[i], self._alternatives[i]) for i in applicable])
+            self._scope_cache[applicable] = scope
+        self._host_cache[host_key] = scope
+        return scope
+
+    def evaluate(self, command: str, host: Optional[str] = None, groups: Optional[List[str]] = None) -> PolicyDecision:
+        """Decides whether a command may run without approval on the given host."""
+        has_shell_operators = bool(SHELL_OPERATOR_REGEX.search(command.strip()))
+        normalized = " ".join(command.split())
+        if not self.rules or not normalized:
+            return PolicyDecision(action="ask", reason="no matching rule")
+        index = self._scope(host, groups or [], has_shell_operators).match(normalized)
+        if index is None:
+            reason = "no matching rule" + (" (contains shell operators)" if has_shell_operators else "")
+            return PolicyDecision(action="ask", reason=reason)
+        rule = self.rules[index]
+        name = rule.name or f"rule #{self._numbers[index]}"
+        return PolicyDecision(action=rule.action, rule=name, reason=f"matched {name}")
+
+
+def load_policy(path: str = POLICY_FILE) -> CommandPolicy:
+    """
+    Loads and compiles the policy file. A missing file gives an empty policy
+    (everything is queued for approval). Raises ValueError on invalid rules.
+    """
+    if not os.path.exists(path):
+        return CommandPolicy()
+    try:
+        with open(path, "r") as f:
+            data = json.load(f)
+    except (IOError, json.JSONDecodeError) as e:
+        raise ValueError(f"Could not read policy file {path}: {e}")
+
+    rules = []
+    for number, entry in enumerate(data.get("rules", []), start=1):
+        try:
+            rule = PolicyRule(**entry)
+        except TypeError as e:
+            raise ValueError(f"Policy rule #{number}: {e}")
+        if rule.action not in ACTIONS:
+            raise ValueError(f"Policy rule #{number}: unknown action '{rule.action}'")
+        if not rule.commands and not rule.pattern:
+            raise ValueError(f"Policy rule #{number}: needs 'commands' or 'pattern'")
+        if rule.pattern:
+            try:
+                compiled = re.compile(rule.pattern)
+                re.compile(f"x(?:{rule.pattern})") # Must also work embedded in the combined matcher
+            except re.error as e:
+                raise ValueError(f"Policy rule #{number}: invalid pattern: {e}")
+            if compiled.groupindex:
+                raise ValueError(f"Policy rule #{number}: named groups are not supported in patterns")
+            if _has_backreference(rule.pattern):
+                raise ValueError(f"Policy rule #{number}: backreferences are not supported in patterns")
+        rules.append(rule)
+    return CommandPolicy(rules)
@@ -0,0 +1,273 @@
+# File: llm_ssh_agent/retrieval.py
+# Type: Python Module
+
+import json
+import os
+import re
+import threading
+import time
+import zlib
+from dataclasses import dataclass, asdict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Chunking of SSH outputs (line windows, overlapping so context isn't cut mid-thought)
+CHUNK_LINES = 40
+CHUNK_OVERLAP = 5
+CHUNK_MAX_CHARS = 1500 # Hard cap per chunk, keeps the injected context bounded
+
+# Index size cap; beyond it the oldest chunks are evicted down to MAX_CHUNKS * EVICT_TO
+MAX_CHUNKS = 20000
+EVICT_TO = 0.75
+
+HASHING_DIMENSIONS = 1024
+TOKEN_REGEX = re.compile(r"[a-z0-9_]+") # Applied to lowercased text; splits paths and unit names
+
+VECTORS_FILE = "vectors.f32"
+CHUNKS_FILE = "chunks.jsonl"
+META_FILE = "meta.json"
+
+@dataclass
+class OutputChunk:
+    """A piece of an SSH command's output stored in the retrieval index."""
+    command: str
+    text: str
+    host: Optional[str] = None
+    timestamp: float = 0.0
+
+
+def chunk_output(text: str, max_lines: int = CHUNK_LINES, overlap: int = CHUNK_OVERLAP) -> List[str]:
+    """Splits command output into overlapping windows of lines."""
+    lines = text.strip().splitlines()
+    if not lines:
+        return []
+    chunks = []
+    step = max(1, max_lines - overlap)
+    for start in range(0, len(lines), step):
+        chunk = "\n".join(lines[start:start + max_lines]).strip()
+        if chunk:
+            chunks.append(chunk[:CHUNK_MAX_CHARS])
+        if start + max_lines >= len(lines):
+            break
+    return chunks
+
+# --- Embedders ---
+
+class HashingEmbedder:
+    """Local, dependency-free embedder: hashed bag of tokens and token bigrams."""
+
+    def __init__(self, dimensions: int = HASHING_DIMENSIONS):
+        self.dimensions = dimensions
+        self.name = f"hashing-{dimensions}"
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            tokens = TOKEN_REGEX.findall(text.lower())
+            features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+            for feature in features:
+                h = zlib.crc32(feature.encode("utf-8"))
+                # Use one hash bit as the sign so collisions tend to cancel out
+                vectors[row, h % self.dimensions] += 1.0 if h & 0x80000000 else -1.0
+        return _normalize(vectors)
+
+
+class OllamaEmbedder:
+    """Embeds through Ollama's embeddings endpoint (client may be an LLMBackendPool)."""
+
+    def __init__(self, client, model_name: str):
+        self.client = client
+        self.model_name = model_name
+        self.name = f"ollama-{model_name}"
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        response = self.client.embed(model=self.model_name, input=texts)
+        return _normalize(np.asarray(response["embeddings"], dtype=np.float32))
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+# --- Store ---
+
+class OutputRetrievalStore:
+    """
+    Vector index over past SSH outputs.
+    Vectors live in a NumPy matrix that grows by doubling; new rows are also
+    appended to disk, so persistence costs only the new data. Every chunk
+    records the host it came from, so searches can stay on one host. Once
+    max_chunks is exceeded the oldest chunks are evicted and the files rewritten.
+    """
+
+    def __init__(self, embedder, path: Optional[str] = None, max_chunks: int = MAX_CHUNKS):
+        self.embedder = embedder
+        self.path = path
+        self.max_chunks = max(1, max_chunks)
+        self._lock = threading.Lock()
+        self._vectors: Optional[np.ndarray] = None # Allocated on first add (dimension comes from the embedder)
+        self._host_ids = np.zeros(0, dtype=np.int32) # Per row, into _host_index
+        self._host_index: Dict[Optional[str], int] = {}
+        self._count = 0
+        self._chunks: List[OutputChunk] = []
+        if self.path:
+            self._load()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def add_output(self, command: str, output: str, host: Optional[str] = None) -> int:
+        """Chunks, embeds and stores an output. Returns the number of chunks added."""
+        texts = chunk_output(output)
+        if not texts:
+            return 0
+        vectors = self.embedder.embed([f"$ {command}\n{text}" for text in texts])
+        now = time.time()
+        chunks = [OutputChunk(command=command, text=text, host=host, timestamp=now) for text in texts]
+        with self._lock:
+            self._append(vectors, chunks)
+            if self._count > self.max_chunks:
+                self._evict(self._count - int(self.max_chunks * EVICT_TO))
+                if self.path:
+                    self._rewrite()
+            elif self.path:
+                self._persist(vectors, chunks)
+        return len(chunks)
+
+    def search(self, query: str, top_k: int = 4, host: Optional[str] = None) -> List[Tuple[float, OutputChunk]]:
+        """
+        Returns up to top_k (score, chunk) pairs, best first.
+        host: only consider chunks from this host (None = every host).
+        """
+        if not query.strip() or top_k <= 0 or self._count == 0:
+            return []
+        query_vector = self.embedder.embed([query])[0]
+        with self._lock:
+            scores = self._vectors[:self._count] @ query_vector
+            candidates = np.arange(self._count)
+            if host is not None:
+                host_id = self._host_index.get(host)
+                if host_id is None:
+                    return []
+                candidates = np.flatnonzero(self._host_ids[:self._count] == host_id)
+                scores = scores[candidates]
+            k = min(top_k, len(candidates))
+            if k == 0:
+                return []
+            # argpartition keeps this O(n) however big the store gets
+            best = np.argpartition(-scores, k - 1)[:k]
+            best = best[np.argsort(-scores[best])]
+            return [(float(scores[i]), self._chunks[candidates[i]]) for i in best]
+
+    def clear(self):
+        """Drops all stored chunks (and their files)."""
+        with self._lock:
+            self._vectors = None
+            self._host_ids = np.zeros(0, dtype=np.int32)
+            self._host_index = {}
+            self._count = 0
+            self._chunks = []
+            if self.path:
+                for name in (VECTORS_FILE, CHUNKS_FILE, META_FILE):
+                    try:
+                        os.remove(os.path.join(self.path, name))
+                    except FileNotFoundError:
+                        pass
+
+    def _append(self, vectors: np.ndarray, chunks: List[OutputChunk]):
+        """Appends rows and their chunks, doubling the matrix capacity when it's full."""
+        if self._vectors is None:
+            self._vectors = np.zeros((max(64, len(vectors)), vectors.shape[1]), dtype=np.float32)
+        needed = self._count + len(vectors)
+        if needed > len(self._vectors):
+            grown = np.zeros((max(needed, 2 * len(self._vectors)), self._vectors.shape[1]), dtype=np.float32)
+            grown[:self._count] = self._vectors[:self._count]
+            self._vectors = grown
+        if needed > len(self._host_ids):
+            grown_ids = np.zeros(len(self._vectors), dtype=np.int32)
+            grown_ids[:self._count] = self._host_ids[:self._count]
+            self._host_ids = grown_ids
+        self._vectors[self._count:needed] = vectors
+        self._host_ids[self._count:needed] = [self._host_index.setdefault(chunk.host, len(self._host_index)) for chunk in chunks]
+        self._chunks.extend(chunks)
+        self._count = needed
+
+    def _evict(self, count: int):
+        """Drops the oldest count chunks (callers hold self._lock)."""
+        keep = self._count - count
+        self._vectors[:keep] = self._vectors[count:self._count]
+        self._host_ids[:keep] = self._host_ids[count:self._count]
+        self._chunks = self._chunks[count:]
+        self._count = keep
+
+    # --- Persistence ---
+
+    def _persist(self, vectors: np.ndarray, chunks: List[OutputChunk]):
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            meta_path = os.path.join(self.path, META_FILE)
+            if not os.path.exists(meta_path):
+                with open(meta_path, "w") as f:
+                    json.dump({"embedder": self.embedder.name, "dimensions": int(vectors.shape[1])}, f)
+            with open(os.path.join(self.path, VECTORS_FILE), "ab") as f:
+                f.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+            with open(os.path.join(self.path, CHUNKS_FILE), "a") as f:
+                for chunk in chunks:
+                    f.write(json.dumps(asdict(chunk)) + "\n")
+        except IOError as e:
+            print(f"Error saving retrieval index: {e}")
+
+    def _rewrite(self):
+        """Replaces the index files with the current contents (after eviction or a damaged load)."""
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            for name in (VECTORS_FILE, CHUNKS_FILE):
+                try:
+                    os.remove(os.path.join(self.path, name))
+                except FileNotFoundError:
+                    pass
+            if self._count:
+                self._persist(self._vectors[:self._count], self._chunks)
+        except OSError as e:
+            print(f"Error rewriting retrieval index: {e}")
+
+    def _load(self):
+        meta_path = os.path.join(self.path, META_FILE)
+        if not os.path.exists(meta_path):
+            return
+        try:
+            with open(meta_path, "r") as f:
+                meta = json.load(f)
+            if meta.get("embedder") != self.embedder.name:
+                # Vectors from another embedder aren't comparable; start over
+                print(f"Retrieval index was built with {meta.get('embedder')}, rebuilding for {self.embedder.name}.")
+                self.clear()
+                return
+            chunks, damaged = [], False
+            with open(os.path.join(self.path, CHUNKS_FILE), "r") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        chunks.append(OutputChunk(**json.loads(line)))
+                    except (ValueError, TypeError):
+                        damaged = True # A torn write; everything after it is unusable too
+                        break
+            dimensions = int(meta["dimensions"])
+            raw = np.fromfile(os.path.join(self.path, VECTORS_FILE), dtype=np.float32)
+            vectors = raw[:len(raw) - len(raw) % dimensions].reshape(-1, dimensions)
+            count = min(len(chunks), len(vectors))
+            if count:
+                self._append(vectors[:count], chunks[:count])
+            if self._count > self.max_chunks:
+                self._evict(self._count - int(self.max_chunks * EVICT_TO))
+                damaged = True
+            if damaged or count != len(chunks) or len(vectors) * dimensions != len(raw) or count != len(vectors):
+                # Rewrite both files so later appends line up again
+                print(f"Retrieval index files were damaged or out of sync, keeping the {self._count} intact entries.")
+                self._rewrite()
+        except (IOError, ValueError, KeyError, TypeError) as e:
+            print(f"Error loading retrieval index, discarding it: {e}")
+            self.clear() # Otherwise later appends would go to files that can never be loaded
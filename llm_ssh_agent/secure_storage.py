@@ -4,7 +4,8 @@
 import keyring
 import json
 import os
-from typing import Optional, Dict
+import threading
+from typing import Optional, Dict, Tuple
 from .app_state import SSHConnectionProfile
 
 # Use a unique service name for keyring
@@ -12,6 +13,12 @@ KEYRING_SERVICE_NAME = "LLM-SSH-Agent"
 CONFIG_DIR = os.path.expanduser("~/.config/llm_ssh_agent")
 PROFILES_FILE = os.path.join(CONFIG_DIR, "profiles.json")
 
+# Secrets already read from the keyring, shared by every session in the process
+# so reconnects don't hit the keyring backend (which may prompt or be slow) each time.
+# (profile_name, secret_type) -> secret (None is cached too: "no secret stored")
+_secret_cache: Dict[Tuple[str, str], Optional[str]] = {}
+_secret_cache_lock = threading.Lock()
+
 def _ensure_config_dir():
     """Ensure the configuration directory exists."""
     os.makedirs(CONFIG_DIR, exist_ok=True)
@@ -24,6 +31,12 @@ def _get_key_passphrase_alias(profile_name: str) -> str:
     """Generate the keyring alias for a profile's key passphrase."""
     return f"{profile_name}_key_passphrase"
 
+def _invalidate_secrets(profile_name: str):
+    """Drops a profile's cached secrets (after they were changed or deleted)."""
+    with _secret_cache_lock:
+        for key in [key for key in _secret_cache if key[0] == profile_name]:
+            del _secret_cache[key]
+
 def save_ssh_profile(profile: SSHConnectionProfile, password: Optional[str] = None, key_passphrase: Optional[str] = None):
     """Saves profile details (non-secrets) to JSON and secrets to keyring."""
     _ensure_config_dir()
@@ -40,6 +53,7 @@ def save_ssh_profile(profile: SSHConnectionProfile, password: Optional[str] = No
         return # Or raise?
 
     # Save secrets to keyring
+    _invalidate_secrets(profile.profile_name)
     try:
         if profile.auth_method == "password" and password:
             keyring.set_password(KEYRING_SERVICE_NAME, _get_password_alias(profile.profile_name), password)
@@ -85,11 +99,18 @@ def get_ssh_secret(profile_name: str, secret_type: str) -> Optional[str]:
     else:
         return None # Invalid secret type
 
+    key = (profile_name, secret_type)
+    with _secret_cache_lock:
+        if key in _secret_cache:
+            return _secret_cache[key]
     try:
-        return keyring.get_password(KEYRING_SERVICE_NAME, alias)
+        secret = keyring.get_password(KEYRING_SERVICE_NAME, alias)
     except keyring.errors.KeyringError as e:
         print("Error retrieving secret from keyring. Please check the keyring configuration.") # Replace with logging
-        return None
+        return None # Not cached, so the next attempt asks the keyring again
+    with _secret_cache_lock:
+        _secret_cache[key] = secret
+    return secret
 
 def delete_ssh_profile(profile_name: str):
     """Deletes a profile from JSON and its secrets from keyring."""
@@ -106,6 +127,7 @@ def delete_ssh_profile(profile_name: str):
             print("Error saving profiles file after deletion. Please check the file and its permissions.")
 
         # Delete secrets from keyring
+        _invalidate_secrets(profile_name)
         try:
             keyring.delete_password(KEYRING_SERVICE_NAME, _get_password_alias(profile_name))
             keyring.delete_password(KEYRING_SERVICE_NAME, _get_key_passphrase_alias(profile_name))
@@ -0,0 +1,350 @@
+# File: llm_ssh_agent/sessions.py
+# Type: Python Module
+
+# Several independent sessions (conversation, command queue, SSH log, bound
+# host) in one process. All sessions share one LLM interface and request
+# scheduler, one SSH connection pool, the host facts cache and the secret
+# cache in secure_storage.
+# Sessions nobody has touched for a while are paged out to disk and paged
+# back in transparently the next time they're used.
+#
+# On disk (default ~/.config/llm_ssh_agent/sessions/):
+#     <session_id>/session.json   conversation, SSH log, commands, background jobs, bound host
+#     <session_id>/retrieval/     the session's output retrieval index
+
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, List, Optional
+
+from .app_state import ChatMessage, SSHLogEntry, LLMConfig
+from .command_queue import CommandRecord, CommandState
+from .core_logic import CoreLogic
+from .jobs import RemoteJob
+from .llm_interface import LLMInterface
+from .llm_pool import LLMScheduler
+from .host_facts import HostFactsCache
+from .policy import CommandPolicy, load_policy
+from .secure_storage import CONFIG_DIR
+from .ssh_manager import SSHConnectionPool
+
+SESSIONS_DIR = os.path.join(CONFIG_DIR, "sessions")
+SESSION_FILE = "session.json"
+SESSION_FORMAT_VERSION = 1
+IDLE_TIMEOUT = 900.0 # seconds without activity before a session is paged out
+IDLE_CHECK_INTERVAL = 60.0 # seconds between idle sweeps
+
+@dataclass
+class SessionInfo:
+    """What the session list (e.g. the TUI tabs) shows about a session, loaded or not."""
+    session_id: str
+    name: str
+    created: float
+    last_active: float
+    host: Optional[str] = None # Profile name the session is bound to
+    paged_out: bool = False
+
+
+class SessionManager:
+    """Creates, pages in/out and closes sessions; each loaded session is a CoreLogic."""
+
+    def __init__(self, llm_interface: Optional[LLMInterface] = None, sessions_dir: str = SESSIONS_DIR,
+                 idle_timeout: float = IDLE_TIMEOUT, max_concurrent_llm: Optional[int] = None,
+                 policy: Optional[CommandPolicy] = None):
+        """
+        llm_interface: shared by all sessions; created from the default config if None.
+        max_concurrent_llm: LLM requests in flight at once (default: one per LLM endpoint).
+        policy: auto-approval policy for all sessions; None loads the user's policy file.
+        """
+        self.llm_interface = llm_interface if llm_interface is not None else LLMInterface(LLMConfig())
+        endpoint_count = len(self.llm_interface.config.endpoints) or 1
+        self.llm_scheduler = LLMScheduler(max_concurrent_llm or endpoint_count)
+        self.ssh_pool = SSHConnectionPool()
+        self.host_facts_cache = HostFactsCache()
+        self.policy = policy if policy is not None else self._load_policy()
+        self.sessions_dir = sessions_dir
+        self.idle_timeout = idle_timeout
+        self.active_session_id: Optional[str] = None # Shown in the UI; never paged out
+        self._pins: Dict[str, int] = {} # Session ID -> frontends attached (e.g. daemon clients); pinned sessions stay loaded
+        self._sessions: Dict[str, SessionInfo] = {} # In creation order
+        self._loaded: Dict[str, CoreLogic] = {}
+        self._lock = threading.RLock()
+        self._stop_event = threading.Event()
+        self._idle_thread: Optional[threading.Thread] = None
+        self._discover()
+
+    @staticmethod
+    def _load_policy() -> CommandPolicy:
+        try:
+            return load_policy()
+        except ValueError as e:
+            print(f"Error loading command policy, auto-approval disabled: {e}")
+            return CommandPolicy()
+
+    def _session_dir(self, session_id: str) -> str:
+        return os.path.join(self.sessions_dir, session_id)
+
+    def _discover(self):
+        """Lists sessions paged out by earlier runs; their contents are only read when used."""
+        if not os.path.isdir(self.sessions_dir):
+            return
+        found = []
+        for session_id in os.listdir(self.sessions_dir):
+            path = os.path.join(self._session_dir(session_id), SESSION_FILE)
+            if not os.path.exists(path):
+                continue
+            try:
+                with open(path, "r") as f:
+                    data = json.load(f)
+                found.append(SessionInfo(session_id=session_id, name=data["name"], created=data["created"],
+                                         last_active=data["last_active"], host=data.get("host"), paged_out=True))
+            except (IOError, ValueError, KeyError) as e:
+                print(f"Skipping unreadable session {session_id}: {e}")
+        for info in sorted(found, key=lambda info: info.created):
+            self._sessions[info.session_id] = info
+        if found:
+            print(f"Found {len(found)} saved session(s).")
+
+    # --- Session lifecycle ---
+
+    def create_session(self, name: Optional[str] = None) -> str:
+        """Starts a new, empty session and returns its ID."""
+        session_id = uuid.uuid4().hex[:12]
+        now = time.time()
+        with self._lock:
+            info = SessionInfo(session_id=session_id, name=name or f"Session {len(self._sessions) + 1}",
+                               created=now, last_active=now)
+            self._loaded[session_id] = self._new_core_logic(session_id)
+            self._sessions[session_id] = info
+        return session_id
+
+    def _new_core_logic(self, session_id: str) -> CoreLogic:
+        return CoreLogic(llm_interface=self.llm_interface,
+                         retrieval_path=os.path.join(self._session_dir(session_id), "retrieval"),
+                         policy=self.policy, ssh_pool=self.ssh_pool, llm_scheduler=self.llm_scheduler,
+                         host_facts_cache=self.host_facts_cache)
+
+    def list_sessions(self) -> List[SessionInfo]:
+        """All sessions, oldest first, with up-to-date activity and host."""
+        with self._lock:
+            for session_id, core_logic in self._loaded.items():
+                self._refresh_info(self._sessions[session_id], core_logic)
+            return list(self._sessions.values())
+
+    @staticmethod
+    def _refresh_info(info: SessionInfo, core_logic: CoreLogic):
+        info.last_active = core_logic.last_activity
+        connection = core_logic.state.active_connection
+        info.host = connection.profile.profile_name if connection and connection.is_connected else None
+
+    def get(self, session_id: str) -> CoreLogic:
+        """Returns a session's CoreLogic, paging it in from disk if needed. Raises KeyError for unknown IDs."""
+        with self._lock:
+            if session_id not in self._sessions:
+                raise KeyError(f"No session with ID {session_id}")
+            core_logic = self._loaded.get(session_id)
+            if core_logic is None:
+                core_logic = self._page_in(self._sessions[session_id])
+            core_logic.last_activity = time.time()
+            return core_logic
+
+    def activate(self, session_id: str) -> CoreLogic:
+        """Makes a session the one shown in the UI (which keeps it in memory) and returns it."""
+        with self._lock:
+            core_logic = self.get(session_id)
+            self.active_session_id = session_id
+            return core_logic
+
+    def pin(self, session_id: str) -> CoreLogic:
+        """Like get(), but keeps the session in memory until a matching unpin()."""
+        with self._lock:
+            core_logic = self.get(session_id)
+            self._pins[session_id] = self._pins.get(session_id, 0) + 1
+            return core_logic
+
+    def unpin(self, session_id: str):
+        with self._lock:
+            count = self._pins.get(session_id, 0) - 1
+            if count > 0:
+                self._pins[session_id] = count
+            else:
+                self._pins.pop(session_id, None)
+
+    def rename_session(self, session_id: str, name: str):
+        with self._lock:
+            self._sessions[session_id].name = name
+
+    def close_session(self, session_id: str):
+        """Ends a session for good: releases its connection and deletes its saved state."""
+        with self._lock:
+            info = self._sessions.pop(session_id, None)
+            core_logic = self._loaded.pop(session_id, None)
+            if self.active_session_id == session_id:
+                self.active_session_id = None
+            self._pins.pop(session_id, None)
+        if info is None:
+            return
+        if core_logic is not None:
+            killed, orphaned = core_logic.stop_background_jobs()
+            if killed or orphaned:
+                print(f"Session '{info.name}' closed: killed {len(killed)} background job(s), "
+                      f"{len(orphaned)} left running remotely (host not connected).")
+            core_logic.ssh_manager.disconnect()
+        shutil.rmtree(self._session_dir(session_id), ignore_errors=True)
+
+    # --- Paging ---
+
+    def page_out(self, session_id: str, force: bool = False) -> bool:
+        """
+        Saves a session to disk and drops it from memory. Only idle sessions
+        are paged out (the active one never is) unless force is set.
+        Returns whether the session was paged out.
+        """
+        with self._lock:
+            core_logic = self._loaded.get(session_id)
+            if core_logic is None:
+                return False
+            if not force and (session_id == self.active_session_id or session_id in self._pins or not core_logic.is_idle()):
+                return False
+            info = self._sessions[session_id]
+            self._refresh_info(info, core_logic)
+            # Background jobs keep running remotely and are tracked again on page-in.
+            # Dropped before saving, so none can finish unrecorded in between.
+            jobs = core_logic.job_manager.forget()
+            try:
+                self._save(info, core_logic, jobs)
+            except (IOError, OSError) as e:
+                print(f"Error paging out session '{info.name}', keeping it in memory: {e}")
+                for job in jobs:
+                    core_logic.job_manager.adopt(job)
+                return False
+            del self._loaded[session_id]
+            info.paged_out = True
+        # The pool keeps the connection open while other sessions use it
+        core_logic.ssh_manager.disconnect()
+        print(f"Paged out idle session '{info.name}'.")
+        return True
+
+    def page_out_idle(self) -> List[str]:
+        """Pages out every loaded session idle for longer than idle_timeout. Returns their IDs."""
+        cutoff = time.time() - self.idle_timeout
+        with self._lock:
+            candidates = [session_id for session_id, core_logic in self._loaded.items()
+                          if core_logic.last_activity < cutoff]
+        return [session_id for session_id in candidates if self.page_out(session_id)]
+
+    def loaded_count(self) -> int:
+        with self._lock:
+            return len(self._loaded)
+
+    def start_idle_paging(self, interval: float = IDLE_CHECK_INTERVAL):
+        """Starts the background sweep that pages out idle sessions."""
+        if self._idle_thread is not None:
+            return
+        self._idle_thread = threading.Thread(target=self._idle_loop, args=(interval,), daemon=True)
+        self._idle_thread.start()
+
+    def _idle_loop(self, interval: float):
+        while not self._stop_event.wait(interval):
+            try:
+                self.page_out_idle()
+            except Exception as e:
+                print(f"Error paging out idle sessions: {e}")
+
+    def shutdown(self):
+        """Saves every loaded session (so they come back on the next start) and closes connections."""
+        self._stop_event.set()
+        with self._lock:
+            session_ids = list(self._loaded)
+        for session_id in session_ids:
+            self.page_out(session_id, force=True)
+
+    # --- Serialization ---
+
+    def _save(self, info: SessionInfo, core_logic: CoreLogic, jobs: List[RemoteJob]):
+        state = core_logic.state
+        data = {
+            "version": SESSION_FORMAT_VERSION,
+            "name": info.name,
+            "created": info.created,
+            "last_active": info.last_active,
+            "host": info.host,
+            "settings": {
+                "feed_ssh_output_to_llm": state.feed_ssh_output_to_llm,
+                "use_output_retrieval": state.use_output_retrieval,
+                "retrieval_top_k": state.retrieval_top_k,
+                "prefetch_host_facts": state.prefetch_host_facts,
+            },
+            "conversation": [asdict(message) for message in state.conversation_history],
+            "ssh_log": [asdict(entry) for entry in state.ssh_log],
+            "commands": [record_to_dict(record) for record in state.command_queue.finished() + state.command_queue.active()],
+            "last_outputs": [[host, command, output] for (host, command), output in core_logic._last_outputs.items()],
+            "jobs": [asdict(job) for job in jobs],
+        }
+        session_dir = self._session_dir(info.session_id)
+        os.makedirs(session_dir, exist_ok=True)
+        path = os.path.join(session_dir, SESSION_FILE)
+        # Write then rename, so a crash mid-save never leaves a truncated session
+        with open(path + ".tmp", "w") as f:
+            json.dump(data, f)
+        os.replace(path + ".tmp", path)
+
+    def _page_in(self, info: SessionInfo) -> CoreLogic:
+        path = os.path.join(self._session_dir(info.session_id), SESSION_FILE)
+        with open(path, "r") as f:
+            data = json.load(f)
+        core_logic = self._new_core_logic(info.session_id)
+        state = core_logic.state
+        for key, value in data.get("settings", {}).items():
+            setattr(state, key, value)
+
+        # Messages get fresh IDs (the counter restarted if this is a new process); commands follow along
+        new_ids: Dict[int, int] = {}
+        for saved in data["conversation"]:
+            message = ChatMessage(sender=saved["sender"], text=saved["text"])
+            new_ids[saved["message_id"]] = message.message_id
+            state.conversation_history.append(message)
+        state.ssh_log = [SSHLogEntry(**entry) for entry in data["ssh_log"]]
+        # Background jobs keep running remotely while the session is on disk; track them again
+        jobs = {job.command_id: job for job in (RemoteJob(**saved) for saved in data.get("jobs", []))}
+        records = []
+        for saved in data["commands"]:
+            record = record_from_dict(saved)
+            record.message_id = new_ids.get(record.message_id)
+            if record.state in (CommandState.APPROVED, CommandState.RUNNING) and record.command_id not in jobs:
+                # Only a forced save (shutdown) gets here; nothing is executing these any more
+                record.state = CommandState.CANCELLED
+                record.error = "Interrupted: the session was saved while the command was in flight."
+            records.append(record)
+        state.command_queue.restore(records)
+        for job in jobs.values():
+            core_logic.job_manager.adopt(job) # Polled (or killed, if cancelled) once the host is reconnected
+        for host, command, output in data.get("last_outputs", []):
+            core_logic._last_outputs[(host, command)] = output
+
+        self._loaded[info.session_id] = core_logic
+        info.paged_out = False
+        print(f"Paged in session '{info.name}'.")
+        if info.host:
+            if info.host in state.saved_connections:
+                core_logic.connect_ssh(info.host) # Usually instant: another session still holds the pooled connection
+            else:
+                core_logic._add_system_message(f"Profile '{info.host}' no longer exists; session is not connected.")
+        return core_logic
+
+
+def record_to_dict(record: CommandRecord) -> Dict[str, Any]:
+    """JSON-ready form of a command record (also used by the daemon protocol)."""
+    data = asdict(record)
+    data["state"] = record.state.value
+    return data
+
+def record_from_dict(data: Dict[str, Any]) -> CommandRecord:
+    """Inverse of record_to_dict()."""
+    data = dict(data)
+    data["state"] = CommandState(data["state"])
+    return CommandRecord(**data)
@@ -3,19 +3,278 @@
 
 import paramiko
 import socket
+import threading
 import time
-from typing import Optional, Tuple
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
 from .app_state import SSHConnectionProfile, SSHConnectionState
-from .secure_storage import get_ssh_secret
+from .secure_storage import get_ssh_secret, load_all_ssh_profiles
 
 # Timeout for SSH connection attempts
 CONNECTION_TIMEOUT = 10 # seconds
+# Default timeout for a single remote command
+COMMAND_TIMEOUT = 30 # seconds
+
+class _JumpedSSHClient(paramiko.SSHClient):
+    """A client tunnelled through a pooled bastion; closing it gives the bastion back."""
+
+    def __init__(self, release_bastion: Callable[[], None]):
+        super().__init__()
+        self._release_bastion = release_bastion
+
+    def close(self):
+        super().close()
+        if self._release_bastion is not None:
+            release, self._release_bastion = self._release_bastion, None
+            release()
+
+
+def resolve_jump_hosts(profile: SSHConnectionProfile,
+                       profiles: Optional[Dict[str, SSHConnectionProfile]] = None) -> Tuple[List[SSHConnectionProfile], Optional[str]]:
+    """
+    Looks up the profiles named in profile.jump_hosts (outermost bastion first).
+    Only the target's list counts: each bastion is reached through the ones
+    listed before it, and a bastion profile's own jump_hosts are ignored
+    (they only apply when connecting to that profile as the target).
+    Returns (jump_profiles, None) or ([], error_message).
+    """
+    if not profile.jump_hosts:
+        return [], None
+    profiles = profiles if profiles is not None else load_all_ssh_profiles()
+    chain = []
+    for name in profile.jump_hosts:
+        if name not in profiles:
+            return [], f"Jump host profile '{name}' not found."
+        if name == profile.profile_name or name in [p.profile_name for p in chain]:
+            return [], f"Jump host '{name}' appears twice in the chain to '{profile.profile_name}'."
+        bastion = profiles[name]
+        if bastion.jump_hosts and bastion.jump_hosts != [p.profile_name for p in chain]:
+            print(f"Jump host '{name}' is reached via {[p.profile_name for p in chain] or 'a direct connection'} "
+                  f"as listed for '{profile.profile_name}'; its own jump_hosts {bastion.jump_hosts} are ignored.")
+        chain.append(bastion)
+    return chain, None
+
+
+def open_ssh_client(profile: SSHConnectionProfile,
+                    jump_profiles: Sequence[SSHConnectionProfile] = ()) -> Tuple[Optional[paramiko.SSHClient], Optional[str]]:
+    """
+    Opens a new SSH connection using the provided profile.
+    Retrieves secrets from secure storage.
+    jump_profiles: bastions to go through, outermost first. The last one's
+    pooled transport carries the connection as a direct-tcpip channel.
+    Returns (client, None) on success or (None, error_message).
+    """
+    password = None
+    key_passphrase = None
+    pkey = None
+
+    if profile.auth_method == "password":
+        password = get_ssh_secret(profile.profile_name, "password")
+        if password is None:
+            return None, f"Password not found in secure storage for profile '{profile.profile_name}'."
+    elif profile.auth_method == "key":
+        key_path = profile.key_path
+        if not key_path:
+            return None, "Key path not specified in profile."
+        try:
+            # Try loading key without passphrase first
+            pkey = paramiko.RSAKey.from_private_key_file(key_path) # Add Ed25519 etc. as needed
+        except paramiko.PasswordRequiredException:
+            key_passphrase = get_ssh_secret(profile.profile_name, "key_passphrase")
+            if key_passphrase is None:
+                return None, f"Key '{key_path}' requires a passphrase, but none found in secure storage for profile '{profile.profile_name}'."
+            try:
+                pkey = paramiko.RSAKey.from_private_key_file(key_path, password=key_passphrase)
+            except paramiko.SSHException as e:
+                return None, f"Failed to load private key '{key_path}': {e}"
+        except FileNotFoundError:
+             return None, f"Private key file not found: {key_path}"
+        except paramiko.SSHException as e:
+             return None, f"Error loading private key '{key_path}': {e}"
+    else:
+        return None, f"Unsupported authentication method: {profile.auth_method}"
+
+    sock = None
+    if jump_profiles:
+        # One multiplexed transport per bastion, however many targets sit behind it
+        bastion, via = jump_profiles[-1], tuple(jump_profiles[:-1])
+        bastion_client, error_msg = _bastion_pool.acquire(bastion, via)
+        if bastion_client is None:
+            return None, f"Jump host '{bastion.profile_name}': {error_msg}"
+        try:
+            sock = bastion_client.get_transport().open_channel(
+                "direct-tcpip", (profile.hostname, profile.port), ("127.0.0.1", 0), timeout=CONNECTION_TIMEOUT)
+        except (paramiko.SSHException, socket.error) as e:
+            _bastion_pool.release(bastion, via)
+            error_msg = f"Jump host '{bastion.profile_name}' could not reach {profile.hostname}:{profile.port}: {e}"
+            print(f"Error: {error_msg}")
+            return None, error_msg
+        client = _JumpedSSHClient(lambda: _bastion_pool.release(bastion, via))
+    else:
+        client = paramiko.SSHClient()
+    try:
+        # Load known hosts from the default known_hosts file
+        client.load_system_host_keys()
+        client.set_missing_host_key_policy(paramiko.RejectPolicy())  # Reject unknown host keys
+        route = f" via {' -> '.join(p.profile_name for p in jump_profiles)}" if jump_profiles else ""
+        print(f"Attempting SSH connection to {profile.username}@{profile.hostname}:{profile.port}{route}...")
+        client.connect(
+            hostname=profile.hostname,
+            port=profile.port,
+            username=profile.username,
+            password=password, # Will be None if using key
+            pkey=pkey,         # Will be None if using password
+            timeout=CONNECTION_TIMEOUT,
+            passphrase=key_passphrase, # Paramiko >3.0 uses 'passphrase', older used 'password' for key passphrases too
+            sock=sock, # Tunnel channel through the bastion, or None to dial directly
+        )
+        print("SSH Connection successful.")
+        return client, None
+
+    except paramiko.AuthenticationException:
+        error_msg = "Authentication failed (incorrect password, key, or passphrase?)."
+    except (paramiko.SSHException, socket.timeout, socket.error) as e:
+        error_msg = f"Connection failed: {e}"
+    except Exception as e: # Catch unexpected errors
+        error_msg = f"An unexpected error occurred during connection: {e}"
+    print(f"Error: {error_msg}")
+    client.close()
+    if sock is not None:
+        sock.close() # Not always closed with the client (e.g. the SSH handshake never started)
+    return None, error_msg
+
+
+class _PooledConnection:
+    """One shared SSH client and the number of sessions using it."""
+
+    def __init__(self):
+        self.client: Optional[paramiko.SSHClient] = None
+        self.refcount = 0
+        self.lock = threading.Lock() # Serializes (re)connecting this one endpoint
+
+
+class SSHConnectionPool:
+    """
+    Shares SSH connections between sessions. Paramiko multiplexes channels, so
+    every session bound to the same profile runs its commands over one
+    transport; the connection is closed when the last session releases it.
+    A dropped connection is replaced in place: holders fetch the live client
+    with current() before each use rather than keeping the one acquire() returned.
+    """
+
+    def __init__(self):
+        self._connections: Dict[Tuple, _PooledConnection] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(profile: SSHConnectionProfile, via: Sequence[SSHConnectionProfile] = ()) -> Tuple:
+        # An edited profile (other host, user, port or route) gets a fresh connection
+        return tuple((p.profile_name, p.hostname, p.port, p.username) for p in (profile, *via))
+
+    def acquire(self, profile: SSHConnectionProfile,
+                via: Sequence[SSHConnectionProfile] = ()) -> Tuple[Optional[paramiko.SSHClient], Optional[str]]:
+        """
+        Returns a connected client for the profile, opening one if needed.
+        via: jump hosts to reach it through (outermost first). Returns (client, error).
+        """
+        key = self._key(profile, via)
+        with self._lock:
+            pooled = self._connections.setdefault(key, _PooledConnection())
+            pooled.refcount += 1
+        with pooled.lock:
+            if self._is_alive(pooled.client):
+                print(f"Reusing pooled SSH connection to {profile.hostname}.")
+            client, error = self._connect(pooled, profile, via)
+        if client is None:
+            self.release(profile, via)
+        return client, error
+
+    def current(self, profile: SSHConnectionProfile,
+                via: Sequence[SSHConnectionProfile] = ()) -> Tuple[Optional[paramiko.SSHClient], Optional[str]]:
+        """
+        Returns the live client of a connection the caller has acquired,
+        reconnecting if it dropped. The caller's reference count is unchanged.
+        Returns (client, error).
+        """
+        with self._lock:
+            pooled = self._connections.get(self._key(profile, via))
+        if pooled is None:
+            return None, f"No pooled connection to {profile.hostname}."
+        with pooled.lock:
+            return self._connect(pooled, profile, via)
+
+    @staticmethod
+    def _is_alive(client: Optional[paramiko.SSHClient]) -> bool:
+        transport = client.get_transport() if client else None
+        return transport is not None and transport.is_active()
+
+    @classmethod
+    def _connect(cls, pooled: _PooledConnection, profile: SSHConnectionProfile,
+                 via: Sequence[SSHConnectionProfile]) -> Tuple[Optional[paramiko.SSHClient], Optional[str]]:
+        """Returns the pooled client, replacing it if it dropped. Call with pooled.lock held."""
+        if cls._is_alive(pooled.client):
+            return pooled.client, None
+        dead = pooled.client
+        pooled.client, error = open_ssh_client(profile, via)
+        if dead is not None:
+            # Only closed now: its transport is gone, and a tunnelled client keeps
+            # its bastion lease until the replacement holds one
+            dead.close()
+        return pooled.client, error
+
+    def release(self, profile: SSHConnectionProfile, via: Sequence[SSHConnectionProfile] = ()):
+        """Gives back a client from acquire(); closes it once nobody uses it."""
+        key = self._key(profile, via)
+        with self._lock:
+            pooled = self._connections.get(key)
+            if pooled is None:
+                return
+            pooled.refcount -= 1
+            if pooled.refcount > 0:
+                return
+            del self._connections[key]
+        if pooled.client:
+            pooled.client.close()
+            print(f"SSH connection to {profile.hostname} closed.")
+
+    def stats(self) -> Dict[str, int]:
+        """Profile name -> number of sessions sharing its connection."""
+        with self._lock:
+            return {key[0][0]: pooled.refcount for key, pooled in self._connections.items()}
+
+
+# Bastion connections are shared by every SSHManager in the process (sessions,
+# batch workers), pooled or not: a target behind a bastion only costs a channel
+_bastion_pool = SSHConnectionPool()
+
+def bastion_stats() -> Dict[str, int]:
+    """Bastion profile name -> number of connections currently tunnelled through it."""
+    return _bastion_pool.stats()
+
 
 class SSHManager:
     """Handles SSH connection and command execution."""
 
-    def __init__(self):
+    def __init__(self, pool: Optional[SSHConnectionPool] = None):
+        """pool: share connections with other sessions instead of opening a private one."""
         self.active_state: Optional[SSHConnectionState] = None
+        self.pool = pool
+        self._jump_profiles: List[SSHConnectionProfile] = [] # Route of the active connection
+
+    def _client(self) -> paramiko.SSHClient:
+        """
+        The client to run commands on. A pooled connection may have been replaced
+        by another session since connect(), so the pool's live client is fetched.
+        Raises ConnectionError if it can't be reached; the pool reference is kept
+        so disconnect() still gives it back.
+        """
+        if self.pool is not None:
+            client, error = self.pool.current(self.active_state.profile, self._jump_profiles)
+            if client is None:
+                self.active_state.is_connected = False
+                self.active_state.error = error
+                raise ConnectionError(error)
+            self.active_state.client = client
+        return self.active_state.client
 
     def connect(self, profile: SSHConnectionProfile) -> Tuple[bool, Optional[str]]:
         """
@@ -25,84 +284,39 @@ class SSHManager:
         """
         self.disconnect() # Ensure any previous connection is closed
 
-        password = None
-        key_passphrase = None
-        pkey = None
-
-        if profile.auth_method == "password":
-            password = get_ssh_secret(profile.profile_name, "password")
-            if password is None:
-                return False, f"Password not found in secure storage for profile '{profile.profile_name}'."
-        elif profile.auth_method == "key":
-            key_path = profile.key_path
-            if not key_path:
-                return False, "Key path not specified in profile."
-            try:
-                # Try loading key without passphrase first
-                pkey = paramiko.RSAKey.from_private_key_file(key_path) # Add Ed25519 etc. as needed
-            except paramiko.PasswordRequiredException:
-                key_passphrase = get_ssh_secret(profile.profile_name, "key_passphrase")
-                if key_passphrase is None:
-                    return False, f"Key '{key_path}' requires a passphrase, but none found in secure storage for profile '{profile.profile_name}'."
-                try:
-                    pkey = paramiko.RSAKey.from_private_key_file(key_path, password=key_passphrase)
-                except paramiko.SSHException as e:
-                    return False, f"Failed to load private key '{key_path}': {e}"
-            except FileNotFoundError:
-                 return False, f"Private key file not found: {key_path}"
-            except paramiko.SSHException as e:
-                 return False, f"Error loading private key '{key_path}': {e}"
-        else:
-            return False, f"Unsupported authentication method: {profile.auth_method}"
-
-        client = paramiko.SSHClient()
-        # Load known hosts from the default known_hosts file
-        client.load_system_host_keys()
-        client.set_missing_host_key_policy(paramiko.RejectPolicy())  # Reject unknown host keys
-
-        try:
-            print(f"Attempting SSH connection to {profile.username}@{profile.hostname}:{profile.port}...")
-            client.connect(
-                hostname=profile.hostname,
-                port=profile.port,
-                username=profile.username,
-                password=password, # Will be None if using key
-                pkey=pkey,         # Will be None if using password
-                timeout=CONNECTION_TIMEOUT,
-                passphrase=key_passphrase # Paramiko >3.0 uses 'passphrase', older used 'password' for key passphrases too
-            )
-            print("SSH Connection successful.")
-            self.active_state = SSHConnectionState(
-                profile=profile,
-                client=client,
-                is_connected=True,
-                error=None
-            )
-            return True, f"Connected to {profile.hostname}."
-
-        except paramiko.AuthenticationException:
-            error_msg = "Authentication failed (incorrect password, key, or passphrase?)."
-            print(f"Error: {error_msg}")
-            self.active_state = SSHConnectionState(profile=profile, error=error_msg)
-            return False, error_msg
-        except (paramiko.SSHException, socket.timeout, socket.error) as e:
-            error_msg = f"Connection failed: {e}"
-            print(f"Error: {error_msg}")
+        jump_profiles, error_msg = resolve_jump_hosts(profile)
+        if error_msg:
             self.active_state = SSHConnectionState(profile=profile, error=error_msg)
             return False, error_msg
-        except Exception as e: # Catch unexpected errors
-            error_msg = f"An unexpected error occurred during connection: {e}"
-            print(f"Error: {error_msg}")
+        if self.pool is not None:
+            client, error_msg = self.pool.acquire(profile, jump_profiles)
+        else:
+            client, error_msg = open_ssh_client(profile, jump_profiles)
+        if client is None:
             self.active_state = SSHConnectionState(profile=profile, error=error_msg)
             return False, error_msg
 
+        self._jump_profiles = jump_profiles
+        self.active_state = SSHConnectionState(
+            profile=profile,
+            client=client,
+            is_connected=True,
+            error=None
+        )
+        if jump_profiles:
+            return True, f"Connected to {profile.hostname} via {' -> '.join(p.profile_name for p in jump_profiles)}."
+        return True, f"Connected to {profile.hostname}."
+
 
     def disconnect(self):
         """Closes the active SSH connection."""
         if self.active_state and self.active_state.client:
             try:
-                self.active_state.client.close()
-                print(f"SSH connection to {self.active_state.profile.hostname} closed.")
+                if self.pool is not None:
+                    self.pool.release(self.active_state.profile, self._jump_profiles) # Other sessions may still use it
+                else:
+                    self.active_state.client.close()
+                    print(f"SSH connection to {self.active_state.profile.hostname} closed.")
             except Exception as e:
                  print(f"Error closing SSH connection: {e}") # Log this
             self.active_state.client = None
@@ -110,20 +324,31 @@ class SSHManager:
             # Keep profile info but mark as disconnected
             # self.active_state = None # Or just update state? Let's update.
 
-    def execute_command(self, command: str) -> Tuple[str, str]:
+    def execute_command(self, command: str, timeout: Optional[int] = None) -> Tuple[str, str]:
         """
         Executes a command on the remote SSH server.
+        timeout: seconds before giving up (defaults to COMMAND_TIMEOUT).
         Returns (stdout, stderr).
         """
+        stdout_data, stderr_data, _ = self.execute_command_with_status(command, timeout=timeout)
+        return stdout_data, stderr_data
+
+    def execute_command_with_status(self, command: str, timeout: Optional[int] = None) -> Tuple[str, str, Optional[int]]:
+        """
+        Like execute_command, but also returns the exit status
+        (None if the command couldn't be run or didn't finish).
+        Returns (stdout, stderr, exit_status).
+        """
         if not self.active_state or not self.active_state.is_connected or not self.active_state.client:
-            return "", "Error: Not connected to SSH server."
+            return "", "Error: Not connected to SSH server.", None
 
-        client = self.active_state.client
         stdout_data = ""
         stderr_data = ""
+        exit_status = None
         try:
+            client = self._client()
             print(f"Executing command: {command}")
-            stdin, stdout, stderr = client.exec_command(command, timeout=30) # Add timeout
+            stdin, stdout, stderr = client.exec_command(command, timeout=timeout or COMMAND_TIMEOUT)
             stdout_data = stdout.read().decode('utf-8', errors='replace')
             stderr_data = stderr.read().decode('utf-8', errors='replace')
             exit_status = stdout.channel.recv_exit_status() # Check exit status
@@ -140,6 +365,9 @@ class SSHManager:
         except socket.timeout:
              stderr_data = "Error: Command timed out."
              print(stderr_data)
+        except ConnectionError as e:
+             stderr_data = f"Error: Lost the SSH connection: {e}"
+             print(stderr_data)
         except Exception as e:
              stderr_data = f"An unexpected error occurred during command execution: {e}"
              print(stderr_data)
@@ -147,7 +375,19 @@ class SSHManager:
 
         print(f"STDOUT:\n{stdout_data}")
         print(f"STDERR:\n{stderr_data}")
-        return stdout_data, stderr_data
+        return stdout_data, stderr_data, exit_status
+
+    def run_raw(self, command: str, timeout: Optional[int] = None) -> Tuple[bytes, bytes, int]:
+        """
+        Runs a helper command (job control, fact gathering...) without logging.
+        Returns raw (stdout, stderr, exit_status); raises on connection or channel errors.
+        """
+        if not self.active_state or not self.active_state.is_connected or not self.active_state.client:
+            raise ConnectionError("Not connected to SSH server.")
+        stdin, stdout, stderr = self._client().exec_command(command, timeout=timeout or COMMAND_TIMEOUT)
+        stdout_data = stdout.read()
+        stderr_data = stderr.read()
+        return stdout_data, stderr_data, stdout.channel.recv_exit_status()
 
     def get_connection_state(self) -> Optional[SSHConnectionState]:
         return self.active_state
\ No newline at end of file
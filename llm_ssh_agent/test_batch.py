@@ -0,0 +1,216 @@
+# File: llm_ssh_agent/test_batch.py
+# Type: Python Module (pytest)
+
+import io
+import json
+import os
+import signal
+import subprocess
+
+import paramiko
+import pytest
+
+from llm_ssh_agent import core_logic, ssh_manager
+from llm_ssh_agent.app_state import LLMConfig, ProposedCommand, SSHConnectionProfile
+from llm_ssh_agent.batch import JsonlWriter, SessionResult, report, run_session
+from llm_ssh_agent.host_facts import HostFactsCache
+from llm_ssh_agent.llm_interface import LLMError
+from llm_ssh_agent.policy import CommandPolicy
+from llm_ssh_agent.test_jobs import processes_running
+
+
+class ScriptedLLM:
+    """Stands in for LLMInterface: answers with the queued (text, commands) replies, or raises queued errors."""
+
+    def __init__(self, *replies):
+        self.config = LLMConfig()
+        self.replies = list(replies)
+        self.prompts = []
+
+    def generate_response(self, history, context=None, host_facts=None, raise_errors=False):
+        self.prompts.append(history[-1].text if history[-1].sender == "user" else None)
+        reply = self.replies.pop(0) if self.replies else ("Done.", [])
+        if callable(reply):
+            reply = reply()
+        if isinstance(reply, Exception):
+            raise reply
+        return reply
+
+
+class LocalOutput(io.BytesIO):
+    def __init__(self, data, status=0):
+        super().__init__(data)
+        self.channel = self
+        self.status = status
+
+    def recv_exit_status(self):
+        return self.status
+
+
+class LocalTransport:
+    def __init__(self):
+        self.active = True
+
+    def is_active(self):
+        return self.active
+
+
+class LocalClient:
+    """Stands in for a paramiko client: runs commands in a local shell."""
+
+    def __init__(self, home):
+        self.home = home
+        self.transport = LocalTransport()
+
+    def get_transport(self):
+        return self.transport
+
+    def exec_command(self, command, timeout=None):
+        if not self.transport.active:
+            raise paramiko.SSHException("SSH session not active")
+        result = subprocess.run(["sh", "-c", command], capture_output=True, timeout=timeout,
+                                env={"HOME": self.home, "PATH": "/usr/bin:/bin"})
+        return None, LocalOutput(result.stdout, result.returncode), LocalOutput(result.stderr)
+
+    def close(self):
+        self.transport.active = False
+
+
+class LocalOpener:
+    def __init__(self, home):
+        self.home = home
+        self.clients = []
+        self.error = None # Set to refuse connections
+
+    def __call__(self, profile, jump_profiles=()):
+        if self.error:
+            return None, self.error
+        self.clients.append(LocalClient(self.home))
+        return self.clients[-1], None
+
+
+@pytest.fixture
+def opener(tmp_path, monkeypatch):
+    opener = LocalOpener(str(tmp_path))
+    monkeypatch.setattr(ssh_manager, "open_ssh_client", opener)
+    monkeypatch.setattr(ssh_manager, "resolve_jump_hosts", lambda profile: ([], None))
+    monkeypatch.setattr(core_logic, "load_all_ssh_profiles",
+                        lambda: {"web1": SSHConnectionProfile(profile_name="web1", hostname="web1.example", username="ops")})
+    return opener
+
+
+def run(llm, prompts, policy="all", max_rounds=3, job_wait=5.0):
+    stream = io.StringIO()
+    result = run_session("web1", prompts, llm, policy, CommandPolicy(), max_rounds, JsonlWriter(stream),
+                         host_facts_cache=HostFactsCache(path=None), job_wait=job_wait)
+    return result, [json.loads(line) for line in stream.getvalue().splitlines()]
+
+
+def test_turns_follow_up_until_nothing_runs(opener):
+    llm = ScriptedLLM(
+        ("Checking.", [ProposedCommand(command="echo disk-ok")]),
+        ("All good.", []),
+        ("Nothing to do.", []),
+    )
+    result, records = run(llm, ["check the disks", "anything else?"])
+    assert result.ok and result.error is None
+    assert (result.turns, result.commands_run) == (3, 1)
+    assert llm.prompts == ["check the disks", "Continue based on the command output above.", "anything else?"]
+
+    first, second, third, session = records
+    assert (first["type"], first["host"], first["prompt"], first["round"]) == ("turn", "web1", "check the disks", 1)
+    assert first["response"] == "Checking." and first["pending"] == ["echo disk-ok"] and first["rejected"] == []
+    assert [entry["command"] for entry in first["executed"]] == ["echo disk-ok"]
+    assert "disk-ok" in first["executed"][0]["output"]
+    assert (second["round"], second["executed"], second["error"]) == (2, [], None)
+    assert (third["prompt"], third["round"]) == ("anything else?", 1)
+    assert session["type"] == "session" and session["ok"] and session["turns"] == 3 and session["commands_run"] == 1
+    assert session["cancelled_jobs"] == [] and session["orphaned_jobs"] == []
+
+
+def test_proposals_are_only_recorded_without_approval(opener):
+    llm = ScriptedLLM(("Try this.", [ProposedCommand(command="touch ran")]))
+    result, records = run(llm, ["clean up"], policy="none")
+    assert result.ok and result.commands_run == 0
+    assert records[0]["rejected"] == ["touch ran"] and records[0]["executed"] == []
+    assert not os.path.exists(os.path.join(opener.home, "ran"))
+
+
+def test_max_rounds_caps_the_follow_ups(opener):
+    llm = ScriptedLLM(*[("Again.", [ProposedCommand(command="true")])] * 5)
+    result, records = run(llm, ["loop"], max_rounds=2)
+    assert result.ok and result.turns == 2
+    assert [record["round"] for record in records if record["type"] == "turn"] == [1, 2]
+
+
+def test_connection_failure_is_reported(opener):
+    opener.error = "Connection refused"
+    llm = ScriptedLLM()
+    result, records = run(llm, ["check the disks"])
+    assert not result.ok and "Connection refused" in result.error
+    assert result.turns == 0 and llm.prompts == []
+    assert records == [{**records[0], "type": "session", "ok": False, "turns": 0}]
+
+
+def test_llm_failure_ends_the_session(opener):
+    llm = ScriptedLLM(("Checking.", [ProposedCommand(command="true")]), LLMError("Ollama is not reachable"))
+    result, records = run(llm, ["first", "second"])
+    assert not result.ok and result.error == "Ollama is not reachable"
+    assert result.turns == 2
+    assert records[1]["error"] == "Ollama is not reachable" and records[1]["response"] == "Ollama is not reachable"
+    assert records[-1]["type"] == "session" and records[-1]["error"] == "Ollama is not reachable"
+    assert len(llm.prompts) == 2 # "second" was never sent
+
+
+def test_unfinished_background_jobs_are_cancelled(opener):
+    llm = ScriptedLLM(("Starting.", [ProposedCommand(command="sleep 93", background=True)]))
+    result, records = run(llm, ["rebuild the index"], job_wait=0.2)
+    assert result.ok
+    assert records[0]["jobs_running"] == ["sleep 93"]
+    assert (result.cancelled_jobs, result.orphaned_jobs) == (["sleep 93"], [])
+    assert records[-1]["cancelled_jobs"] == ["sleep 93"]
+    assert processes_running("sleep", "93") == []
+
+
+def test_jobs_on_a_lost_connection_are_reported_orphaned(opener):
+    def drop_connection():
+        opener.error = "Host unreachable"
+        opener.clients[-1].close()
+        return "Hm.", []
+
+    llm = ScriptedLLM(("Starting.", [ProposedCommand(command="sleep 94", background=True)]), drop_connection)
+    try:
+        result, records = run(llm, ["rebuild the index", "how is it going?"], job_wait=0.2)
+        assert result.ok
+        assert (result.cancelled_jobs, result.orphaned_jobs) == ([], ["sleep 94"])
+        assert records[-1]["orphaned_jobs"] == ["sleep 94"]
+        assert processes_running("sleep", "94", grace=0) # Still running: it couldn't be reached
+    finally:
+        for pid in processes_running("sleep", "94", grace=0):
+            os.kill(pid, signal.SIGKILL)
+
+
+# --- Report ---
+
+def test_report_percentiles_and_throughput():
+    # Shuffled latencies 1..21s: the nearest-rank p50 is the 11th, p95 the 20th
+    results = [SessionResult(host=f"h{n}", ok=n != 3, latency=float(n)) for n in [*range(21, 0, -2), *range(2, 21, 2)]]
+    summary = report(results, elapsed=42.0)
+    assert summary == {
+        "type": "summary",
+        "sessions": 21,
+        "succeeded": 20,
+        "failed": 1,
+        "elapsed": 42.0,
+        "sessions_per_minute": 30.0,
+        "latency_p50": 11.0,
+        "latency_p95": 20.0,
+        "latency_max": 21.0,
+    }
+
+
+def test_report_without_results_or_time():
+    assert report([], elapsed=0.0) == {"type": "summary", "sessions": 0, "succeeded": 0, "failed": 0,
+                                       "elapsed": 0.0, "sessions_per_minute": None}
+    summary = report([SessionResult(host="h", ok=True, latency=2.5)], elapsed=120.0)
+    assert (summary["sessions_per_minute"], summary["latency_p50"], summary["latency_p95"]) == (0.5, 2.5, 2.5)
@@ -0,0 +1,117 @@
+# File: llm_ssh_agent/test_command_queue.py
+# Type: Python Module (pytest)
+
+import pytest
+
+from llm_ssh_agent.app_state import ProposedCommand
+from llm_ssh_agent.command_queue import CommandQueue, CommandRecord, CommandState
+
+
+def queue_with(*commands, **kwargs):
+    queue = CommandQueue(**kwargs)
+    records = [queue.add(ProposedCommand(command=command), message_id=7) for command in commands]
+    return queue, records
+
+
+def test_add_copies_the_proposal_and_assigns_increasing_ids():
+    queue = CommandQueue()
+    record = queue.add(ProposedCommand(command="sleep 60", host="web1", timeout=90, background=True), message_id=3)
+    assert (record.command, record.host, record.timeout, record.background) == ("sleep 60", "web1", 90, True)
+    assert (record.message_id, record.state) == (3, CommandState.PROPOSED)
+    assert queue.add(ProposedCommand(command="uptime")).command_id == record.command_id + 1
+    assert len(queue) == 2
+
+
+def test_full_lifecycle_moves_record_to_finished():
+    queue, (record,) = queue_with("uptime")
+    queue.transition(record.command_id, CommandState.APPROVED)
+    queue.transition(record.command_id, CommandState.RUNNING)
+    assert queue.in_state(CommandState.RUNNING) == [record]
+    queue.transition(record.command_id, CommandState.FAILED, error="exit 1", exit_status=1)
+    assert (record.state, record.error, record.exit_status) == (CommandState.FAILED, "exit 1", 1)
+    assert len(queue) == 0 and queue.active() == []
+    assert queue.finished() == [record]
+    assert queue.get(record.command_id) is record # Finished records can still be looked up
+
+
+@pytest.mark.parametrize("path, bad_state", [
+    ([], CommandState.RUNNING),                          # Must be approved first
+    ([], CommandState.DONE),
+    ([CommandState.APPROVED], CommandState.PROPOSED),    # No going back
+    ([CommandState.APPROVED], CommandState.FAILED),
+    ([CommandState.APPROVED, CommandState.RUNNING], CommandState.APPROVED),
+])
+def test_disallowed_moves_raise_value_error(path, bad_state):
+    queue, (record,) = queue_with("uptime")
+    for state in path:
+        queue.transition(record.command_id, state)
+    with pytest.raises(ValueError, match="cannot go from"):
+        queue.transition(record.command_id, bad_state)
+    assert record.state == (path[-1] if path else CommandState.PROPOSED)
+
+
+@pytest.mark.parametrize("path", [
+    [],
+    [CommandState.APPROVED],
+    [CommandState.APPROVED, CommandState.RUNNING],
+])
+def test_any_unfinished_state_can_be_cancelled(path):
+    queue, (record,) = queue_with("uptime")
+    for state in path:
+        queue.transition(record.command_id, state)
+    queue.transition(record.command_id, CommandState.CANCELLED)
+    assert record.state == CommandState.CANCELLED
+
+
+def test_finished_and_unknown_ids_raise_key_error():
+    queue, (record,) = queue_with("uptime")
+    queue.transition(record.command_id, CommandState.CANCELLED)
+    with pytest.raises(KeyError):
+        queue.transition(record.command_id, CommandState.APPROVED)
+    with pytest.raises(KeyError):
+        queue.transition(999, CommandState.APPROVED)
+
+
+def test_try_transition_returns_none_instead_of_raising():
+    queue, (record,) = queue_with("uptime")
+    assert queue.try_transition(record.command_id, CommandState.RUNNING) is None
+    assert queue.try_transition(999, CommandState.APPROVED) is None
+    assert queue.try_transition(record.command_id, CommandState.CANCELLED, error="rejected") is record
+    assert record.error == "rejected"
+    assert queue.try_transition(record.command_id, CommandState.CANCELLED) is None # Already cancelled
+
+
+def test_counts_follow_transitions():
+    queue, (a, b, c) = queue_with("a", "b", "c")
+    queue.transition(a.command_id, CommandState.APPROVED)
+    queue.transition(b.command_id, CommandState.CANCELLED)
+    assert queue.count(CommandState.PROPOSED) == 1
+    assert queue.count(CommandState.APPROVED) == 1
+    assert queue.count(CommandState.CANCELLED) == 1
+    assert [r.command for r in queue.in_state(CommandState.PROPOSED)] == ["c"]
+    assert [r.command for r in queue.active()] == ["a", "c"] # Oldest first
+
+
+def test_finished_history_is_bounded():
+    queue, records = queue_with(*[f"cmd{n}" for n in range(5)], finished_history=3)
+    for record in records:
+        queue.transition(record.command_id, CommandState.CANCELLED)
+    assert [r.command for r in queue.finished()] == ["cmd2", "cmd3", "cmd4"]
+    assert queue.get(records[0].command_id) is None
+    assert queue.count(CommandState.CANCELLED) == 5 # Counts everything seen
+
+
+def test_restore_keeps_ids_and_states_and_continues_numbering():
+    saved = [
+        CommandRecord(command_id=4, command="uptime", state=CommandState.DONE),
+        CommandRecord(command_id=9, command="df -h", state=CommandState.PROPOSED),
+        CommandRecord(command_id=6, command="free -m", state=CommandState.APPROVED),
+    ]
+    queue = CommandQueue()
+    queue.restore(saved)
+    assert [r.command_id for r in queue.active()] == [9, 6]
+    assert [r.command_id for r in queue.finished()] == [4]
+    assert queue.count(CommandState.PROPOSED) == 1
+    assert queue.add(ProposedCommand(command="w")).command_id == 10
+    queue.transition(6, CommandState.RUNNING)
+    assert queue.get(6).state == CommandState.RUNNING
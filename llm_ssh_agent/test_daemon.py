@@ -0,0 +1,153 @@
+# File: llm_ssh_agent/test_daemon.py
+# Type: Python Module (pytest)
+
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import time
+
+import pytest
+
+from llm_ssh_agent import sessions
+from llm_ssh_agent.app_state import LLMConfig
+from llm_ssh_agent.daemon import (MAX_FRAME_SIZE, SESSION_METHODS, AgentDaemon, DaemonClient, DaemonError,
+                                  RemoteSessionManager, _HEADER, recv_frame, send_frame)
+from llm_ssh_agent.host_facts import HostFactsCache
+from llm_ssh_agent.policy import CommandPolicy
+from llm_ssh_agent.sessions import SESSION_FILE, SessionManager
+
+
+class FakeLLM:
+    def __init__(self):
+        self.config = LLMConfig()
+
+
+def wait_until(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.02)
+    return True
+
+
+@pytest.fixture
+def daemon(monkeypatch):
+    monkeypatch.setattr(sessions, "HostFactsCache", lambda: HostFactsCache(path=None))
+    directory = tempfile.mkdtemp(prefix="llmssh") # Short: Unix socket paths are limited to ~100 bytes
+    manager = SessionManager(llm_interface=FakeLLM(), sessions_dir=os.path.join(directory, "sessions"), policy=CommandPolicy())
+    daemon = AgentDaemon(manager, os.path.join(directory, "agent.sock"))
+    daemon.thread = threading.Thread(target=daemon.serve_forever, daemon=True)
+    daemon.thread.start()
+    assert wait_until(lambda: os.path.exists(daemon.path))
+    yield daemon
+    daemon.stop()
+    daemon.thread.join(timeout=10)
+    shutil.rmtree(directory, ignore_errors=True)
+
+
+@pytest.fixture
+def frontend(daemon):
+    frontend = RemoteSessionManager(daemon.path)
+    yield frontend
+    frontend.shutdown()
+
+
+# --- Framing ---
+
+def test_frames_round_trip():
+    a, b = socket.socketpair()
+    with a, b:
+        payload = {"id": 1, "method": "call", "params": {"text": "héllo " * 1000}}
+        send_frame(a, payload)
+        send_frame(a, {"event": "chat"})
+        assert recv_frame(b) == payload
+        assert recv_frame(b) == {"event": "chat"}
+        a.close()
+        assert recv_frame(b) is None # Peer closed
+
+
+def test_oversized_frame_is_refused():
+    a, b = socket.socketpair()
+    with a, b:
+        a.sendall(_HEADER.pack(MAX_FRAME_SIZE + 1))
+        with pytest.raises(DaemonError, match="exceeds"):
+            recv_frame(b)
+
+
+# --- Server ---
+
+def test_only_whitelisted_methods_and_arguments_are_accepted(daemon):
+    session_id = daemon.session_manager.create_session()
+    client = DaemonClient(daemon.path)
+    try:
+        assert "_add_system_message" not in SESSION_METHODS
+        with pytest.raises(DaemonError, match="can't be called remotely"):
+            client.call("call", {"session": session_id, "name": "_add_system_message", "kwargs": {"text": "hi"}})
+        with pytest.raises(DaemonError, match="Unexpected argument.*shell"):
+            client.call("call", {"session": session_id, "name": "cancel_command", "kwargs": {"command_id": 1, "shell": True}})
+        with pytest.raises(DaemonError, match="Unknown method"):
+            client.call("eval", {"code": "1"})
+        assert daemon.session_manager.get(session_id).state.conversation_history == []
+        # Still usable after the errors
+        assert client.call("call", {"session": session_id, "name": "get_saved_connections"}) == \
+            daemon.session_manager.get(session_id).get_saved_connections()
+    finally:
+        client.close()
+
+
+def test_attach_snapshot_then_deltas_reach_the_frontend(daemon, frontend):
+    session_id = frontend.create_session("web")
+    core_logic = daemon.session_manager.get(session_id)
+    core_logic.state.feed_ssh_output_to_llm = False
+    core_logic._add_system_message("Connected.")
+
+    remote = frontend.get(session_id)
+    assert [message.text for message in remote.state.conversation_history] == ["Connected."]
+    chat_updates, log_updates = [], []
+    remote.update_chat_callback = chat_updates.append
+    remote.update_ssh_log_callback = log_updates.append
+
+    core_logic._add_system_message("Thinking...")
+    placeholder = core_logic.state.conversation_history[-1]
+    placeholder.text = "Disks look fine."
+    core_logic._notify_ui(core_logic.update_chat_callback, core_logic.state.conversation_history)
+    core_logic._add_ssh_log_entry("df -h", "/dev/sda1 40%", "")
+
+    assert wait_until(lambda: len(chat_updates) == 2 and log_updates)
+    assert [message.text for message in remote.state.conversation_history] == ["Connected.", "Disks look fine."]
+    assert [message.message_id for message in remote.state.conversation_history] == \
+        [message.message_id for message in core_logic.state.conversation_history]
+    assert [entry.command for entry in remote.state.ssh_log] == ["df -h"]
+
+
+def test_attached_sessions_are_pinned_until_detached(daemon, frontend):
+    manager = daemon.session_manager
+    session_id = frontend.create_session()
+    frontend.get(session_id)
+    assert not manager.page_out(session_id)
+
+    frontend.detach(session_id)
+    assert manager.page_out(session_id)
+
+
+def test_disconnecting_frontend_unpins_its_sessions(daemon):
+    manager = daemon.session_manager
+    frontend = RemoteSessionManager(daemon.path)
+    session_id = frontend.create_session()
+    frontend.get(session_id)
+    frontend.shutdown()
+    assert wait_until(lambda: manager.page_out(session_id))
+
+
+def test_shutdown_pages_out_every_session(daemon, frontend):
+    session_id = frontend.create_session("kept")
+    frontend.get(session_id)
+    daemon.stop()
+    daemon.thread.join(timeout=10)
+    assert not daemon.thread.is_alive()
+    assert not os.path.exists(daemon.path)
+    assert daemon.session_manager.loaded_count() == 0
+    assert os.path.exists(os.path.join(daemon.session_manager.sessions_dir, session_id, SESSION_FILE))
@@ -0,0 +1,53 @@
+# File: llm_ssh_agent/test_host_facts.py
+# Type: Python Module (pytest)
+
+from llm_ssh_agent.host_facts import HostFactsCache, parse_facts
+
+FACT_OUTPUT = """
+@@boot_id
+3f1c0a8e-1d2b-4c5d-9e8f-0a1b2c3d4e5f
+@@hostname
+web1
+@@os_release
+NAME="Ubuntu"
+PRETTY_NAME="Ubuntu 22.04.4 LTS"
+ID=ubuntu
+ID_LIKE=debian
+@@init
+/sbin/init
+@@cpus
+4
+@@mem
+7900
+@@df
+/dev/sda1          40G   12G   28G  30% /
+/dev/sdb1         1.8T  1.2T  600G  67% /mnt/Backup Drive
+//nas/share name  2.0T  1.0T  1.0T  50% /mnt/nas share
+@@services
+nginx
+ssh
+@@containers
+"""
+
+
+def test_parse_facts():
+    facts = parse_facts(FACT_OUTPUT)
+    assert (facts.hostname, facts.os, facts.os_id, facts.os_like) == ("web1", "Ubuntu 22.04.4 LTS", "ubuntu", "debian")
+    assert (facts.init_system, facts.cpus, facts.memory_mb) == ("init", 4, 7900)
+    assert facts.services == ["nginx", "ssh"] and facts.container_tools == []
+
+
+def test_mount_points_with_spaces_are_kept_whole():
+    assert parse_facts(FACT_OUTPUT).mounts == [
+        "/ 40G 30%",
+        "/mnt/Backup Drive 1.8T 67%",
+        "/mnt/nas share 2.0T 50%",
+    ]
+
+
+def test_cache_ignores_facts_from_before_a_reboot():
+    cache = HostFactsCache(path=None)
+    facts = parse_facts(FACT_OUTPUT)
+    cache.put("ops@web1:22", facts)
+    assert cache.get("ops@web1:22", facts.boot_id) is facts
+    assert cache.get("ops@web1:22", "another-boot-id") is None
@@ -0,0 +1,150 @@
+# File: llm_ssh_agent/test_jobs.py
+# Type: Python Module (pytest)
+
+import os
+import shutil
+import subprocess
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from llm_ssh_agent.jobs import JobManager
+
+
+class LocalSSHManager:
+    """Runs job control commands in a local shell instead of over SSH."""
+
+    def __init__(self, home, path="/usr/bin:/bin"):
+        self.home = str(home)
+        self.path = path
+        self.connection = SimpleNamespace(is_connected=True, profile=SimpleNamespace(profile_name="web1"))
+
+    def get_connection_state(self):
+        return self.connection
+
+    def run_raw(self, command, timeout=None):
+        if not self.connection.is_connected:
+            raise RuntimeError("Not connected")
+        result = subprocess.run(["sh", "-c", command], capture_output=True, env={"HOME": self.home, "PATH": self.path})
+        return result.stdout, result.stderr, result.returncode
+
+
+def is_running(pid, grace=5.0):
+    """True if the process is still alive after up to grace seconds (signals take a moment to land)."""
+    deadline = time.monotonic() + grace
+    while True:
+        try:
+            with open(f"/proc/{pid}/stat") as f:
+                alive = f.read().rsplit(")", 1)[1].split()[0] != "Z" # Killed jobs may linger as zombies
+        except FileNotFoundError:
+            alive = False
+        if not alive or time.monotonic() > deadline:
+            return alive
+        time.sleep(0.05)
+
+
+def processes_running(*argv, grace=5.0):
+    """Live processes whose command line starts with argv (after up to grace seconds)."""
+    wanted = "\0".join(argv) + "\0"
+    deadline = time.monotonic() + grace
+    while True:
+        found = []
+        for entry in os.listdir("/proc"):
+            if entry.isdigit() and is_running(entry, grace=0):
+                try:
+                    with open(f"/proc/{entry}/cmdline") as f:
+                        if f.read().startswith(wanted):
+                            found.append(int(entry))
+                except OSError:
+                    pass
+        if not found or time.monotonic() > deadline:
+            return found
+        time.sleep(0.05)
+
+
+@pytest.fixture
+def jobs(tmp_path):
+    finished = []
+    done = threading.Event()
+
+    def on_finished(job):
+        finished.append(job)
+        done.set()
+
+    manager = JobManager(LocalSSHManager(tmp_path), on_finished=on_finished, poll_interval=0.05)
+    manager.finished, manager.done = finished, done
+    return manager
+
+
+def test_job_output_and_exit_status_are_collected(jobs, tmp_path):
+    jobs.start(1, "echo hello; exit 3", "web1")
+    assert jobs.wait(timeout=10)
+    (job,) = jobs.finished
+    assert (job.output, job.exit_status, job.timed_out) == ("hello\n", 3, False)
+    assert not list((tmp_path / ".llm_ssh_agent" / "jobs").iterdir()) # Spool directory removed
+
+
+@pytest.mark.skipif(shutil.which("timeout") is None, reason="needs timeout(1)")
+def test_job_is_stopped_at_its_timeout(jobs):
+    jobs.start(1, "echo started; sleep 30", "web1", timeout=1)
+    assert jobs.wait(timeout=10)
+    (job,) = jobs.finished
+    assert job.timed_out and job.exit_status == 124
+    assert job.output == "started\n"
+    assert job.finished - job.started < 10
+
+
+def test_poller_kills_overdue_job_without_timeout_command(jobs, tmp_path, monkeypatch):
+    bin_dir = tmp_path / "bin" # A host without timeout(1)
+    bin_dir.mkdir()
+    for tool in ("sh", "sleep", "mkdir", "cat", "tail", "head", "mv", "rm", "setsid", "nohup"):
+        if shutil.which(tool):
+            (bin_dir / tool).symlink_to(shutil.which(tool))
+    jobs.ssh_manager.path = str(bin_dir)
+    monkeypatch.setattr("llm_ssh_agent.jobs.TIMEOUT_GRACE", 0.5)
+    jobs.start(1, "echo started; sleep 30", "web1", timeout=1)
+    assert jobs.wait(timeout=10)
+    (job,) = jobs.finished
+    assert job.timed_out and job.exit_status is None
+    assert job.output == "started\n"
+    assert not is_running(job.pid)
+
+
+@pytest.mark.skipif(shutil.which("timeout") is None, reason="needs timeout(1)")
+def test_cancel_kills_job_running_under_timeout(jobs):
+    # GNU timeout runs in its own process group, outside the job's
+    job = jobs.start(1, "sleep 97", "web1", timeout=120)
+    deadline = time.monotonic() + 5
+    while not processes_running("sleep", "97", grace=0) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert jobs.cancel(1)
+    assert jobs.finished == [job] and job.cancelled
+    assert processes_running("sleep", "97") == []
+    assert processes_running("timeout", "-k") == []
+
+
+def test_job_without_timeout_keeps_running(jobs):
+    jobs.start(1, "sleep 30", "web1")
+    assert not jobs.wait(timeout=0.5)
+    assert jobs.cancel(1)
+    assert jobs.finished[0].cancelled and jobs.running() == []
+
+
+def test_cancel_while_disconnected_kills_on_reconnect(jobs, tmp_path):
+    job = jobs.start(1, "sleep 30", "web1")
+    jobs.ssh_manager.connection.is_connected = False
+    assert jobs.cancel(1)
+    assert jobs.get(1) is job and job.cancelled # Still running remotely, so still listed
+    assert not jobs.done.wait(0.3)
+
+    jobs.ssh_manager.connection.is_connected = True
+    assert jobs.wait(timeout=10)
+    assert jobs.finished == [job]
+    assert not is_running(job.pid)
+    assert not (tmp_path / ".llm_ssh_agent" / "jobs" / job.job_id).exists()
+
+
+def test_cancel_unknown_job(jobs):
+    assert not jobs.cancel(42)
@@ -0,0 +1,102 @@
+# File: llm_ssh_agent/test_llm_interface.py
+# Type: Python Module (pytest)
+
+import ollama
+import pytest
+
+from llm_ssh_agent.app_state import ChatMessage, LLMConfig, ProposedCommand
+from llm_ssh_agent.llm_interface import LLMError, LLMInterface, MAX_COMMAND_TIMEOUT
+
+
+class FakePool:
+    """Stands in for LLMBackendPool.chat: returns the queued replies (or raises queued errors) in order."""
+
+    def __init__(self, *replies):
+        self.replies = list(replies)
+        self.requests = []
+
+    def chat(self, **kwargs):
+        self.requests.append(kwargs)
+        reply = self.replies.pop(0)
+        if isinstance(reply, Exception):
+            raise reply
+        return {"model": kwargs["model"], "message": reply}
+
+
+def make_interface(*replies):
+    interface = LLMInterface(LLMConfig(provider="none")) # No real pool, no health checks
+    interface.config.provider = "ollama"
+    interface.client = FakePool(*replies)
+    return interface
+
+
+def tool_call(arguments, name="run_ssh_command"):
+    return {"function": {"name": name, "arguments": arguments}}
+
+
+def ask(interface, text="check the disks"):
+    return interface.generate_response([ChatMessage(sender="user", text=text)], raise_errors=True)
+
+
+def test_native_tool_calls_become_proposed_commands():
+    interface = make_interface({"content": "Checking.", "tool_calls": [
+        tool_call({"command": "df -h", "host": "web1"}),
+        tool_call({"command": "du -sh /var"}),
+    ]})
+    text, commands = ask(interface)
+    assert text == "Checking."
+    assert commands == [ProposedCommand(command="df -h", host="web1"), ProposedCommand(command="du -sh /var")]
+    assert interface.client.requests[0]["tools"][0]["function"]["name"] == "run_ssh_command"
+
+
+def test_json_string_arguments_are_decoded():
+    interface = make_interface({"content": "", "tool_calls": [tool_call('{"command": "uptime", "background": "true"}')]})
+    assert ask(interface)[1] == [ProposedCommand(command="uptime", background=True)]
+
+
+@pytest.mark.parametrize("timeout, expected", [
+    (60, 60),
+    ("120", 120),
+    (0, 1),
+    (10 ** 6, MAX_COMMAND_TIMEOUT),
+    ("soon", None),
+    (None, None),
+])
+def test_timeouts_are_clamped(timeout, expected):
+    interface = make_interface({"content": "", "tool_calls": [tool_call({"command": "make", "timeout": timeout})]})
+    assert ask(interface)[1][0].timeout == expected
+
+
+def test_malformed_tool_calls_are_skipped_individually():
+    interface = make_interface({"content": "Here you go.", "tool_calls": [
+        tool_call("[1, 2]"),               # Decodes to a list
+        tool_call("{not json"),
+        tool_call(["uptime"]),
+        {"function": {"arguments": {"command": "id"}}}, # No name
+        {"type": "function"},              # No function
+        "garbage",
+        tool_call({"command": "   "}),
+        tool_call({"command": "ls"}, name="delete_everything"),
+        tool_call({"command": "uptime"}),
+    ]})
+    text, commands = ask(interface)
+    assert text == "Here you go."
+    assert commands == [ProposedCommand(command="uptime")]
+
+
+def test_models_without_tool_support_fall_back_to_tagged_commands():
+    interface = make_interface(
+        ollama.ResponseError("registry.ollama.ai/library/gemma:2b does not support tools"),
+        {"content": "Let me look.\n[SSH_COMMAND] free -m\n"},
+        {"content": "[SSH_COMMAND] uptime"},
+    )
+    assert ask(interface) == ("Let me look.", [ProposedCommand(command="free -m")])
+    assert "tools" not in interface.client.requests[1]
+    ask(interface) # The model is remembered: no second attempt with tools
+    assert len(interface.client.requests) == 3 and "tools" not in interface.client.requests[2]
+
+
+def test_other_errors_raise_llm_error():
+    interface = make_interface(ollama.ResponseError("model not found"))
+    with pytest.raises(LLMError, match="ensure the model"):
+        ask(interface)
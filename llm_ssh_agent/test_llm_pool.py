@@ -0,0 +1,141 @@
+# File: llm_ssh_agent/test_llm_pool.py
+# Type: Python Module (pytest)
+
+import threading
+import time
+
+import ollama
+import pytest
+
+from llm_ssh_agent.llm_pool import LLMBackendPool, LLMScheduler
+
+
+class FakeClient:
+    """Stands in for ollama.Client: streams the given chunks, with optional delays and failures."""
+
+    def __init__(self, chunks=("hello",), delay=0.0, fail_before=None, fail_after=None):
+        self.chunks = chunks
+        self.delay = delay # Before the first chunk
+        self.fail_before = fail_before # Raised instead of streaming
+        self.fail_after = fail_after # Raised after the chunks
+        self.calls = 0
+
+    def chat(self, **kwargs):
+        self.calls += 1
+        if self.fail_before is not None:
+            raise self.fail_before
+        return self._stream(kwargs.get("model"))
+
+    def _stream(self, model):
+        time.sleep(self.delay)
+        for text in self.chunks:
+            yield {"model": model, "message": {"content": text}}
+        if self.fail_after is not None:
+            raise self.fail_after
+
+    def list(self):
+        return {"models": []}
+
+
+def make_pool(*clients, hedge_after=None):
+    pool = LLMBackendPool([f"http://llm{i}:11434" for i in range(len(clients))], hedge_after=hedge_after,
+                          health_check_interval=0)
+    for endpoint, client in zip(pool.endpoints, clients):
+        endpoint.client = client
+    return pool
+
+
+def chat_with_deadline(pool, deadline=5.0):
+    """Runs pool.chat() in a thread so a hang fails the test instead of blocking it."""
+    outcome = {}
+
+    def target():
+        try:
+            outcome["response"] = pool.chat(model="m", messages=[])
+        except Exception as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(deadline)
+    assert not thread.is_alive(), "chat() did not return"
+    return outcome
+
+
+def test_single_endpoint_assembles_stream():
+    pool = make_pool(FakeClient(chunks=("Hello, ", "world")))
+    response = pool.chat(model="m", messages=[])
+    assert response["message"]["content"] == "Hello, world"
+    assert response["model"] == "m"
+
+
+def test_fails_over_to_next_endpoint():
+    first = FakeClient(fail_before=ConnectionError("refused"))
+    second = FakeClient(chunks=("from second",))
+    pool = make_pool(first, second)
+    response = pool.chat(model="m", messages=[])
+    assert response["message"]["content"] == "from second"
+    stats = pool.get_stats()
+    assert stats[0].failures == 1 and not stats[0].healthy
+    assert stats[1].failures == 0
+
+
+def test_raises_last_error_when_every_endpoint_fails():
+    pool = make_pool(FakeClient(fail_before=ConnectionError("a down")), FakeClient(fail_before=ConnectionError("b down")))
+    with pytest.raises(ConnectionError, match="b down"):
+        pool.chat(model="m", messages=[])
+
+
+def test_request_errors_are_not_retried_elsewhere():
+    second = FakeClient()
+    pool = make_pool(FakeClient(fail_before=ollama.ResponseError("model does not support tools", 400)), second)
+    with pytest.raises(ollama.ResponseError):
+        pool.chat(model="m", messages=[])
+    assert second.calls == 0
+
+
+def test_hedged_request_wins_over_slow_endpoint():
+    slow = FakeClient(chunks=("slow",), delay=1.0)
+    fast = FakeClient(chunks=("fast",))
+    pool = make_pool(slow, fast, hedge_after=0.1)
+    outcome = chat_with_deadline(pool)
+    assert outcome["response"]["message"]["content"] == "fast"
+    assert pool.get_stats()[1].hedges_won == 1
+
+
+def test_hedge_winner_failing_mid_stream_fails_over_to_cancelled_endpoint():
+    # The hedged attempt produces the first token (so the slow one is cancelled),
+    # then dies; the pool must retry the slow endpoint instead of waiting forever
+    slow = FakeClient(chunks=("slow but complete",), delay=0.5)
+    flaky = FakeClient(chunks=("partial",), fail_after=ConnectionError("reset by peer"))
+    pool = make_pool(slow, flaky, hedge_after=0.1)
+    outcome = chat_with_deadline(pool, deadline=8.0)
+    assert "error" not in outcome, outcome.get("error")
+    assert outcome["response"]["message"]["content"] == "slow but complete"
+    assert slow.calls == 2
+
+
+def test_scheduler_limits_concurrency_in_arrival_order():
+    scheduler = LLMScheduler(max_concurrent=1)
+    order, peak, running = [], [0], [0]
+    lock = threading.Lock()
+
+    def work(n):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.02)
+        with lock:
+            running[0] -= 1
+            order.append(n)
+
+    threads = []
+    for n in range(5):
+        thread = threading.Thread(target=scheduler.run, args=(work, n))
+        thread.start()
+        threads.append(thread)
+        time.sleep(0.005) # Stagger arrivals so the expected order is well defined
+    for thread in threads:
+        thread.join(5)
+    assert peak[0] == 1
+    assert order == list(range(5))
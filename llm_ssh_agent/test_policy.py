@@ -0,0 +1,198 @@
+# File: llm_ssh_agent/test_policy.py
+# Type: Python Module (pytest)
+
+import json
+import time
+
+import pytest
+
+from llm_ssh_agent.policy import CommandPolicy, PolicyRule, load_policy
+
+
+def policy(*rules):
+    return CommandPolicy([PolicyRule(**rule) for rule in rules])
+
+
+# --- Matching basics ---
+
+def test_command_prefixes_match_on_whole_words():
+    p = policy({"action": "allow", "commands": ["systemctl status"]})
+    assert p.evaluate("systemctl status nginx").action == "allow"
+    assert p.evaluate("systemctl   status").action == "allow" # Whitespace is normalized
+    assert p.evaluate("systemctl statusx").action == "ask"
+    assert p.evaluate("systemctl restart nginx").action == "ask"
+
+
+def test_pattern_must_match_whole_command():
+    p = policy({"action": "allow", "pattern": r"tail -n \d+ /var/log/\S+"})
+    assert p.evaluate("tail -n 50 /var/log/syslog").action == "allow"
+    assert p.evaluate("tail -n 50 /var/log/syslog /etc/shadow").action == "ask"
+
+
+def test_deny_beats_ask_beats_allow():
+    p = policy(
+        {"name": "all-systemctl", "action": "allow", "commands": ["systemctl"]},
+        {"name": "restarts", "action": "ask", "commands": ["systemctl restart"]},
+        {"name": "no-ssh", "action": "deny", "pattern": "systemctl (stop|restart) sshd"},
+    )
+    assert p.evaluate("systemctl status sshd").rule == "all-systemctl"
+    assert p.evaluate("systemctl restart nginx").action == "ask"
+    decision = p.evaluate("systemctl restart sshd")
+    assert (decision.action, decision.rule) == ("deny", "no-ssh")
+
+
+def test_unnamed_rules_are_reported_by_file_position():
+    p = policy({"action": "allow", "commands": ["ls"]}, {"action": "deny", "commands": ["rm"]})
+    assert p.evaluate("rm x").rule == "rule #2"
+
+
+def test_allow_rules_skip_commands_with_shell_operators():
+    p = policy({"action": "allow", "commands": ["cat"]},
+               {"action": "allow", "commands": ["grep"], "allow_shell_operators": True})
+    assert p.evaluate("cat /etc/hosts").action == "allow"
+    for command in ("cat /etc/hosts; rm -rf /", "cat x | sh", "cat $(whoami)", "cat x > y", "cat `id`", "cat a\nrm b"):
+        assert p.evaluate(command).action == "ask", command
+    assert p.evaluate("grep root /etc/passwd | head").action == "allow"
+
+
+def test_deny_rules_still_apply_to_commands_with_shell_operators():
+    p = policy({"action": "deny", "pattern": "rm .*"})
+    assert p.evaluate("rm -rf / && echo done").action == "deny"
+
+
+def test_host_and_group_scopes():
+    p = policy({"action": "allow", "commands": ["reboot"], "hosts": ["lab1"]},
+               {"action": "allow", "commands": ["apt-get update"], "groups": ["web"]})
+    assert p.evaluate("reboot", host="lab1").action == "allow"
+    assert p.evaluate("reboot", host="prod1").action == "ask"
+    assert p.evaluate("apt-get update", host="w1", groups=["web"]).action == "allow"
+    assert p.evaluate("apt-get update", host="d1", groups=["db"]).action == "ask"
+
+
+def test_max_args():
+    p = policy({"action": "allow", "commands": ["ls"], "max_args": 2})
+    assert p.evaluate("ls -l /tmp").action == "allow"
+    assert p.evaluate("ls -l /tmp /var").action == "ask"
+
+
+def test_empty_policy_asks():
+    assert CommandPolicy().evaluate("uptime").action == "ask"
+
+
+# --- Literal head bucketing ---
+
+def test_top_level_alternation_is_not_bucketed_under_first_word():
+    # Regression: the rule used to be filed under "rm" only, so dd was allowed
+    p = policy({"action": "deny", "pattern": "rm -rf .*|dd .*"},
+               {"action": "allow", "commands": ["dd"]})
+    assert p.evaluate("rm -rf /").action == "deny"
+    assert p.evaluate("dd if=/dev/zero of=/dev/sda").action == "deny"
+
+
+def test_leading_word_group_is_bucketed_per_word():
+    p = policy({"action": "deny", "pattern": "(shutdown|reboot|halt)( .*)?"},
+               {"action": "allow", "commands": ["shutdown", "reboot", "halt"]})
+    for command in ("shutdown -h now", "reboot", "halt -p"):
+        assert p.evaluate(command).action == "deny", command
+
+
+def test_optional_whitespace_after_head_is_not_treated_as_literal_head():
+    # "git\s*push" also matches "gitpush", whose first word isn't "git"
+    p = policy({"action": "deny", "pattern": r"git\s*push.*"},
+               {"action": "allow", "commands": ["gitpush"]})
+    assert p.evaluate("gitpush --force").action == "deny"
+
+
+def test_optional_head_word_is_not_treated_as_literal():
+    p = policy({"action": "deny", "pattern": r"sudo ?rm .*"},
+               {"action": "allow", "commands": ["sudorm"]})
+    assert p.evaluate("sudorm -rf /").action == "deny"
+
+
+def test_alternation_inside_classes_and_escapes_is_not_split():
+    p = policy({"action": "allow", "pattern": r"echo [a|b] \| x", "allow_shell_operators": True})
+    assert len(p._alternatives[0]) == 1
+    assert p.evaluate("echo a | x").action == "allow"
+    assert p.evaluate("echo b").action == "ask"
+
+
+def test_many_headless_word_group_rules_stay_fast():
+    rules = [{"action": "allow", "pattern": f"(cmd{i}|x{i}) status"} for i in range(5000)]
+    p = policy(*rules)
+    assert p.evaluate("cmd4999 status").action == "allow"
+    start = time.perf_counter()
+    for i in range(4800, 5000): # Late rules: a combined alternation would try thousands first
+        assert p.evaluate(f"x{i} status").action == "allow"
+    assert time.perf_counter() - start < 1.0
+
+
+# --- deny_args ---
+
+@pytest.fixture
+def sed_policy():
+    return policy({"name": "no sed -i", "action": "allow", "commands": ["sed"], "deny_args": ["-i", "--in-place"]})
+
+
+@pytest.mark.parametrize("command", [
+    "sed -n s/a/b/p f",
+    "sed -e s/x/y/ f",
+    "sed -n 's/a/b/p' f",
+    "sed --quiet s/a/b/ f",
+])
+def test_deny_args_allows_other_arguments(sed_policy, command):
+    assert sed_policy.evaluate(command).action == "allow"
+
+
+@pytest.mark.parametrize("command", [
+    "sed -i s/a/b/ f",
+    "sed -i.bak s/a/b/ f",       # Attached value
+    "sed -ni s/a/b/ f",          # Clustered flags
+    "sed -n -i s/a/b/ f",
+    "sed '-i' s/a/b/ f",         # Quoted
+    "sed -'i' s/a/b/ f",
+    "sed \\-i s/a/b/ f",
+    "sed --in-place s/a/b/ f",
+    "sed --in-place=.bak s/a/b/ f",
+    "sed --in-pl s/a/b/ f",      # Abbreviated long option
+    "sed --in-'place' s/a/b/ f",
+    "sed ${x:--i} s/a/b/ f",     # Expansion
+])
+def test_deny_args_catches_spelled_variants(sed_policy, command):
+    assert sed_policy.evaluate(command).action == "ask"
+
+
+def test_deny_args_on_exact_words():
+    p = policy({"action": "allow", "commands": ["find"], "deny_args": ["-delete", "-exec"]})
+    assert p.evaluate("find /var/log -name '*.gz'").action == "allow"
+    assert p.evaluate("find /tmp -delete").action == "ask"
+    assert p.evaluate("find /tmp -de'lete'").action == "ask"
+
+
+# --- Loading ---
+
+def write_policy(tmp_path, rules):
+    path = tmp_path / "policy.json"
+    path.write_text(json.dumps({"rules": rules}))
+    return str(path)
+
+
+def test_load_policy_missing_file_is_empty(tmp_path):
+    assert len(load_policy(str(tmp_path / "missing.json"))) == 0
+
+
+def test_load_policy(tmp_path):
+    p = load_policy(write_policy(tmp_path, [{"action": "allow", "commands": ["uptime"]}]))
+    assert p.evaluate("uptime").action == "allow"
+
+
+@pytest.mark.parametrize("rule, message", [
+    ({"action": "permit", "commands": ["ls"]}, "unknown action"),
+    ({"action": "allow"}, "needs 'commands' or 'pattern'"),
+    ({"action": "allow", "pattern": "ls ("}, "invalid pattern"),
+    ({"action": "allow", "pattern": "(?P<x>ls)"}, "named groups"),
+    ({"action": "allow", "pattern": r"(a) \1"}, "backreferences"),
+    ({"action": "allow", "commands": ["ls"], "colour": "red"}, "unexpected keyword"),
+])
+def test_load_policy_rejects_invalid_rules(tmp_path, rule, message):
+    with pytest.raises(ValueError, match=message):
+        load_policy(write_policy(tmp_path, [rule]))
@@ -0,0 +1,43 @@
+# File: llm_ssh_agent/test_retrieval.py
+# Type: Python Module (pytest)
+
+import os
+
+from llm_ssh_agent.retrieval import CHUNKS_FILE, HashingEmbedder, OutputRetrievalStore
+
+
+def test_search_stays_on_the_requested_host():
+    store = OutputRetrievalStore(HashingEmbedder())
+    store.add_output("cat /etc/app.conf", "db_password = hunter2", host="db1")
+    store.add_output("systemctl status nginx", "nginx.service active (running)", host="web1")
+    results = store.search("db_password app.conf", top_k=4, host="web1")
+    assert [chunk.host for _, chunk in results] == ["web1"]
+    assert store.search("db_password", host="unknown-host") == []
+    assert len(store.search("db_password", top_k=4)) == 2
+
+
+def test_oldest_chunks_are_evicted_beyond_the_cap(tmp_path):
+    store = OutputRetrievalStore(HashingEmbedder(), path=str(tmp_path), max_chunks=8)
+    for n in range(12):
+        store.add_output(f"echo {n}", f"output number {n}", host="h")
+    assert len(store) <= 8
+    commands = [chunk.command for _, chunk in store.search("output number", top_k=20, host="h")]
+    assert "echo 11" in commands and "echo 0" not in commands
+    # The files were rewritten to match, so a reload sees the same entries
+    assert len(OutputRetrievalStore(HashingEmbedder(), path=str(tmp_path), max_chunks=8)) == len(store)
+
+
+def test_torn_chunk_line_is_dropped_and_files_repaired(tmp_path):
+    store = OutputRetrievalStore(HashingEmbedder(), path=str(tmp_path))
+    store.add_output("uptime", "up 3 days", host="h")
+    store.add_output("df -h", "/dev/sda1 40G 12G 28G 30% /", host="h")
+    with open(os.path.join(tmp_path, CHUNKS_FILE), "a") as f:
+        f.write('{"command": "free -m", "te') # Crash mid-write
+
+    reloaded = OutputRetrievalStore(HashingEmbedder(), path=str(tmp_path))
+    assert len(reloaded) == 2
+    reloaded.add_output("free -m", "Mem: 7900 1200", host="h")
+    # Later appends line up with the repaired files and survive another reload
+    again = OutputRetrievalStore(HashingEmbedder(), path=str(tmp_path))
+    assert len(again) == 3
+    assert again.search("mem free", top_k=1, host="h")[0][1].command == "free -m"
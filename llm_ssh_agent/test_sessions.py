@@ -0,0 +1,163 @@
+# File: llm_ssh_agent/test_sessions.py
+# Type: Python Module (pytest)
+
+import json
+import os
+
+import pytest
+
+from llm_ssh_agent import sessions
+from llm_ssh_agent.app_state import ChatMessage, LLMConfig, ProposedCommand, SSHLogEntry
+from llm_ssh_agent.command_queue import CommandState
+from llm_ssh_agent.host_facts import HostFactsCache
+from llm_ssh_agent.jobs import RemoteJob
+from llm_ssh_agent.policy import CommandPolicy
+from llm_ssh_agent.sessions import SESSION_FILE, SessionManager
+from llm_ssh_agent.test_jobs import LocalSSHManager, is_running
+
+
+class FakeLLM:
+    def __init__(self):
+        self.config = LLMConfig()
+
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    monkeypatch.setattr(sessions, "HostFactsCache", lambda: HostFactsCache(path=None)) # Keep the user's cache out of it
+    manager = SessionManager(llm_interface=FakeLLM(), sessions_dir=str(tmp_path / "sessions"), policy=CommandPolicy())
+    yield manager
+    for session_id in [info.session_id for info in manager.list_sessions()]:
+        manager.close_session(session_id)
+
+
+def running_background_command(core_logic, command="sleep 30"):
+    queue = core_logic.state.command_queue
+    record = queue.add(ProposedCommand(command=command, background=True))
+    queue.transition(record.command_id, CommandState.APPROVED)
+    queue.transition(record.command_id, CommandState.RUNNING)
+    return record
+
+
+def use_local_shell(core_logic, home):
+    local = LocalSSHManager(home)
+    local.disconnect = lambda: None
+    core_logic.ssh_manager = core_logic.job_manager.ssh_manager = local
+    return local
+
+
+def test_page_out_and_in_restores_conversation_log_and_queue(manager):
+    session_id = manager.create_session("disks")
+    core_logic = manager.get(session_id)
+    question = ChatMessage(sender="user", text="How full is /var?")
+    answer = ChatMessage(sender="llm", text="Let me check [SSH_COMMAND] df -h /var")
+    core_logic.state.conversation_history += [question, answer]
+    core_logic.state.ssh_log.append(SSHLogEntry(command="uptime", output="up 3 days", timestamp=1000.0))
+    queue = core_logic.state.command_queue
+    done = queue.add(ProposedCommand(command="uptime"))
+    queue.transition(done.command_id, CommandState.APPROVED)
+    queue.transition(done.command_id, CommandState.RUNNING)
+    queue.transition(done.command_id, CommandState.DONE, exit_status=0)
+    pending = queue.add(ProposedCommand(command="df -h /var", host="web1", timeout=60), message_id=answer.message_id)
+
+    assert manager.page_out(session_id)
+    assert manager.loaded_count() == 0 and manager.list_sessions()[0].paged_out
+
+    restored = manager.get(session_id)
+    assert restored is not core_logic
+    assert [(m.sender, m.text) for m in restored.state.conversation_history] == [(m.sender, m.text) for m in (question, answer)]
+    assert [(e.command, e.output) for e in restored.state.ssh_log] == [("uptime", "up 3 days")]
+    (active,) = restored.state.command_queue.active()
+    assert (active.command_id, active.command, active.host, active.timeout, active.state) == \
+        (pending.command_id, "df -h /var", "web1", 60, CommandState.PROPOSED)
+    assert active.message_id == restored.state.conversation_history[1].message_id # Follows the message's new ID
+    assert [r.command_id for r in restored.state.command_queue.finished()] == [done.command_id]
+    # New commands continue past the restored IDs
+    assert restored.state.command_queue.add(ProposedCommand(command="w")).command_id == pending.command_id + 1
+
+
+def test_saved_sessions_are_found_by_a_new_manager(manager, tmp_path):
+    session_id = manager.create_session("db")
+    manager.get(session_id).state.conversation_history.append(ChatMessage(sender="user", text="hi"))
+    manager.shutdown()
+
+    fresh = SessionManager(llm_interface=FakeLLM(), sessions_dir=manager.sessions_dir, policy=CommandPolicy())
+    (info,) = fresh.list_sessions()
+    assert (info.session_id, info.name, info.paged_out) == (session_id, "db", True)
+    assert fresh.get(session_id).state.conversation_history[0].text == "hi"
+
+
+def test_active_and_pinned_sessions_stay_loaded(manager):
+    active, pinned, idle = (manager.create_session() for _ in range(3))
+    manager.activate(active)
+    manager.pin(pinned)
+    manager.pin(pinned)
+    manager.idle_timeout = 0
+    assert manager.page_out_idle() == [idle]
+
+    manager.unpin(pinned)
+    assert not manager.page_out(pinned) # Still one pin left
+    manager.unpin(pinned)
+    assert manager.page_out(pinned)
+    assert not manager.page_out(active)
+    assert manager.loaded_count() == 1
+
+
+def test_busy_session_is_only_paged_out_when_forced(manager):
+    session_id = manager.create_session()
+    queue = manager.get(session_id).state.command_queue
+    record = queue.add(ProposedCommand(command="make"))
+    queue.transition(record.command_id, CommandState.APPROVED)
+    assert not manager.page_out(session_id)
+
+    assert manager.page_out(session_id, force=True)
+    restored = manager.get(session_id).state.command_queue.get(record.command_id)
+    assert restored.state == CommandState.CANCELLED and "Interrupted" in restored.error
+
+
+def test_background_jobs_are_tracked_again_after_page_in(manager):
+    session_id = manager.create_session()
+    core_logic = manager.get(session_id)
+    record = running_background_command(core_logic)
+    job = RemoteJob(job_id="job1", command_id=record.command_id, command=record.command, profile_name="web1",
+                    timeout=600, pid=4242, offset=10, output="started\n", started=1000.0)
+    core_logic.job_manager.adopt(job) # Not connected to web1, so never polled here
+
+    assert manager.page_out(session_id, force=True)
+    assert core_logic.job_manager.running() == []
+    with open(os.path.join(manager.sessions_dir, session_id, SESSION_FILE)) as f:
+        assert json.load(f)["jobs"][0]["pid"] == 4242
+
+    restored = manager.get(session_id)
+    assert restored.job_manager.running() == [job]
+    assert restored.state.command_queue.get(record.command_id).state == CommandState.RUNNING
+
+
+def test_close_session_kills_background_jobs(manager, tmp_path):
+    session_id = manager.create_session()
+    core_logic = manager.get(session_id)
+    use_local_shell(core_logic, tmp_path)
+    record = running_background_command(core_logic)
+    job = core_logic.job_manager.start(record.command_id, record.command, "web1")
+
+    manager.close_session(session_id)
+    assert not is_running(job.pid)
+    assert record.state == CommandState.CANCELLED
+    assert core_logic.job_manager.running() == []
+    assert not os.path.exists(os.path.join(manager.sessions_dir, session_id))
+
+
+def test_close_session_stops_tracking_jobs_it_cannot_reach(manager, tmp_path):
+    session_id = manager.create_session()
+    core_logic = manager.get(session_id)
+    local = use_local_shell(core_logic, tmp_path)
+    record = running_background_command(core_logic)
+    job = core_logic.job_manager.start(record.command_id, record.command, "web1")
+    local.connection.is_connected = False
+    poller = core_logic.job_manager._poller
+
+    manager.close_session(session_id)
+    assert core_logic.job_manager.running() == []
+    poller.join(timeout=5)
+    assert not poller.is_alive() # Nothing left to poll
+    assert is_running(job.pid, grace=0) # Orphaned, not killed
+    os.killpg(job.pid, 9)
@@ -0,0 +1,174 @@
+# File: llm_ssh_agent/test_ssh_manager.py
+# Type: Python Module (pytest)
+
+import io
+
+import paramiko
+import pytest
+
+from llm_ssh_agent import ssh_manager
+from llm_ssh_agent.app_state import SSHConnectionProfile
+from llm_ssh_agent.ssh_manager import SSHConnectionPool, SSHManager, open_ssh_client, resolve_jump_hosts
+
+
+class FakeTransport:
+    def __init__(self):
+        self.active = True
+
+    def is_active(self):
+        return self.active
+
+
+class FakeChannel:
+    def recv_exit_status(self):
+        return 0
+
+
+class FakeOutput(io.BytesIO):
+    channel = FakeChannel()
+
+
+class FakeClient:
+    def __init__(self, name):
+        self.name = name
+        self.transport = FakeTransport()
+        self.closed = False
+
+    def get_transport(self):
+        return self.transport
+
+    def exec_command(self, command, timeout=None):
+        return None, FakeOutput(self.name.encode()), FakeOutput()
+
+    def close(self):
+        self.closed = True
+        self.transport.active = False
+
+
+class FakeOpener:
+    """Stands in for open_ssh_client; keeps the clients it handed out, in order."""
+
+    def __init__(self):
+        self.clients = []
+        self.fail = False
+
+    def __call__(self, profile, jump_profiles=()):
+        if self.fail:
+            return None, "Connection refused"
+        self.clients.append(FakeClient(f"client{len(self.clients)}"))
+        return self.clients[-1], None
+
+
+@pytest.fixture
+def opener(monkeypatch):
+    opener = FakeOpener()
+    monkeypatch.setattr(ssh_manager, "open_ssh_client", opener)
+    monkeypatch.setattr(ssh_manager, "resolve_jump_hosts", lambda profile: ([], None))
+    return opener
+
+
+@pytest.fixture
+def profile():
+    return SSHConnectionProfile(profile_name="web1", hostname="web1.example", username="ops")
+
+
+def test_sessions_share_one_connection(opener, profile):
+    pool = SSHConnectionPool()
+    a, b = SSHManager(pool=pool), SSHManager(pool=pool)
+    a.connect(profile)
+    b.connect(profile)
+    assert len(opener.clients) == 1 and pool.stats() == {"web1": 2}
+    a.disconnect()
+    assert not opener.clients[0].closed # Still used by b
+    b.disconnect()
+    assert opener.clients[0].closed and pool.stats() == {}
+
+
+def test_reconnect_by_one_holder_reaches_the_others(opener, profile):
+    pool = SSHConnectionPool()
+    a, b = SSHManager(pool=pool), SSHManager(pool=pool)
+    a.connect(profile)
+    b.connect(profile)
+    opener.clients[0].transport.active = False # The connection drops
+
+    assert b.run_raw("hostname")[0] == b"client1" # b reconnects
+    assert a.run_raw("hostname")[0] == b"client1" # a uses the replacement, not the dead client
+    assert a.execute_command_with_status("hostname") == ("client1", "", 0)
+    assert len(opener.clients) == 2 and opener.clients[0].closed and not opener.clients[1].closed
+
+    c = SSHManager(pool=pool)
+    c.connect(profile) # A new holder gets the live connection as well
+    assert len(opener.clients) == 2 and pool.stats() == {"web1": 3}
+    for manager in (a, b, c):
+        manager.disconnect()
+    assert opener.clients[1].closed and pool.stats() == {}
+
+
+def test_failed_reconnect_marks_holder_disconnected_but_keeps_its_reference(opener, profile):
+    pool = SSHConnectionPool()
+    manager = SSHManager(pool=pool)
+    manager.connect(profile)
+    opener.clients[0].transport.active = False
+    opener.fail = True
+
+    stdout, stderr, status = manager.execute_command_with_status("uptime")
+    assert status is None and "Connection refused" in stderr
+    assert not manager.get_connection_state().is_connected
+    with pytest.raises(ConnectionError):
+        manager.run_raw("uptime")
+    assert pool.stats() == {"web1": 1}
+    manager.disconnect()
+    assert pool.stats() == {}
+
+
+# --- Jump hosts ---
+
+def test_bastions_are_reached_through_the_targets_list_only():
+    profiles = {
+        "outer": SSHConnectionProfile(profile_name="outer", hostname="o", username="ops"),
+        "inner": SSHConnectionProfile(profile_name="inner", hostname="i", username="ops", jump_hosts=["elsewhere"]),
+    }
+    target = SSHConnectionProfile(profile_name="db1", hostname="db1", username="ops", jump_hosts=["outer", "inner"])
+    chain, error = resolve_jump_hosts(target, profiles)
+    assert error is None and [p.profile_name for p in chain] == ["outer", "inner"]
+
+
+@pytest.mark.parametrize("jump_hosts, message", [
+    (["missing"], "not found"),
+    (["outer", "outer"], "appears twice"),
+    (["db1"], "appears twice"),
+])
+def test_invalid_jump_chains(jump_hosts, message):
+    profiles = {"outer": SSHConnectionProfile(profile_name="outer", hostname="o", username="ops")}
+    target = SSHConnectionProfile(profile_name="db1", hostname="db1", username="ops", jump_hosts=jump_hosts)
+    profiles["db1"] = target
+    chain, error = resolve_jump_hosts(target, profiles)
+    assert chain == [] and message in error
+
+
+class FakeTunnel:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def test_failed_login_through_bastion_closes_channel_and_lease(monkeypatch):
+    tunnel = FakeTunnel()
+    bastion_client = FakeClient("bastion")
+    bastion_client.transport.open_channel = lambda *args, **kwargs: tunnel
+    released = []
+    monkeypatch.setattr(ssh_manager._bastion_pool, "acquire", lambda profile, via: (bastion_client, None))
+    monkeypatch.setattr(ssh_manager._bastion_pool, "release", lambda profile, via: released.append(profile.profile_name))
+    monkeypatch.setattr(ssh_manager, "get_ssh_secret", lambda name, kind: "secret")
+
+    def refuse(self, **kwargs):
+        raise paramiko.AuthenticationException("denied")
+    monkeypatch.setattr(paramiko.SSHClient, "connect", refuse)
+
+    bastion = SSHConnectionProfile(profile_name="bastion", hostname="b", username="ops")
+    target = SSHConnectionProfile(profile_name="db1", hostname="db1", username="ops", auth_method="password")
+    client, error = open_ssh_client(target, [bastion])
+    assert client is None and "Authentication failed" in error
+    assert tunnel.closed and released == ["bastion"]
@@ -0,0 +1,32 @@
+# File: llm_ssh_agent/test_utils.py
+# Type: Python Module (pytest)
+
+from llm_ssh_agent.utils import summarize_output_change
+
+
+def lines(count, changed=None):
+    return "\n".join(f"line {n}" if n != changed else f"line {n} CHANGED" for n in range(count))
+
+
+def test_identical_output_is_unchanged():
+    assert summarize_output_change(lines(20), lines(20)) == ""
+
+
+def test_only_line_ending_differences_count_as_unchanged():
+    assert summarize_output_change(lines(20), lines(20) + "\n") == ""
+
+
+def test_small_change_gives_compact_diff():
+    diff = summarize_output_change(lines(50), lines(50, changed=25))
+    assert diff is not None and diff
+    assert "-line 25" in diff and "+line 25 CHANGED" in diff
+    assert "---" not in diff.splitlines()[0] # File headers are dropped
+    assert "line 10" not in diff # Only one line of context around the change
+
+
+def test_mostly_different_output_falls_back_to_full_output():
+    assert summarize_output_change(lines(10), "completely\ndifferent\noutput") is None
+
+
+def test_empty_previous_output_falls_back_to_full_output():
+    assert summarize_output_change("", lines(5)) is None
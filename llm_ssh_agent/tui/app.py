@@ -1,15 +1,21 @@
 # File: llm_ssh_agent/tui/app.py
 # Type: Python Module
 
+from typing import Union
+
 from textual.app import App, ComposeResult
 from textual.containers import Container, Horizontal, Vertical
-from textual.widgets import Header, Footer, Log, Input, Button, Static, Label, ListView, ListItem
+from textual.widgets import Header, Footer, Log, Input, Button, Static, Label, ListView, ListItem, Tabs, Tab, RichLog
 from textual.reactive import reactive
 from textual.binding import Binding
 from textual.message import Message
+from rich.markup import escape
 
 from ..core_logic import CoreLogic
+from ..sessions import SessionManager
+from ..daemon import RemoteSessionManager
 from ..app_state import ChatMessage, SSHLogEntry, SSHConnectionProfile # Import necessary states
+from ..command_queue import CommandRecord
 
 # --- Custom Messages for App Communication ---
 class CoreUpdate(Message):
@@ -25,16 +31,9 @@ class ShowModalScreen(Message):
 
 
 # --- Placeholder Widgets (Representing the complex widgets in ./widgets/) ---
-class ChatPane(Static): # <-- Change Log to Static
+class ChatPane(RichLog): # RichLog: clear()/write() like Log, plus markup (created with markup=True)
     """ Placeholder for the actual chat pane widget. """
-    # Ensure markup is enabled if using Static to display rich text
-    # You might need to pass markup=True here or when updating its content
-    # For simplicity, let's assume it takes text and we'll set markup=True
-
-    # If ChatPane takes text directly to display, it might look something like this:
-    # def update(self, text: str):
-    #     self.update(text) # Static widget update
-    pass # Keep the pass for the placeholder if it's just inheriting for now
+    pass
 
 
 class SSHLogPane(Log):
@@ -44,10 +43,14 @@ class SSHLogPane(Log):
 class CommandApprovalPane(Container):
      """ Placeholder for the command approval widget area. """
      # This would contain ListView, Buttons etc.
-     def update_commands(self, commands: list[str]):
+     def update_commands(self, commands: list[CommandRecord]):
           # Clear existing widgets and add new ones based on commands list
           pass
 
+     def update_command(self, record: CommandRecord):
+          # Refresh the row for record.command_id (state, exit status) in place
+          pass
+
 class ConnectionDialog(Static): # Replace with actual Screen later
      """ Placeholder for connection management dialog/screen. """
      pass
@@ -66,6 +69,8 @@ class LLMSshApp(App[None]):
         Binding("ctrl+q", "quit", "Quit App"),
         Binding("ctrl+l", "toggle_logs", "Toggle SSH Log Pane"), # Example custom binding
         Binding("ctrl+n", "connect_dialog", "New/Manage Connections"),
+        Binding("ctrl+t", "new_session", "New Session"),
+        Binding("ctrl+g", "close_session", "Close Session"), # ctrl+w is delete-word in the input
     ]
 
     CSS_PATH = "style.tcss" # We'll need a CSS file
@@ -74,26 +79,50 @@ class LLMSshApp(App[None]):
     chat_history: list[ChatMessage] = reactive([])
     ssh_log_entries: list[SSHLogEntry] = reactive([])
     connection_status: str = reactive("Disconnected")
-    pending_commands: list[str] = reactive([])
+    pending_commands: list[CommandRecord] = reactive([])
 
 
-    def __init__(self, core_logic: CoreLogic, **kwargs):
+    def __init__(self, session_manager: Union[SessionManager, RemoteSessionManager], **kwargs):
         super().__init__(**kwargs)
-        self.core_logic = core_logic
+        self.session_manager = session_manager
+        sessions = session_manager.list_sessions()
+        session_id = sessions[0].session_id if sessions else session_manager.create_session()
+        # Only the session in the active tab is bound to the UI; the others
+        # keep running in the background and are redrawn when switched to
+        self.core_logic: CoreLogic = session_manager.activate(session_id)
         self._set_core_logic_callbacks()
 
+    @staticmethod
+    def _tab_id(session_id: str) -> str:
+        return f"session-{session_id}" # Widget IDs can't start with a digit
+
     def _set_core_logic_callbacks(self):
         """Set the callbacks in CoreLogic to update the TUI."""
         self.core_logic.update_chat_callback = self.update_chat
         self.core_logic.update_ssh_log_callback = self.update_ssh_log
         self.core_logic.update_connection_status_callback = self.update_connection_status
         self.core_logic.update_pending_commands_callback = self.update_pending_commands
+        self.core_logic.update_command_state_callback = self.update_command_state
         self.core_logic.show_message_callback = self.show_modal_message # Needs implementation
 
+    def _clear_core_logic_callbacks(self):
+        """Unbinds the current session from the UI (before switching to another one)."""
+        self.core_logic.update_chat_callback = None
+        self.core_logic.update_ssh_log_callback = None
+        self.core_logic.update_connection_status_callback = None
+        self.core_logic.update_pending_commands_callback = None
+        self.core_logic.update_command_state_callback = None
+        self.core_logic.show_message_callback = None
+
     # --- UI Composition ---
 
     def compose(self) -> ComposeResult:
         yield Header()
+        yield Tabs(
+            *[Tab(info.name, id=self._tab_id(info.session_id)) for info in self.session_manager.list_sessions()],
+            active=self._tab_id(self.session_manager.active_session_id),
+            id="session-tabs",
+        )
         yield Container(
             Horizontal(
                 Vertical(
@@ -120,45 +149,56 @@ class LLMSshApp(App[None]):
         # Initial status update
         status_widget = self.query_one(StatusBar)
         status_widget.update(self.connection_status) # Placeholder update
+        self._render_session() # The first session may have been restored from disk
 
     # --- Callback Implementations (called by CoreLogic) ---
 
     def update_chat(self, history: list[ChatMessage]):
-        def _update():
-            chat_pane = self.query_one("#chat-pane", ChatPane)
-            chat_pane.clear()
-            for msg in history:
-                prefix = "[bold blue]You:[/]" if msg.sender == "user" \
-                    else "[bold magenta]LLM:[/]" if msg.sender == "llm" \
-                    else "[bold yellow]Sys:[/]"
-                chat_pane.write(f"{prefix} {msg.text}")
-            self.chat_history = history # Update reactive var if needed elsewhere
         # Ensure UI updates happen in the app's thread
-        self.call_from_thread(_update)
+        self.call_from_thread(self._render_chat, history)
+
+    def _render_chat(self, history: list[ChatMessage]):
+        chat_pane = self.query_one("#chat-pane", ChatPane)
+        chat_pane.clear()
+        for msg in history:
+            prefix = "[bold blue]You:[/]" if msg.sender == "user" \
+                else "[bold magenta]LLM:[/]" if msg.sender == "llm" \
+                else "[bold yellow]Sys:[/]"
+            chat_pane.write(f"{prefix} {escape(msg.text)}") # Only the prefix is markup; text may contain [brackets]
+        self.chat_history = history # Update reactive var if needed elsewhere
 
 
     def update_ssh_log(self, log_entries: list[SSHLogEntry]):
-        def _update():
-            log_pane = self.query_one("#ssh-log-pane", SSHLogPane)
-            # Efficient update? Or just clear and rewrite for simplicity now?
-            log_pane.clear()
-            for entry in log_entries:
-                 log_pane.write(entry.output) # output is pre-formatted
-            self.ssh_log_entries = log_entries
-        self.call_from_thread(_update)
+        self.call_from_thread(self._render_ssh_log, log_entries)
+
+    def _render_ssh_log(self, log_entries: list[SSHLogEntry]):
+        log_pane = self.query_one("#ssh-log-pane", SSHLogPane)
+        # Efficient update? Or just clear and rewrite for simplicity now?
+        log_pane.clear()
+        for entry in log_entries:
+             log_pane.write(entry.output) # output is pre-formatted
+        self.ssh_log_entries = log_entries
 
     def update_connection_status(self, status: str):
-        def _update():
-            status_widget = self.query_one(StatusBar)
-            status_widget.update(status) # Placeholder update
-            self.connection_status = status
-        self.call_from_thread(_update)
+        self.call_from_thread(self._render_connection_status, status)
+
+    def _render_connection_status(self, status: str):
+        status_widget = self.query_one(StatusBar)
+        status_widget.update(status) # Placeholder update
+        self.connection_status = status
 
-    def update_pending_commands(self, commands: list[str]):
+    def update_pending_commands(self, commands: list[CommandRecord]):
+         self.call_from_thread(self._render_pending_commands, commands)
+
+    def _render_pending_commands(self, commands: list[CommandRecord]):
+         approval_pane = self.query_one(CommandApprovalPane)
+         approval_pane.update_commands(commands) # Delegate to the widget
+         self.pending_commands = commands
+
+    def update_command_state(self, record: CommandRecord):
          def _update():
               approval_pane = self.query_one(CommandApprovalPane)
-              approval_pane.update_commands(commands) # Delegate to the widget
-              self.pending_commands = commands
+              approval_pane.update_command(record) # Per-command progress, no full redraw
          self.call_from_thread(_update)
 
     def show_modal_message(self, title: str, message: str):
@@ -178,8 +218,53 @@ class LLMSshApp(App[None]):
             # Send message to core logic (which runs LLM in thread)
             self.core_logic.send_message_to_llm(user_input)
 
+    # --- Sessions ---
+
+    def _render_session(self):
+        """Redraws every pane from the active session's state (after switching tabs)."""
+        state = self.core_logic.state
+        self._render_chat(state.conversation_history)
+        self._render_ssh_log(state.ssh_log)
+        self._render_pending_commands(state.command_queue.active())
+        connection = state.active_connection
+        if connection and connection.is_connected:
+            self._render_connection_status(f"Connected to {connection.profile.hostname}.")
+        else:
+            self._render_connection_status("Not connected.")
+
+    def on_tabs_tab_activated(self, event: Tabs.TabActivated) -> None:
+        """Rebinds the UI to the session of the newly selected tab."""
+        if event.tab is None:
+            return
+        session_id = event.tab.id[len("session-"):]
+        if session_id == self.session_manager.active_session_id:
+            return
+        self._clear_core_logic_callbacks()
+        # Pages the session back in if it was idle long enough to be saved to disk
+        self.core_logic = self.session_manager.activate(session_id)
+        self._set_core_logic_callbacks()
+        self._render_session()
+
+    async def action_new_session(self) -> None:
+        session_id = self.session_manager.create_session()
+        info = next(info for info in self.session_manager.list_sessions() if info.session_id == session_id)
+        tabs = self.query_one("#session-tabs", Tabs)
+        await tabs.add_tab(Tab(info.name, id=self._tab_id(session_id)))
+        tabs.active = self._tab_id(session_id)
+
+    async def action_close_session(self) -> None:
+        """Closes the active session; the neighbouring tab becomes active."""
+        session_id = self.session_manager.active_session_id
+        tabs = self.query_one("#session-tabs", Tabs)
+        if len(self.session_manager.list_sessions()) == 1:
+            await self.action_new_session() # Always keep one session open
+        self._clear_core_logic_callbacks()
+        self.session_manager.close_session(session_id)
+        await tabs.remove_tab(self._tab_id(session_id))
+
     # Add handlers for buttons in CommandApprovalPane (e.g., on_button_pressed)
     # These handlers would call core_logic.approve_commands or core_logic.reject_commands
+    # with the command_id of the selected CommandRecord(s)
 
     # Add action handlers for bindings
     def action_toggle_logs(self) -> None:
@@ -1,36 +1,55 @@
 # File: llm_ssh_agent/tui/main.py
 
-from ..core_logic import CoreLogic
+import argparse
+import sys
+
+from ..sessions import SessionManager
+from ..daemon import DaemonError, RemoteSessionManager, SOCKET_PATH
 from .app import LLMSshApp
-from ..app_state import AppState, LLMConfig # Import AppState and LLMConfig
+from ..app_state import LLMConfig
+from ..llm_interface import LLMInterface
 
 def run():
     """Entry point for the TUI application."""
-
-    # Create a custom LLMConfig with your Ollama server's base_url
+    parser = argparse.ArgumentParser(prog="llm-ssh-tui")
+    parser.add_argument("--attach", action="store_true",
+                        help="Attach to a running llm-ssh-daemon instead of starting the agent in this process.")
+    parser.add_argument("--socket", default=SOCKET_PATH, help=f"Daemon socket for --attach (default: {SOCKET_PATH}).")
+    args = parser.parse_args()
+
+    if args.attach:
+        # Sessions, SSH connections and the LLM client live in the daemon
+        try:
+            session_manager = RemoteSessionManager(args.socket)
+        except DaemonError as e:
+            print(f"Error: {e}. Start it with 'llm-ssh-daemon'.", file=sys.stderr)
+            sys.exit(1)
+        try:
+            LLMSshApp(session_manager).run()
+        finally:
+            session_manager.shutdown() # Detach only; the daemon keeps the sessions
+        return
+
+    # Create a custom LLMConfig with your Ollama server(s)
     ollama_config = LLMConfig(
         provider="ollama",
         model_name="gemma:2b", # Make sure this matches the model you have
-        base_url="http://192.168.50.221:30434" # <-- Your Ollama Server Address
+        endpoints=[
+            "http://192.168.50.221:30434", # <-- Your Ollama Server Address(es)
+        ],
+        hedge_after=None, # e.g. 5.0 to race a second server when the first is slow
     )
 
-    # Create an AppState with this custom LLMConfig
-    initial_app_state = AppState(current_llm_config=ollama_config)
-
-    # Create CoreLogic
-    core_logic = CoreLogic()
-
-    # Assign the initial state
-    core_logic.state = initial_app_state
-
-    # --- ADD THIS LINE ---
-    # Update the LLM interface within core_logic with the correct config
-    core_logic.update_llm_settings(initial_app_state.current_llm_config)
-    # -------------------
+    # One LLM interface (and SSH connection pool) shared by every session tab
+    session_manager = SessionManager(llm_interface=LLMInterface(ollama_config))
+    session_manager.start_idle_paging()
 
     # Initialize and run the Textual application
-    app = LLMSshApp(core_logic)
-    app.run()
+    app = LLMSshApp(session_manager)
+    try:
+        app.run()
+    finally:
+        session_manager.shutdown() # Saves open sessions so they come back next time
 
 if __name__ == "__main__":
     run()
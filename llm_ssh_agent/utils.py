@@ -1,7 +1,13 @@
 # File: llm_ssh_agent/utils.py
 # Type: Python Module
 
+import difflib
 import time
+from typing import List, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .retrieval import OutputChunk
+    from .host_facts import HostFacts
 
 def format_ssh_log(command: str, stdout: str, stderr: str) -> str:
     """Formats command, stdout, and stderr for display in the log."""
@@ -11,4 +17,68 @@ def format_ssh_log(command: str, stdout: str, stderr: str) -> str:
     if stderr:
         log_entry += f"--- ERR ---\n{stderr.strip()}\n"
     log_entry += "------------------------------------\n"
-    return log_entry
\ No newline at end of file
+    return log_entry
+
+def format_policy_log(command: str, action: str, reason: str) -> str:
+    """Formats an auto-approval policy decision for display in the log."""
+    return f"--- POLICY: {action.upper()} {command} ({time.strftime('%H:%M:%S')}) ---\n{reason}\n"
+
+def format_retrieved_context(chunks: List["OutputChunk"]) -> str:
+    """Formats retrieved output chunks as a compact context block for the LLM."""
+    sections = []
+    for chunk in chunks:
+        origin = f"{chunk.host}: " if chunk.host else ""
+        sections.append(f"--- {origin}$ {chunk.command} ({time.strftime('%H:%M:%S', time.localtime(chunk.timestamp))}) ---\n{chunk.text}")
+    return "\n".join(sections)
+
+
+# A diff is only sent instead of the full output if it is at most this fraction of it
+MAX_DIFF_RATIO = 0.5
+
+def summarize_output_change(previous: str, current: str) -> Optional[str]:
+    """
+    Compares a command's output with its previous run.
+    Returns "" if unchanged, a compact unified diff if the output largely
+    matches, or None if the full output should be sent.
+    """
+    if previous == current:
+        return ""
+    previous_lines = previous.splitlines()
+    current_lines = current.splitlines()
+    diff = list(difflib.unified_diff(previous_lines, current_lines, "previous", "current", n=1, lineterm=""))
+    if not diff:
+        return "" # Only line-ending/whitespace-at-end differences
+    diff_text = "\n".join(diff[2:]) # Drop the ---/+++ file headers
+    if len(diff_text) > MAX_DIFF_RATIO * max(len(current), 1):
+        return None
+    return diff_text
+
+
+# Running services listed in the host summary; the rest are only counted
+MAX_SUMMARY_SERVICES = 40
+
+def format_host_facts(facts: "HostFacts") -> str:
+    """Formats gathered host facts as a compact block for the system prompt."""
+    lines = []
+    system = facts.os or facts.os_id or "unknown OS"
+    if facts.os_like:
+        system += f" (like {facts.os_like})"
+    lines.append(f"Host: {facts.hostname or '?'}; OS: {system}; kernel: {facts.kernel or '?'}")
+    resources = []
+    if facts.cpus:
+        resources.append(f"{facts.cpus} CPU(s)")
+    if facts.memory_mb:
+        resources.append(f"{facts.memory_mb} MB RAM")
+    lines.append(f"Init: {facts.init_system or '?'}; packages: {facts.package_manager or '?'}"
+                 + (f"; {', '.join(resources)}" if resources else ""))
+    if facts.mounts:
+        lines.append("Disks (mount size use%): " + "; ".join(facts.mounts))
+    if facts.services:
+        shown = facts.services[:MAX_SUMMARY_SERVICES]
+        more = f" (+{len(facts.services) - len(shown)} more)" if len(facts.services) > len(shown) else ""
+        lines.append(f"Running services: {', '.join(shown)}{more}")
+    if facts.container_tools:
+        lines.append(f"Container tools: {', '.join(facts.container_tools)}")
+    age = int(max(0, time.time() - facts.collected) // 60)
+    lines.append(f"(gathered {age} min ago)" if age else "(gathered just now)")
+    return "\n".join(lines)